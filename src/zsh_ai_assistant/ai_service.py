@@ -1,30 +1,557 @@
 """AI service implementation using LangChain."""
 
+import hashlib
 import logging
-from typing import List, Dict, Any, cast, Union, Iterator
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from functools import partial
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, cast, Union, Iterator, Optional, Sequence, Tuple
 from .interfaces import AIServiceInterface
 from .config import AIConfig
+from .context import DirectoryContext
+from .glossary import Glossary, load_glossary
+from .langdetect import language_code, needs_no_translation
+from .circuit_breaker import CircuitBreaker, is_connection_error
+from .http_client import OpenAIHTTPClient
+from .latency import LatencyTracker
+from .messages import (
+    AIMessage,
+    BaseMessage,
+    ConversionCache,
+    HumanMessage,
+    MessageLike,
+    Role,
+    SystemMessage,
+    to_langchain_message,
+    to_message,
+)
 from .mocks import MockClient
+from .ratelimit import Lease, RateLimiter, estimate_tokens
+from .singleflight import SingleFlight, normalize_prompt, request_key
+from .state import SharedStateFile
+from .translation import TranslationStats, translate_segments
+from .translation_memory import TranslationMemory
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 # Get logger
 logger = logging.getLogger(__name__)
 
 
+def _chat_openai_class() -> Any:
+    """Return ChatOpenAI, importing LangChain on first use.
+
+    The class is looked up in the module namespace first so that it can be
+    patched as ``zsh_ai_assistant.ai_service.ChatOpenAI``.
+    """
+    chat_openai = globals().get("ChatOpenAI")
+    if chat_openai is None:
+        from langchain_openai import ChatOpenAI as chat_openai
+
+        globals()["ChatOpenAI"] = chat_openai
+    return chat_openai
+
+
+def __getattr__(name: str) -> Any:
+    """Import ChatOpenAI lazily when it is accessed as a module attribute."""
+    if name == "ChatOpenAI":
+        return _chat_openai_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Asks the model to carry on after an interrupted response ("instruct" resume strategy)
+CONTINUE_PROMPT = (
+    "Your previous answer was cut off. Continue it exactly where it stopped, "
+    "without repeating anything and without any preamble."
+)
+
+# System message of chats whose history has none
+DEFAULT_CHAT_SYSTEM_MESSAGE = SystemMessage(
+    content=(
+        "You are a helpful AI assistant. "
+        "Provide concise, accurate responses to user questions. "
+        "Be friendly and professional."
+    )
+)
+
+# Upper bound in seconds for the backoff between resume attempts
+RESUME_BACKOFF_CAP = 8.0
+
+# A (model, base_url, api_key) request target
+Target = Tuple[str, Optional[str], Optional[str]]
+# (connect, read, total) timeouts in seconds
+Timeouts = Tuple[Optional[float], Optional[float], Optional[float]]
+
+
+def _chat_message(message: MessageLike) -> Optional[BaseMessage]:
+    """Return a chat history entry as a message, or None if its role is unknown."""
+    try:
+        return to_message(message)
+    except ValueError:
+        return None
+
+
+def _is_system_message(message: BaseMessage) -> bool:
+    """Check if a message is a system message."""
+    return message.role is Role.SYSTEM
+
+
+def _target_key(target: Target) -> str:
+    """Return the key identifying a model endpoint in shared statistics."""
+    model, base_url, _ = target
+    return f"{model}@{base_url}"
+
+
+class TotalTimeoutError(TimeoutError):
+    """Raised when a request runs past its total timeout."""
+
+
+def _call_with_deadline(
+    function: Callable[[], Any], timeout: Optional[float], on_abandoned_end: Optional[Callable[[], None]] = None
+) -> Any:
+    """Call a function, giving up on it after ``timeout`` seconds of wall-clock time.
+
+    Client timeouts only bound each connect and read, so a response trickling
+    in slowly is never cut off by them. The call runs in a daemon thread that
+    is abandoned at the deadline; its own read timeout ends it eventually.
+    Until then the request is still running, so what it holds, e.g. its
+    share of the rate limits, is only given back by ``on_abandoned_end``.
+
+    Args:
+        function: The call
+        timeout: Seconds the call may take, or None to wait for it
+        on_abandoned_end: Called from the thread once an abandoned call ends
+
+    Raises:
+        TotalTimeoutError: If the call did not finish in time
+    """
+    if timeout is None:
+        return function()
+    outcome: Dict[str, Any] = {}
+    # Whether the call ended and whether it was abandoned, decided under the lock
+    lock = threading.Lock()
+    state = {"ended": False, "abandoned": False}
+
+    def run() -> None:
+        try:
+            outcome["result"] = function()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            with lock:
+                state["ended"] = True
+                abandoned = state["abandoned"]
+            if abandoned and on_abandoned_end is not None:
+                on_abandoned_end()
+
+    thread = threading.Thread(target=run, name="invoke", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    with lock:
+        if not state["ended"]:
+            state["abandoned"] = True
+            raise TotalTimeoutError(f"Request exceeded total timeout of {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def _key_digest(api_key: Optional[str]) -> str:
+    """Return a digest telling API keys apart without keeping them in cache keys."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+
+# Reserved words opening a compound command, and the word closing it
+_COMPOUND_OPENERS = {"if": "fi", "case": "esac", "for": "done", "while": "done", "until": "done", "select": "done"}
+# Reserved words after which a new command starts
+_COMMAND_PREFIXES = ("then", "else", "elif", "do", "in", "!", "time")
+# Characters ending a word outside quotes
+_WORD_DELIMITERS = " \t;&|()<>"
+# A here-document operator and its delimiter word, possibly quoted
+_HEREDOC = re.compile(r"<<(-?)[ \t]*(['\"]?)([^\s'\";&|()<>]+)\2")
+# The empty parentheses after the name of a function being defined
+_FUNCTION_PARENS = re.compile(r"\([ \t]*\)")
+
+
+def _command_complete(text: str) -> bool:
+    """Check that a shell snippet of complete lines needs no further lines.
+
+    The snippet needs more lines while a quote, a compound command (``if``,
+    ``case``, loops, ``{ ... }``, ``( ... )``, function bodies) or a
+    here-document is open, or while its last line is continued with a
+    backslash or ends with ``|``, ``&&`` or ``||``.
+    """
+    # Words or characters closing the constructs still open, innermost last
+    closers: List[str] = []
+    # Delimiters of here-documents whose bodies follow the current line, and
+    # whether their lines may be indented with tabs
+    heredocs: List[Tuple[str, bool]] = []
+    quote = ""
+    escaped = False
+    # Whether the previous line ended with a backslash, or with an operator
+    joined = continued = False
+    # Whether the last word named a command, so "()" after it defines a function,
+    # and whether the next word is the name after "function"
+    named = defining = False
+    for line in text.split("\n"):
+        if heredocs and not quote:
+            delimiter, strip_tabs = heredocs[0]
+            if (line.lstrip("\t") if strip_tabs else line) == delimiter:
+                heredocs.pop(0)
+            continue
+        command_start = not joined
+        joined = continued = False
+        word = ""
+        index = 0
+        while index <= len(line):
+            char = line[index] if index < len(line) else "\n"
+            if escaped:
+                escaped = False
+                if index == len(line):
+                    # A backslash before the newline joins the next line
+                    joined = True
+                elif line.startswith("$(", index):
+                    # An escaped "$(" opens no command substitution
+                    word += "$("
+                    index += 1
+                else:
+                    word += char
+            elif char == "\\" and quote != "'":
+                escaped = True
+                word += char
+            elif quote:
+                if char == quote:
+                    quote = ""
+                word += char
+            elif char in ("'", '"'):
+                quote = char
+                word += char
+            elif char == "#" and not word:
+                break
+            elif char in _WORD_DELIMITERS or char == "\n":
+                if word:
+                    if defining:
+                        # The function's name; its body follows
+                        defining = False
+                        named = command_start = True
+                    else:
+                        word_start = command_start
+                        command_start = _close_word(word, command_start, closers)
+                        defining = word_start and word == "function"
+                        named = word_start and not command_start and not defining
+                    continued = False
+                    word = ""
+                arithmetic = closers[-1:] == ["))"]
+                definition = _FUNCTION_PARENS.match(line, index) if char == "(" and named else None
+                if char not in " \t":
+                    named = False
+                if definition is not None:
+                    # "name()" is followed by the function's body
+                    index = definition.end() - 1
+                    command_start = True
+                elif char == "(":
+                    if line.startswith("((", index) and command_start:
+                        closers.append("))")
+                        index += 1
+                    else:
+                        closers.append(")")
+                    command_start = True
+                elif char == ")":
+                    if arithmetic and line.startswith("))", index):
+                        closers.pop()
+                        index += 1
+                    elif closers[-1:] == [")"]:
+                        closers.pop()
+                    # A ")" left unmatched ends a case pattern
+                    command_start = closers[-1:] == ["esac"]
+                elif char == "<" and not arithmetic:
+                    if line.startswith("<<<", index):
+                        index += 2
+                    else:
+                        match = _HEREDOC.match(line, index)
+                        if match is not None:
+                            heredocs.append((match.group(3), bool(match.group(1))))
+                            index = match.end() - 1
+                elif char in ";&|":
+                    command_start = True
+                    # "|" and "&&" at the end of a line continue the command; "&" does not
+                    continued = char == "|" or (char == "&" and line[index - 1 : index] == "&")
+            elif char == "$" and line.startswith("$((", index):
+                closers.append("))")
+                word += "$(("
+                index += 2
+            elif char == "$" and line.startswith("$(", index):
+                closers.append(")")
+                word += "$("
+                index += 1
+                command_start = True
+            else:
+                word += char
+            index += 1
+    return not (quote or closers or heredocs or joined or continued)
+
+
+def _close_word(word: str, command_start: bool, closers: List[str]) -> bool:
+    """Track the compound commands a word opens or closes.
+
+    Returns:
+        Whether the next word starts a command
+    """
+    if not command_start:
+        return False
+    if word in _COMPOUND_OPENERS:
+        closers.append(_COMPOUND_OPENERS[word])
+    elif word == "{":
+        closers.append("}")
+    elif closers and word == closers[-1] and word not in (")", "))"):
+        closers.pop()
+        return False
+    elif word not in _COMMAND_PREFIXES:
+        return False
+    return True
+
+
+def _strip_fences(text: str) -> str:
+    """Remove markdown code fence lines from generated text."""
+    return "\n".join(line for line in text.split("\n") if not line.strip().startswith("```")).strip()
+
+
+def first_command_line(text: str) -> Optional[str]:
+    """Extract the first complete shell command from partially generated text.
+
+    Leading blank lines and markdown code fences are skipped. A command is
+    complete once its line has been terminated by a newline, unless it is
+    continued with a trailing backslash or an operator, opens a
+    here-document or a compound command, or leaves a quote open, in which
+    case the following lines are needed as well.
+
+    Returns:
+        The command, or None if more text is needed to decide
+    """
+    lines = text.split("\n")
+    # The last element is still being generated
+    complete = lines[:-1]
+    command_lines: List[str] = []
+    for line in complete:
+        stripped = line.strip()
+        if not command_lines and (not stripped or stripped.startswith("```")):
+            continue
+        command_lines.append(line)
+        command = "\n".join(command_lines)
+        if _command_complete(command):
+            return command.strip()
+    return None
+
+
+class BackendCapabilities:
+    """Features a chat backend supports, declared once when it is created."""
+
+    __slots__ = ("streaming", "async_calls", "batch", "usage_reporting", "prompt_caching")
+
+    def __init__(
+        self,
+        streaming: bool = False,
+        async_calls: bool = False,
+        batch: bool = False,
+        usage_reporting: bool = False,
+        prompt_caching: bool = False,
+    ) -> None:
+        """Initialize the capabilities.
+
+        Args:
+            streaming: The client can stream tokens with ``stream()``
+            async_calls: The client offers ``ainvoke()``/``astream()``
+            batch: The client offers ``batch()``
+            usage_reporting: Responses carry token usage metadata
+            prompt_caching: Requests may reuse a server-side prompt cache
+        """
+        self.streaming = streaming
+        self.async_calls = async_calls
+        self.batch = batch
+        self.usage_reporting = usage_reporting
+        self.prompt_caching = prompt_caching
+
+    def __repr__(self) -> str:
+        """Return a string representation of the capabilities."""
+        enabled = [name for name in self.__slots__ if getattr(self, name)]
+        return f"BackendCapabilities({', '.join(enabled) or 'invoke only'})"
+
+
+class ChatBackend:
+    """A chat client together with the capabilities it was detected to have.
+
+    The service only talks to clients through a backend, so the per-request
+    path never has to inspect the client again. Clients can declare their own
+    capabilities with a ``capabilities`` attribute; LangChain chat models are
+    recognized as streaming backends; anything else is called with
+    ``invoke()`` only.
+    """
+
+    __slots__ = ("client", "capabilities", "convert")
+
+    def __init__(
+        self,
+        client: Any,
+        capabilities: BackendCapabilities,
+        convert: Optional[Callable[[List[Any]], List[Any]]] = None,
+    ) -> None:
+        """Initialize the backend.
+
+        Args:
+            client: Object with an ``invoke()`` method, and ``stream()`` if it streams
+            capabilities: Features the client supports
+            convert: Optional conversion of the service's messages to the client's own
+        """
+        self.client = client
+        self.capabilities = capabilities
+        self.convert = convert
+
+    @classmethod
+    def for_client(cls, client: Any, prompt_caching: bool = False) -> "ChatBackend":
+        """Detect the capabilities of a client and wrap it.
+
+        Args:
+            client: Chat client to wrap
+            prompt_caching: Whether prompt caching is configured for the endpoint
+        """
+        declared = getattr(client, "capabilities", None)
+        if isinstance(declared, BackendCapabilities):
+            return cls(client, declared)
+        if isinstance(client, OpenAIHTTPClient):
+            return HTTPBackend(
+                client,
+                BackendCapabilities(streaming=True, usage_reporting=True, prompt_caching=prompt_caching),
+            )
+        # A LangChain chat model can only exist if LangChain has been imported
+        language_models = sys.modules.get("langchain_core.language_models")
+        if language_models is not None and isinstance(client, language_models.BaseChatModel):
+            return cls(
+                client,
+                BackendCapabilities(
+                    streaming=True,
+                    async_calls=True,
+                    batch=True,
+                    usage_reporting=True,
+                    prompt_caching=prompt_caching,
+                ),
+                # Each backend converts only the messages appended since its last request
+                convert=ConversionCache(to_langchain_message),
+            )
+        return cls(client, BackendCapabilities())
+
+    def invoke(self, messages: List[Any], kwargs: Dict[str, Any]) -> Any:
+        """Send a request and return the whole response message."""
+        if self.convert is not None:
+            messages = self.convert(messages)
+        if kwargs:
+            return self.client.invoke(messages, **kwargs)
+        return self.client.invoke(messages)
+
+    def stream(self, messages: List[Any], kwargs: Dict[str, Any]) -> Iterator[str]:
+        """Stream a response as text, skipping empty chunks."""
+        if self.convert is not None:
+            messages = self.convert(messages)
+        stream = self.client.stream(messages, **kwargs) if kwargs else self.client.stream(messages)
+        try:
+            for chunk in stream:
+                content = chunk.content
+                if content:
+                    yield content if isinstance(content, str) else str(content)
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+
+class HTTPBackend(ChatBackend):
+    """Backend for the direct HTTP client, streaming text without chunk objects."""
+
+    __slots__ = ()
+
+    def stream(self, messages: List[Any], kwargs: Dict[str, Any]) -> Iterator[str]:
+        """Stream a response as the text decoded straight from the event stream."""
+        return cast(OpenAIHTTPClient, self.client).stream_text(messages, **kwargs)
+
+
 class LangChainAIService(AIServiceInterface):
     """AI service implementation using LangChain and OpenAI API."""
 
-    def __init__(self, config: AIConfig, test_mode: bool = False):
+    def __init__(self, config: AIConfig, test_mode: bool = False, session_id: Optional[str] = None):
         """Initialize AI service with configuration.
 
         Args:
             config: AI configuration
             test_mode: If True, use mock client for testing
+            session_id: Optional conversation identifier used to keep a session
+                on the same server-side prompt cache slot
         """
         self.config = config
         self.test_mode = test_mode
-        self.client: Union[MockClient, ChatOpenAI]
+        self.session_id = session_id
+        self.client: Union[MockClient, "ChatOpenAI", OpenAIHTTPClient]
+        # Backend wrapping ``self.client``, rebuilt only when the client is replaced
+        self._backend: Optional[ChatBackend] = None
+        # Backends for modes routed to a model/endpoint/API key other than the default
+        # one, keyed by (model, base_url, API key digest, timeouts) and created on first use
+        self._backends: Dict[Tuple[str, Optional[str], str, Timeouts], ChatBackend] = {}
+        self._default_timeouts: Timeouts = (config.connect_timeout, config.read_timeout, config.timeout)
+        # Chat histories converted to messages, extended by the new messages of each turn
+        self._chat_conversions = ConversionCache(_chat_message, counted=_is_system_message)
+        # Consecutive connection failures per endpoint, shared between processes
+        self.breaker: Optional[CircuitBreaker] = None
+        if not test_mode and config.circuit_failure_threshold > 0:
+            self.breaker = CircuitBreaker(
+                SharedStateFile(os.path.join(config.state_dir, "circuits.json")),
+                failure_threshold=config.circuit_failure_threshold,
+                cooldown=config.circuit_cooldown,
+            )
+        # Identical concurrent commands and translations share one request between processes
+        self.single_flight: Optional[SingleFlight] = None
+        if not test_mode and config.single_flight:
+            self.single_flight = SingleFlight(os.path.join(config.state_dir, "inflight"))
+        # Request, token and concurrency limits shared by every process on the host
+        self.rate_limiter: Optional[RateLimiter] = None
+        if not test_mode and config.rate_limited:
+            self.rate_limiter = RateLimiter(
+                os.path.join(config.state_dir, "ratelimit.bin"),
+                requests_per_second=config.rate_limit_rps,
+                tokens_per_minute=config.rate_limit_tpm,
+                max_in_flight=config.max_in_flight,
+            )
+        # Summary of the working directory sent with command requests
+        self.directory_context: Optional[DirectoryContext] = None
+        # Directory commands run in, when the caller is not running in it itself
+        self.working_directory: Optional[str] = None
+        if not test_mode and config.command_context:
+            self.directory_context = DirectoryContext(
+                os.path.join(config.state_dir, "context.json"), config.command_context_deadline
+            )
+        # Translated paragraphs reused instead of being sent to the model again
+        self.translation_memory: Optional[TranslationMemory] = None
+        if not test_mode and config.translation_memory:
+            self.translation_memory = TranslationMemory(config.state_dir, config.translation_memory_fuzzy)
+        # Segments translated, passed through and reused by this service
+        self.translation_stats = TranslationStats()
+        # Glossary whose entries are added to translations using their terms
+        self.glossary: Optional[Glossary] = None
+        if config.glossary:
+            self.glossary = load_glossary(config.glossary, config.state_dir)
+        # Identity of the glossary, so translations made with another one are never shared
+        self.glossary_digest = self.glossary.digest() if self.glossary is not None else ""
+        # Time-to-first-token statistics, only kept when a mode has a fallback model
+        self.latency: Optional[LatencyTracker] = None
+        if any(profile.has_fallback for profile in config.profiles.values()):
+            self.latency = LatencyTracker(
+                SharedStateFile(os.path.join(config.state_dir, "latency.json")),
+                alpha=config.latency_ewma_alpha,
+                probe_interval=config.fallback_probe_interval,
+            )
 
         logger.debug("Initializing AI service with config: %s", config)
         logger.debug("Test mode: %s", test_mode)
@@ -34,77 +561,442 @@ class LangChainAIService(AIServiceInterface):
             logger.info("Using mock client for testing")
             self.client = MockClient()
         else:
-            # Use real ChatOpenAI client
+            # Use a real client: ChatOpenAI, or the direct HTTP client
             if not config.is_valid:
                 raise ValueError("Invalid AI configuration: API key and base URL are required")
 
-            logger.info("Using real ChatOpenAI client")
-            self.client = ChatOpenAI(
-                api_key=config.api_key,  # type: ignore[arg-type]
-                base_url=config.base_url,
-                model=config.model,
-                temperature=config.temperature,
-                max_tokens=config.max_tokens,  # type: ignore[call-arg]
+            logger.info("Using real %s client", "HTTP" if config.client == "http" else "ChatOpenAI")
+            self.client = self._create_client(config.model, config.base_url, config.api_key, self._default_timeouts)
+
+    def _create_client(
+        self,
+        model: str,
+        base_url: Optional[str],
+        api_key: Optional[str],
+        timeouts: Timeouts = (None, None, None),
+    ) -> Union["ChatOpenAI", OpenAIHTTPClient]:
+        """Create a client for a model served at an endpoint.
+
+        ChatOpenAI is used unless the direct HTTP client is configured. Timeouts
+        and retries are only passed when configured, leaving the client library
+        defaults in place otherwise.
+        """
+        if self.config.client == "http":
+            return OpenAIHTTPClient(
+                api_key,
+                base_url,
+                model,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                timeouts=timeouts,
+                max_retries=self.config.max_retries,
+            )
+
+        kwargs: Dict[str, Any] = {}
+        connect, read, total = timeouts
+        if any(value is not None for value in timeouts):
+            import httpx
+
+            kwargs["timeout"] = httpx.Timeout(total, connect=connect or total, read=read or total)
+        if self.config.max_retries is not None:
+            kwargs["max_retries"] = self.config.max_retries
+        return cast(
+            "ChatOpenAI",
+            _chat_openai_class()(
+                api_key=api_key,
+                base_url=base_url,
+                model=model,
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                **kwargs,
+            ),
+        )
+
+    def _route(self, mode: str) -> Target:
+        """Pick the (model, base_url, api_key) target for a request in a mode.
+
+        The mode's primary model is used unless a fallback is configured and the
+        primary's moving-average time to first token is over the mode's SLO.
+        """
+        profile = self.config.profile(mode)
+        primary = (profile.model, profile.base_url, profile.api_key)
+        if self.latency is None or not profile.has_fallback:
+            return primary
+        if self.latency.should_fall_back(_target_key(primary), cast(float, profile.ttft_slo_ms)):
+            logger.info("Primary model %s is over its TTFT SLO, using %s", profile.model, profile.fallback_model)
+            return (cast(str, profile.fallback_model), profile.fallback_base_url, profile.api_key)
+        return primary
+
+    def _default_backend(self) -> ChatBackend:
+        """Return the backend wrapping ``self.client``.
+
+        Capabilities are detected once per client; the identity check keeps
+        this correct when the client attribute is swapped out.
+        """
+        backend = self._backend
+        if backend is None or backend.client is not self.client:
+            backend = ChatBackend.for_client(self.client, self.config.prompt_cache_enabled)
+            logger.debug("Default backend capabilities: %r", backend.capabilities)
+            self._backend = backend
+        return backend
+
+    def _backend_for_target(self, target: Target, timeouts: Timeouts) -> ChatBackend:
+        """Return the backend serving a target with the given timeouts.
+
+        The default model, endpoint, API key and timeouts use ``self.client``;
+        any other combination gets one lazily constructed backend that is
+        reused by every mode routed to it.
+        """
+        model, base_url, api_key = target
+        key = (model, base_url, _key_digest(api_key), timeouts)
+        default = (self.config.model, self.config.base_url, _key_digest(self.config.api_key), self._default_timeouts)
+        if self.test_mode or key == default:
+            return self._default_backend()
+        backend = self._backends.get(key)
+        if backend is None:
+            logger.info("Creating client for model %s at %s", model, base_url)
+            client = self._create_client(model, base_url, api_key, timeouts)
+            backend = ChatBackend.for_client(client, self.config.prompt_cache_enabled)
+            self._backends[key] = backend
+        return backend
+
+    def _backend_for(self, mode: str, target: Optional[Target] = None) -> ChatBackend:
+        """Return the backend serving a mode, routed to ``target`` or to the mode's current choice."""
+        return self._backend_for_target(target or self._route(mode), self.config.profile(mode).timeouts)
+
+    def _record_ttft(self, target: Target, started: float) -> None:
+        """Record the time to first token of a request, if latency is tracked."""
+        if self.latency is not None:
+            self.latency.record(_target_key(target), (time.monotonic() - started) * 1000)
+
+    def _before_call(self, target: Target) -> None:
+        """Fail fast if the target's circuit is open."""
+        if self.breaker is not None:
+            self.breaker.before_call(_target_key(target))
+
+    def _record_result(self, target: Target, error: Optional[BaseException] = None) -> None:
+        """Feed the outcome of a call to the circuit breaker."""
+        if self.breaker is None:
+            return
+        if error is None:
+            self.breaker.record_success(_target_key(target))
+        # A TotalTimeoutError is a TimeoutError, but a slow backend is still reachable
+        elif is_connection_error(error) and not isinstance(error, TotalTimeoutError):
+            self.breaker.record_failure(_target_key(target))
+
+    def _cache_slot(self, mode: str) -> int:
+        """Return the llama.cpp slot a request for the given mode should use.
+
+        A pinned slot wins. Otherwise the session (or, for one-shot calls, the
+        mode) is hashed onto one of the configured slots so that consecutive
+        requests sharing a prefix land on the same KV cache. -1 lets the server
+        choose.
+        """
+        if self.config.llamacpp_slot is not None:
+            return self.config.llamacpp_slot
+        if self.config.llamacpp_slots <= 0:
+            return -1
+        key = self.session_id or mode
+        return zlib.crc32(key.encode("utf-8")) % self.config.llamacpp_slots
+
+    def _request_kwargs(self, mode: str) -> Dict[str, Any]:
+        """Build per-request keyword arguments for the client.
+
+        Only settings that differ from what the client was constructed with are
+        passed, so the default profiles call the client exactly as before.
+        """
+        kwargs: Dict[str, Any] = {}
+        profile = self.config.profile(mode)
+        if profile.max_tokens != self.config.max_tokens:
+            kwargs["max_tokens"] = profile.max_tokens
+        if profile.temperature != self.config.temperature:
+            kwargs["temperature"] = profile.temperature
+        if profile.stop:
+            kwargs["stop"] = profile.stop
+        if self.config.prompt_cache_enabled:
+            kwargs["extra_body"] = {"cache_prompt": True, "id_slot": self._cache_slot(mode)}
+        return kwargs
+
+    def _acquire(self, mode: str, messages: List[Any]) -> Tuple[Optional[Lease], int]:
+        """Wait for the host-wide rate limits to allow a request.
+
+        The request is charged its estimated prompt tokens plus the mode's
+        maximum completion tokens; the unused part is refunded on release.
+
+        Returns:
+            The lease (None without limits) and the estimated prompt tokens
+        """
+        if self.rate_limiter is None:
+            return None, 0
+        prompt_tokens = estimate_tokens(sum(len(str(getattr(message, "content", message))) for message in messages))
+        lease = self.rate_limiter.acquire(mode, prompt_tokens + self.config.profile(mode).max_tokens)
+        return lease, prompt_tokens
+
+    def _release(self, lease: Optional[Lease], prompt_tokens: int, completion_chars: Optional[int]) -> None:
+        """Return a request's share of the rate limits.
+
+        Args:
+            lease: Lease returned by ``_acquire()``
+            prompt_tokens: Estimated prompt tokens of the request
+            completion_chars: Characters received, or None if the request failed
+        """
+        if lease is not None and self.rate_limiter is not None:
+            used = None if completion_chars is None else prompt_tokens + estimate_tokens(completion_chars)
+            self.rate_limiter.release(lease, used)
+
+    def _invoke(self, messages: List[Any], mode: str, target: Optional[Target] = None) -> Any:
+        """Invoke the mode's client, passing per-request options only when there are any.
+
+        A call cut off at the total timeout keeps its rate-limit lease until
+        the abandoned request ends, so the host-wide limits still count it.
+        Its single-flight slot is given up with the error, so a retry may
+        run alongside the abandoned request.
+
+        Args:
+            messages: Request messages
+            mode: Mode of the request
+            target: Target the call was routed to, or None to route it now
+        """
+        target = target or self._route(mode)
+        backend = self._backend_for_target(target, self.config.profile(mode).timeouts)
+        kwargs = self._request_kwargs(mode)
+        self._before_call(target)
+        lease, prompt_tokens = self._acquire(mode, messages)
+        started = time.monotonic()
+        try:
+            response = _call_with_deadline(
+                lambda: backend.invoke(messages, kwargs),
+                self.config.profile(mode).timeout,
+                # The abandoned request keeps its share of the rate limits until it ends
+                lambda: self._release(lease, prompt_tokens, None),
             )
+        except TotalTimeoutError:
+            raise
+        except Exception as e:
+            self._release(lease, prompt_tokens, None)
+            self._record_result(target, e)
+            raise
+        self._release(lease, prompt_tokens, len(str(getattr(response, "content", ""))))
+        self._record_result(target)
+        # Without streaming the first token arrives with the whole response
+        self._record_ttft(target, started)
+        return response
+
+    def _stream(self, messages: List[Any], mode: str, target: Optional[Target] = None) -> Iterator[str]:
+        """Stream text from the mode's backend, passing per-request options only when there are any."""
+        target = target or self._route(mode)
+        profile = self.config.profile(mode)
+        backend = self._backend_for_target(target, profile.timeouts)
+        kwargs = self._request_kwargs(mode)
+        return self._guarded_stream(backend, messages, kwargs, target, profile.timeout, mode)
+
+    def _guarded_stream(
+        self,
+        backend: ChatBackend,
+        messages: List[Any],
+        kwargs: Dict[str, Any],
+        target: Target,
+        total_timeout: Optional[float],
+        mode: str,
+    ) -> Iterator[str]:
+        """Stream from a backend under the circuit breaker, rate limits and the total timeout.
+
+        Connecting happens on the first iteration, so the breaker is consulted
+        and the first chunk timed from inside the generator. The total timeout
+        is enforced between chunks; the read timeout bounds each wait.
+        """
+        self._before_call(target)
+        lease, prompt_tokens = self._acquire(mode, messages)
+        received = 0
+        failed = False
+        started = time.monotonic()
+        stream: Optional[Iterator[str]] = None
+        first = True
+        try:
+            stream = backend.stream(messages, kwargs)
+            for chunk in stream:
+                if first:
+                    self._record_result(target)
+                    self._record_ttft(target, started)
+                    first = False
+                received += len(chunk)
+                yield chunk
+                if total_timeout is not None and time.monotonic() - started > total_timeout:
+                    raise TotalTimeoutError(f"Request exceeded total timeout of {total_timeout}s")
+        except Exception as e:
+            failed = True
+            if first:
+                self._record_result(target, e)
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            self._release(lease, prompt_tokens, None if failed else received)
+
+    def _supports_streaming(self, mode: str, target: Optional[Target] = None) -> bool:
+        """Check whether the backend serving a mode, or the given target, can stream."""
+        return self._backend_for(mode, target).capabilities.streaming
+
+    def _stream_first_command(self, messages: List[Any], target: Optional[Target] = None) -> str:
+        """Stream a command and hang up as soon as the first complete command line arrives.
+
+        Closing the stream early aborts the HTTP request, so the server stops
+        decoding whatever explanation the model would have added afterwards.
+        """
+        buffer = ""
+        stream = self._stream(messages, "command", target)
+        try:
+            for chunk in stream:
+                buffer += chunk
+                if "\n" in chunk:
+                    command = first_command_line(buffer)
+                    if command is not None:
+                        logger.debug("First command line complete, closing stream")
+                        return command
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        return first_command_line(buffer + "\n") or _strip_fences(buffer)
+
+    def _continuation_messages(self, messages: List[Any], partial: str) -> List[Any]:
+        """Build the request continuing an interrupted response.
+
+        With the ``prefix`` strategy the partial answer is sent as a trailing
+        assistant message that servers such as llama.cpp continue in place.
+        The ``instruct`` strategy additionally asks the model to carry on,
+        for servers that always start a new assistant turn.
+        """
+        continuation = list(messages) + [AIMessage(content=partial)]
+        if self.config.resume_strategy == "instruct":
+            continuation.append(HumanMessage(content=CONTINUE_PROMPT))
+        return continuation
+
+    def _stream_with_resume(self, messages: List[Any], mode: str, target: Optional[Target] = None) -> Iterator[str]:
+        """Stream a response, resuming from the partial output if the stream breaks.
+
+        Each retry sends a continuation request to the same target after a
+        jittered exponential backoff, and only text beyond what was already
+        yielded is passed on. Only transient transport failures are retried;
+        error responses, an open circuit and the total timeout are raised.
+        """
+        target = target or self._route(mode)
+        partial = ""
+        attempt = 0
+        while True:
+            request = messages if not partial else self._continuation_messages(messages, partial)
+            # A continuation may start over; hold back text that repeats the partial output
+            pending = ""
+            repeated = partial
+            try:
+                for text in self._stream(request, mode, target):
+                    if repeated:
+                        pending += text
+                        if repeated.startswith(pending):
+                            continue
+                        if pending.startswith(repeated):
+                            text = pending[len(repeated) :]
+                        else:
+                            text = pending
+                        pending = repeated = ""
+                        if not text:
+                            continue
+                    partial += text
+                    yield text
+                return
+            except Exception as e:
+                if isinstance(e, TotalTimeoutError) or not is_connection_error(e):
+                    raise
+                attempt += 1
+                if attempt > self.config.stream_retries:
+                    logger.error("Streaming failed after %d attempts: %s", attempt, e)
+                    raise
+                delay = random.uniform(
+                    0, min(RESUME_BACKOFF_CAP, self.config.stream_retry_backoff * 2 ** (attempt - 1))
+                )
+                logger.debug("Streaming failed (%s), resuming after %d characters in %.2fs", e, len(partial), delay)
+                time.sleep(delay)
+
+    def _flight_key(self, mode: str, target: Target, *parts: str) -> str:
+        """Return the single-flight key of a request in a mode routed to ``target``."""
+        profile = self.config.profile(mode)
+        model, base_url, _ = target
+        return request_key(mode, model, base_url, profile.temperature, profile.max_tokens, *parts)
+
+    def _command_context(self) -> str:
+        """Return the summary of the directory commands run in, or "" if it is off or unavailable."""
+        if self.directory_context is None:
+            return ""
+        try:
+            return self.directory_context.summary(self.working_directory or os.getcwd())
+        except OSError as e:
+            logger.debug("No directory context: %s", e)
+            return ""
 
     def generate_command(self, prompt: str) -> str:
         """Generate a shell command from a natural language prompt."""
+        context = self._command_context()
+        # Routed once, so the shared request, its key and its backend agree on the model
+        target = self._route("command")
+        if self.single_flight is not None:
+            key = self._flight_key("command", target, normalize_prompt(prompt), context)
+            return self.single_flight.call(key, lambda: self._generate_command(prompt, context, target))
+        return self._generate_command(prompt, context, target)
+
+    def _generate_command(self, prompt: str, context: str = "", target: Optional[Target] = None) -> str:
+        """Generate a shell command, without sharing the request."""
         logger.debug("Generating command for prompt: %s", prompt)
 
-        system_message = SystemMessage(
-            content=(
-                "You are a shell command generator. "
-                "Your task is to convert natural language requests into "
-                "appropriate shell commands. Return ONLY the command without "
-                "any explanation or markdown formatting. If the request is "
-                "ambiguous, return the most likely command."
-            )
+        instructions = (
+            "You are a shell command generator. "
+            "Your task is to convert natural language requests into "
+            "appropriate shell commands. Return ONLY the command without "
+            "any explanation or markdown formatting. If the request is "
+            "ambiguous, return the most likely command."
         )
+        if context:
+            instructions += f"\n\nThe command runs in this environment:\n{context}"
+        system_message = SystemMessage(content=instructions)
         human_message = HumanMessage(content=prompt)
 
+        target = target or self._route("command")
+        if self._supports_streaming("command", target):
+            logger.debug("Streaming command generation")
+            command = self._stream_first_command([system_message, human_message], target)
+            logger.debug("Generated command: %s", command)
+            return command
+
         logger.debug("Calling AI service with system message and human message")
-        response = self.client.invoke([system_message, human_message])
+        response = self._invoke([system_message, human_message], "command", target)
 
         logger.debug("Generated command: %s", response.content)
         return cast(str, response.content)
 
-    def chat(self, messages: List[Dict[str, Any]]) -> str:
-        """Generate a response from a chat history."""
-        logger.debug("Chat messages: %s", messages)
+    def _chat_messages(self, messages: Sequence[MessageLike]) -> List[BaseMessage]:
+        """Build the request for a chat history.
 
-        # Convert messages to LangChain format
-        langchain_messages: list = []
-
-        # Add default system message if no system message is provided
-        has_system_message = any(msg.get("role") == "system" for msg in messages)
-        if not has_system_message:
-            system_message = SystemMessage(
-                content=(
-                    "You are a helpful AI assistant. "
-                    "Provide concise, accurate responses to user questions. "
-                    "Be friendly and professional."
-                )
-            )
-            langchain_messages.append(system_message)
+        Only the messages appended since the previous turn are converted, and
+        the default system message is added if the history has none.
+        """
+        converted, system_messages = self._chat_conversions.convert(messages)
+        if not system_messages:
+            converted.insert(0, DEFAULT_CHAT_SYSTEM_MESSAGE)
+        return converted
 
-        for msg in messages:
-            role = msg.get("role")
-            content = msg.get("content")
+    def chat(self, messages: Sequence[MessageLike]) -> str:
+        """Generate a response from a chat history."""
+        logger.debug("Chat messages: %s", messages)
 
-            if role == "system":
-                langchain_messages.append(SystemMessage(content=content))
-            elif role == "user":
-                langchain_messages.append(HumanMessage(content=content))
-            elif role == "assistant":
-                langchain_messages.append(AIMessage(content=content))
+        langchain_messages = self._chat_messages(messages)
 
         logger.debug("Calling AI service with LangChain messages")
-        response = self.client.invoke(langchain_messages)
+        response = self._invoke(langchain_messages, "chat")
 
         logger.debug("AI response: %s", response.content)
         return cast(str, response.content)
 
-    def chat_stream(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
+    def chat_stream(self, messages: Sequence[MessageLike]) -> Iterator[str]:
         """Generate a streaming response from a chat history.
 
         Yields:
@@ -112,72 +1004,95 @@ class LangChainAIService(AIServiceInterface):
         """
         logger.debug("Chat messages (streaming): %s", messages)
 
-        # Convert messages to LangChain format
-        langchain_messages: list = []
-
-        # Add default system message if no system message is provided
-        has_system_message = any(msg.get("role") == "system" for msg in messages)
-        if not has_system_message:
-            system_message = SystemMessage(
-                content=(
-                    "You are a helpful AI assistant. "
-                    "Provide concise, accurate responses to user questions. "
-                    "Be friendly and professional."
-                )
-            )
-            langchain_messages.append(system_message)
-
-        for msg in messages:
-            role = msg.get("role")
-            content = msg.get("content")
-
-            if role == "system":
-                langchain_messages.append(SystemMessage(content=content))
-            elif role == "user":
-                langchain_messages.append(HumanMessage(content=content))
-            elif role == "assistant":
-                langchain_messages.append(AIMessage(content=content))
+        langchain_messages = self._chat_messages(messages)
 
         logger.debug("Calling AI service with streaming")
 
-        # Use streaming API
-        # Note: We check for MockClient specifically to maintain backward compatibility
-        # with tests that patch the client. MockClient has a stream() method, but when
-        # patched with MagicMock in tests, we want to fall back to invoke() for exception handling.
-
-        # Use streaming only for real ChatOpenAI client, not for MockClient
-        # This maintains backward compatibility with tests that use MockClient
-        # Check if client is ChatOpenAI by checking its class name to handle mocks properly
-        is_chat_openai = (
-            hasattr(self.client, "__class__")
-            and hasattr(self.client.__class__, "__name__")
-            and self.client.__class__.__name__ == "ChatOpenAI"
-        )
-
-        if hasattr(self.client, "stream") and is_chat_openai:
-            try:
-                stream = self.client.stream(langchain_messages)
-                for chunk in stream:
-                    if hasattr(chunk, "content") and chunk.content:
-                        yield str(chunk.content)
-            except Exception:
-                # Fallback to invoke if streaming fails
-                logger.debug("Streaming failed, falling back to invoke")
-                response = self.client.invoke(langchain_messages)
-                if hasattr(response, "content") and response.content:
-                    yield str(response.content)
+        # Use streaming API when the backend declares it; MockClient and
+        # patched clients fall back to invoke()
+        target = self._route("chat")
+        if self._supports_streaming("chat", target):
+            # Interrupted streams resume from the partial output
+            yield from self._stream_with_resume(langchain_messages, "chat", target)
         else:
             # Fallback for mock client or when streaming is not available
             try:
-                response = self.client.invoke(langchain_messages)
+                response = self._invoke(langchain_messages, "chat", target)
                 if hasattr(response, "content") and response.content:
                     yield str(response.content)
             except Exception:
                 # Re-raise the exception to be handled by the caller
                 raise
 
+    def _passthrough(self, target_language: str) -> Optional[Callable[[str], bool]]:
+        """Return the check for text needing no translation, if the target language is detectable."""
+        language = language_code(target_language) if self.config.language_detection else None
+        return partial(needs_no_translation, language=language) if language is not None else None
+
+    def _translate_segments(
+        self, text: str, target_language: str, translate_segment: Callable[[str], Iterator[str]], target: Target
+    ) -> Optional[Iterator[str]]:
+        """Translate text segment by segment, or return None to translate it in one request.
+
+        Segments already in the target language are passed through, and
+        with the translation memory on, remembered paragraphs are reused.
+        The counts of segments and of what was saved are logged once the
+        translation has been read to the end.
+        """
+        passthrough = self._passthrough(target_language)
+        if not text.strip() or (self.translation_memory is None and passthrough is None):
+            return None
+        return self._logged_stats(
+            translate_segments(
+                text,
+                target_language,
+                translate_segment,
+                self.translation_memory,
+                # Remembered under the model the segments are actually sent to
+                target[0],
+                self.config.translation_workers,
+                passthrough=passthrough,
+                stats=self.translation_stats,
+                glossary=self.glossary_digest,
+            )
+        )
+
+    def _logged_stats(self, translation: Iterator[str]) -> Iterator[str]:
+        """Pass a translation on, then log the translation counts of this service."""
+        yield from translation
+        logger.info("Translation: %s", self.translation_stats)
+
     def translate(self, text: str, target_language: str) -> str:
-        """Translate text to a target language."""
+        """Translate text to a target language.
+
+        Only the parts not already in the target language, and with the
+        translation memory on, not translated before, are sent to the model.
+        """
+        target = self._route("translate")
+        segments = self._translate_segments(
+            text,
+            target_language,
+            lambda segment: iter([self._shared_translate(segment, target_language, target)]),
+            target,
+        )
+        if segments is not None:
+            return "".join(segments)
+        return self._shared_translate(text, target_language, target)
+
+    def _shared_translate(self, text: str, target_language: str, target: Target) -> str:
+        """Translate text, sharing the request with identical concurrent ones."""
+        if self.single_flight is not None:
+            key = self._flight_key("translate", target, text.strip(), target_language, self.glossary_digest)
+            return self.single_flight.call(key, lambda: self._translate(text, target_language, target))
+        return self._translate(text, target_language, target)
+
+    def _translation_request(self, text: str, target_language: str) -> HumanMessage:
+        """Build the request for a translation, with the glossary entries of its terms."""
+        instructions = self.glossary.instructions(text) if self.glossary is not None else ""
+        return HumanMessage(content=f"{instructions}Translate the following text to {target_language}:\n{text}")
+
+    def _translate(self, text: str, target_language: str, target: Optional[Target] = None) -> str:
+        """Translate text, without sharing the request."""
         logger.debug("Translating text: %s to language: %s", text, target_language)
 
         system_message = SystemMessage(
@@ -187,10 +1102,10 @@ class LangChainAIService(AIServiceInterface):
                 "Return ONLY the translated text without any explanation or formatting."
             )
         )
-        human_message = HumanMessage(content=f"Translate the following text to {target_language}:\n{text}")
+        human_message = self._translation_request(text, target_language)
 
         logger.debug("Calling AI service for translation")
-        response = self.client.invoke([system_message, human_message])
+        response = self._invoke([system_message, human_message], "translate", target)
 
         logger.debug("Translated text: %s", response.content)
         return cast(str, response.content)
@@ -198,9 +1113,34 @@ class LangChainAIService(AIServiceInterface):
     def translate_stream(self, text: str, target_language: str) -> Iterator[str]:
         """Translate text to a target language with streaming.
 
+        Identical concurrent translations share one request, whose tokens are
+        passed on to every caller. Parts already in the target language, and
+        with the translation memory on, remembered paragraphs, are yielded at
+        once and only the others are sent to the model.
+
         Yields:
             str: Tokens as they are generated by the AI
         """
+        target = self._route("translate")
+        segments = self._translate_segments(
+            text,
+            target_language,
+            lambda segment: self._shared_translate_stream(segment, target_language, target),
+            target,
+        )
+        if segments is not None:
+            return segments
+        return self._shared_translate_stream(text, target_language, target)
+
+    def _shared_translate_stream(self, text: str, target_language: str, target: Target) -> Iterator[str]:
+        """Translate text with streaming, sharing the request with identical concurrent ones."""
+        if self.single_flight is not None:
+            key = self._flight_key("translate", target, text.strip(), target_language, self.glossary_digest)
+            return self.single_flight.stream(key, lambda: self._translate_stream(text, target_language, target))
+        return self._translate_stream(text, target_language, target)
+
+    def _translate_stream(self, text: str, target_language: str, target: Optional[Target] = None) -> Iterator[str]:
+        """Translate text with streaming, without sharing the request."""
         logger.debug("Translating text (streaming): %s to language: %s", text, target_language)
 
         system_message = SystemMessage(
@@ -210,34 +1150,19 @@ class LangChainAIService(AIServiceInterface):
                 "Return ONLY the translated text without any explanation or formatting."
             )
         )
-        human_message = HumanMessage(content=f"Translate the following text to {target_language}:\n{text}")
+        human_message = self._translation_request(text, target_language)
 
         logger.debug("Calling AI service for translation with streaming")
 
         # Use streaming API
-        # Check if client is ChatOpenAI by checking its class name to handle mocks properly
-        is_chat_openai = (
-            hasattr(self.client, "__class__")
-            and hasattr(self.client.__class__, "__name__")
-            and self.client.__class__.__name__ == "ChatOpenAI"
-        )
-
-        if hasattr(self.client, "stream") and is_chat_openai:
-            try:
-                stream = self.client.stream([system_message, human_message])
-                for chunk in stream:
-                    if hasattr(chunk, "content") and chunk.content:
-                        yield str(chunk.content)
-            except Exception:
-                # Fallback to invoke if streaming fails
-                logger.debug("Streaming failed, falling back to invoke")
-                response = self.client.invoke([system_message, human_message])
-                if hasattr(response, "content") and response.content:
-                    yield str(response.content)
+        target = target or self._route("translate")
+        if self._supports_streaming("translate", target):
+            # Interrupted streams resume from the partial output
+            yield from self._stream_with_resume([system_message, human_message], "translate", target)
         else:
             # Fallback for mock client or when streaming is not available
             try:
-                response = self.client.invoke([system_message, human_message])
+                response = self._invoke([system_message, human_message], "translate", target)
                 if hasattr(response, "content") and response.content:
                     yield str(response.content)
             except Exception:
@@ -0,0 +1,193 @@
+"""Bulk processing of JSONL requests with a pool of worker threads.
+
+Each input line is one request::
+
+    {"id": "greeting", "mode": "translate", "text": "Hello", "target": "japanese"}
+    {"mode": "command", "prompt": "list files by size"}
+    {"mode": "chat", "messages": [{"role": "user", "content": "Hi"}]}
+
+and produces one output line, ``{"id", "mode", "result"}``, or ``{"id",
+"mode", "error"}`` if the request failed. Requests without an id are
+identified by their line number. Results are written as soon as they
+complete, or in input order with ``ordered``; a failed request never stops
+the batch.
+
+All workers share one service, so the process pays for its start-up and
+connections once instead of once per request.
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+from .interfaces import AIServiceInterface
+
+DEFAULT_WORKERS = 4
+
+# Seconds between progress line updates
+PROGRESS_INTERVAL = 0.2
+
+
+class BatchSummary:
+    """Counts and throughput of a finished batch."""
+
+    def __init__(self, total: int, failed: int, elapsed: float) -> None:
+        """Initialize the summary.
+
+        Args:
+            total: Number of requests processed
+            failed: Number of requests that failed
+            elapsed: Wall-clock seconds the batch took
+        """
+        self.total = total
+        self.failed = failed
+        self.elapsed = elapsed
+
+    @property
+    def rate(self) -> float:
+        """Return the number of requests processed per second."""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        """Return the summary as printed at the end of a batch."""
+        return f"{self.total} requests ({self.failed} failed) in {self.elapsed:.1f}s, {self.rate:.1f} requests/s"
+
+
+def run_request(service: AIServiceInterface, request: Dict[str, Any]) -> str:
+    """Run one request and return its result.
+
+    Raises:
+        ValueError: If the request is malformed
+    """
+    mode = request.get("mode")
+    if mode == "command":
+        prompt = request.get("prompt", request.get("text"))
+        if not isinstance(prompt, str):
+            raise ValueError("A command request needs a 'prompt'")
+        return service.generate_command(prompt).strip()
+    if mode == "translate":
+        text, target = request.get("text"), request.get("target")
+        if not isinstance(text, str) or not isinstance(target, str):
+            raise ValueError("A translate request needs a 'text' and a 'target'")
+        return service.translate(text, target).strip()
+    if mode == "chat":
+        messages = request.get("messages")
+        if not isinstance(messages, list):
+            raise ValueError("A chat request needs a list of 'messages'")
+        return service.chat(messages)
+    raise ValueError(f"Unknown mode: {mode!r}")
+
+
+def process_line(service: AIServiceInterface, line: str, line_number: int) -> Dict[str, Any]:
+    """Run the request on one input line, catching any error.
+
+    Returns:
+        The output record of the request
+    """
+    request_id: Any = line_number
+    mode = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        request_id = request.get("id", line_number)
+        mode = request.get("mode")
+        return {"id": request_id, "mode": mode, "result": run_request(service, request)}
+    except Exception as e:
+        return {"id": request_id, "mode": mode, "error": str(e) or type(e).__name__}
+
+
+class _Progress:
+    """Progress line rewritten in place on a terminal."""
+
+    def __init__(self, stream: Optional[TextIO]) -> None:
+        """Initialize the progress line; nothing is shown without a stream."""
+        self.stream = stream
+        self.started = time.monotonic()
+        self.shown = 0.0
+
+    def update(self, done: int, failed: int) -> None:
+        """Show the number of finished requests, at most every ``PROGRESS_INTERVAL``."""
+        now = time.monotonic()
+        if self.stream is None or now - self.shown < PROGRESS_INTERVAL:
+            return
+        self.shown = now
+        rate = done / (now - self.started) if now > self.started else 0.0
+        self.stream.write(f"\r{done} done, {failed} failed, {rate:.1f} requests/s")
+        self.stream.flush()
+
+    def clear(self) -> None:
+        """Erase the progress line."""
+        if self.stream is not None and self.shown:
+            self.stream.write("\r\x1b[K")
+            self.stream.flush()
+
+
+def run_batch(
+    service: AIServiceInterface,
+    lines: Iterable[str],
+    output: TextIO,
+    workers: int = DEFAULT_WORKERS,
+    ordered: bool = False,
+    progress: Optional[TextIO] = None,
+) -> BatchSummary:
+    """Process JSONL requests concurrently, writing a JSONL result for each.
+
+    Input is read lazily, with at most two requests per worker queued, so
+    arbitrarily long inputs run in constant memory (less the results held
+    back for ordering).
+
+    Args:
+        service: Service shared by every worker
+        lines: Input lines; blank lines are skipped
+        output: Stream the results are written to
+        workers: Number of requests processed at the same time
+        ordered: Write results in input order instead of as they complete
+        progress: Stream for a progress line updated in place, if any
+
+    Returns:
+        Counts and throughput of the batch
+    """
+    started = time.monotonic()
+    status = _Progress(progress)
+    pending: Dict["Future[Dict[str, Any]]", int] = {}
+    held: Dict[int, Dict[str, Any]] = {}
+    next_to_write = 0
+    done = failed = 0
+
+    def write(record: Dict[str, Any]) -> None:
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    def collect(block_until: int) -> None:
+        # Wait until at most ``block_until`` requests are pending, writing finished ones
+        nonlocal next_to_write, done, failed
+        while len(pending) > block_until:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                sequence = pending.pop(future)
+                record = future.result()
+                done += 1
+                failed += "error" in record
+                if not ordered:
+                    write(record)
+                    continue
+                held[sequence] = record
+                while next_to_write in held:
+                    write(held.pop(next_to_write))
+                    next_to_write += 1
+            status.update(done, failed)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as executor:
+        sequence = 0
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            collect(2 * max(1, workers) - 1)
+            pending[executor.submit(process_line, service, line, line_number)] = sequence
+            sequence += 1
+        collect(0)
+
+    status.clear()
+    return BatchSummary(done, failed, time.monotonic() - started)
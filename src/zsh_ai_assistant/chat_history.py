@@ -1,7 +1,8 @@
 """Chat history implementation for the zsh-ai-assistant."""
 
-from typing import List, Dict, Any
+from typing import List, Sequence
 from .interfaces import ChatHistoryInterface
+from .messages import AIMessage, BaseMessage, HumanMessage, MessageView
 
 
 class InMemoryChatHistory(ChatHistoryInterface):
@@ -9,23 +10,24 @@ class InMemoryChatHistory(ChatHistoryInterface):
 
     def __init__(self) -> None:
         """Initialize empty chat history."""
-        self.messages: List[Dict[str, Any]] = []
+        self.messages: List[BaseMessage] = []
 
     def add_user_message(self, message: str) -> None:
         """Add a user message to the chat history."""
-        self.messages.append({"role": "user", "content": message})
+        self.messages.append(HumanMessage(message))
 
     def add_ai_message(self, message: str) -> None:
         """Add an AI message to the chat history."""
-        self.messages.append({"role": "assistant", "content": message})
+        self.messages.append(AIMessage(message))
 
-    def get_messages(self) -> List[Dict[str, Any]]:
-        """Get the current chat history as a list of message dictionaries."""
-        return self.messages.copy()
+    def get_messages(self) -> Sequence[BaseMessage]:
+        """Get a read-only snapshot of the current chat history, in O(1)."""
+        return MessageView(self.messages, len(self.messages))
 
     def clear(self) -> None:
         """Clear the chat history."""
-        self.messages.clear()
+        # A new list, so snapshots taken before stay intact
+        self.messages = []
 
     def __len__(self) -> int:
         """Return the number of messages in the chat history."""
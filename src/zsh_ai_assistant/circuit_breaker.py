@@ -0,0 +1,119 @@
+"""Circuit breaker failing fast while a backend is unreachable."""
+
+import logging
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple, Type
+
+from .state import SharedStateFile
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that is known to be unreachable."""
+
+
+def _connection_error_types() -> Tuple[Type[BaseException], ...]:
+    """Return the exception types that mean the backend could not be reached.
+
+    Client libraries are only consulted if they are already imported, so the
+    check never adds import time to the fast-failure path.
+    """
+    # OSError covers refused and reset connections, timeouts, DNS failures
+    # (socket.gaierror) and unreachable networks
+    types: Tuple[Type[BaseException], ...] = (OSError,)
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        types += (openai.APIConnectionError,)
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        types += (httpx.TransportError,)
+    return types
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Check whether an error, or an error it was raised from, is a connection failure."""
+    types = _connection_error_types()
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        if isinstance(current, types):
+            return True
+        seen.add(id(current))
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker persisted in a shared state file.
+
+    After ``failure_threshold`` consecutive connection failures the circuit
+    opens and calls fail immediately for ``cooldown`` seconds. Then a single
+    caller is let through as a half-open probe: success closes the circuit,
+    failure opens it for another cool-down.
+    """
+
+    def __init__(self, state: SharedStateFile, failure_threshold: int = 3, cooldown: float = 30.0) -> None:
+        """Initialize the circuit breaker.
+
+        Args:
+            state: Shared state file holding the per-endpoint circuits
+            failure_threshold: Consecutive connection failures that open the circuit
+            cooldown: Seconds an open circuit fails fast before allowing a probe
+        """
+        self.state = state
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    def _remaining(self, entry: Dict[str, Any], now: float) -> float:
+        """Return how long an open circuit keeps failing fast."""
+        opened_at = entry.get("opened_at")
+        if opened_at is None:
+            return 0.0
+        return max(0.0, float(opened_at) + self.cooldown - now)
+
+    def before_call(self, key: str) -> None:
+        """Check that a call to an endpoint may proceed.
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit is open
+        """
+        entry = self.state.read().get(key)
+        if not entry or entry.get("opened_at") is None:
+            return
+
+        now = time.time()
+        remaining = self._remaining(entry, now)
+        if remaining <= 0:
+            # Cool-down is over: let exactly one caller probe the endpoint
+            with self.state.update() as circuits:
+                entry = circuits.get(key, {})
+                if entry.get("opened_at") is None:
+                    # Another process closed the circuit meanwhile
+                    return
+                remaining = self._remaining(entry, now)
+                if remaining <= 0:
+                    logger.info("Circuit for %s half-open, probing", key)
+                    # Re-arm the cool-down so concurrent callers keep failing fast
+                    entry["opened_at"] = now
+                    return
+        raise CircuitOpenError(f"Backend {key} is unreachable, not retrying for {max(remaining, 0.0):.0f}s")
+
+    def record_success(self, key: str) -> None:
+        """Close the circuit of an endpoint that answered."""
+        if not self.state.read().get(key):
+            return
+        with self.state.update() as circuits:
+            if circuits.pop(key, None) is not None:
+                logger.info("Circuit for %s closed", key)
+
+    def record_failure(self, key: str) -> None:
+        """Count a connection failure, opening the circuit at the threshold."""
+        with self.state.update() as circuits:
+            entry = circuits.setdefault(key, {"failures": 0, "opened_at": None})
+            entry["failures"] = entry.get("failures", 0) + 1
+            if entry["failures"] >= self.failure_threshold:
+                entry["opened_at"] = time.time()
+                logger.warning("Circuit for %s opened after %d failures", key, entry["failures"])
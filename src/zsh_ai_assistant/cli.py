@@ -5,7 +5,8 @@ import json
 import os
 import sys
 import logging
-from typing import List, Dict, Any, Callable, TypeVar
+import time
+from typing import List, Dict, Any, Callable, Optional, TypeVar
 
 # Add the src directory to Python path to ensure module can be imported
 # This allows the script to be run from any directory
@@ -17,6 +18,13 @@ if _src_dir not in sys.path:
 from zsh_ai_assistant.config import AIConfig, setup_logging  # noqa: E402
 from zsh_ai_assistant.ai_service import LangChainAIService  # noqa: E402
 from zsh_ai_assistant.interactive_chat import InteractiveChat  # noqa: E402
+from zsh_ai_assistant.output import CoalescingWriter  # noqa: E402
+from zsh_ai_assistant import session_log, sqlite_history  # noqa: E402
+from zsh_ai_assistant.batch import DEFAULT_WORKERS, run_batch  # noqa: E402
+from zsh_ai_assistant.file_translation import journal_path, translate_file  # noqa: E402
+from zsh_ai_assistant.segmentation import read_segments  # noqa: E402
+from zsh_ai_assistant.translation import parse_targets, translate_concurrently, translate_incrementally  # noqa: E402
+from zsh_ai_assistant.markdown import BOLD, NORMAL_INTENSITY  # noqa: E402
 
 # Get logger
 logger = logging.getLogger(__name__)
@@ -86,13 +94,24 @@ def _execute_service_method(service_method: Callable[..., T], *args: Any, **kwar
         sys.exit(1)
 
 
-def generate_command(prompt: str, test_mode: bool = False) -> str:
-    """Generate a shell command from a natural language prompt."""
+def generate_command(prompt: str, test_mode: bool = False, directory: Optional[str] = None) -> str:
+    """Generate a shell command from a natural language prompt.
+
+    Args:
+        prompt: Natural language request
+        test_mode: If True, use mock client for testing
+        directory: Directory the command runs in, if not the working directory
+
+    Returns:
+        The generated command
+    """
     logger.debug("Generate command called with prompt: %s", prompt)
 
     # Create AI service
     service = _get_ai_service(test_mode)
 
+    service.working_directory = directory
+
     # Generate command
     logger.info("Generating command from prompt")
     command = _execute_service_method(service.generate_command, prompt)
@@ -222,10 +241,15 @@ def translate(text: str, target_language: str, test_mode: bool = False, stream:
         logger.info("Using streaming translation")
         try:
             translation_parts = []
-            for chunk in _execute_service_method(service.translate_stream, text, target_language):
-                translation_parts.append(chunk)
-                # Print chunk as it arrives for streaming effect
-                print(chunk, end="", flush=True)
+            # Chunks are written in frames; on a terminal, complete lines go out at once
+            with CoalescingWriter(
+                interval=service.config.output_flush_interval,
+                max_latency=service.config.output_flush_interval,
+                flush_on_newline=sys.stdout.isatty(),
+            ) as writer:
+                for chunk in _execute_service_method(service.translate_stream, text, target_language):
+                    translation_parts.append(chunk)
+                    writer.write(chunk)
             translation = "".join(translation_parts)
             # Print newline after translation to separate from next prompt
             print(flush=True)
@@ -240,8 +264,194 @@ def translate(text: str, target_language: str, test_mode: bool = False, stream:
     return translation.strip()
 
 
-def run_interactive_chat(test_mode: bool = False) -> None:
-    """Run interactive chat session."""
+def translate_stdin(target_language: str, test_mode: bool = False) -> None:
+    """Translate stdin as it is read, without waiting for the end of the input.
+
+    Input is cut into segments at paragraph and sentence ends or when it
+    pauses, and translations are printed in input order as they arrive.
+    Segments whose translation fails are printed untranslated.
+
+    Args:
+        target_language: Target language
+        test_mode: If True, use mock client for testing
+    """
+    service = _get_ai_service(test_mode)
+    logger.info("Translating stdin as it is read")
+
+    def report(piece: str, error: BaseException) -> None:
+        logger.error("Error translating %d characters: %s", len(piece), error)
+        print(f"# Error: {error}", file=sys.stderr)
+
+    pieces = read_segments(sys.stdin.fileno(), service.config.follow_idle_timeout)
+    last = ""
+    with CoalescingWriter(
+        interval=service.config.output_flush_interval,
+        max_latency=service.config.output_flush_interval,
+        flush_on_newline=True,
+    ) as writer:
+        for chunk in translate_incrementally(
+            pieces,
+            lambda text: service.translate_stream(text, target_language),
+            service.config.translation_workers,
+            report,
+        ):
+            writer.write(chunk)
+            last = chunk or last
+    if not last.endswith("\n"):
+        print(flush=True)
+
+
+def translate_to_file(input_path: str, output_path: str, target_language: str, test_mode: bool = False) -> None:
+    """Translate a file into another, resuming an interrupted run of the same translation.
+
+    Args:
+        input_path: File to translate
+        output_path: File the translation is written to
+        target_language: Target language
+        test_mode: If True, use mock client for testing
+    """
+    service = _get_ai_service(test_mode)
+    logger.info("Translating %s to %s", input_path, output_path)
+    status = sys.stderr if sys.stderr.isatty() else None
+
+    def progress(done: int, total: int) -> None:
+        if status is not None:
+            status.write(f"\r{done * 100 // max(1, total)}% translated")
+            status.flush()
+
+    try:
+        resumed_from = translate_file(
+            input_path,
+            output_path,
+            target_language,
+            lambda text: service.translate_stream(text, target_language),
+            service.config.translation_workers,
+            progress=progress,
+        )
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; run the same command again to resume ({journal_path(output_path)})", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        logger.error("Error translating %s: %s", input_path, e)
+        print(f"\n# Error: {e}; run the same command again to resume", file=sys.stderr)
+        sys.exit(1)
+    if status is not None:
+        status.write("\r\x1b[K")
+    resumed = f" (resumed at byte {resumed_from})" if resumed_from else ""
+    print(f"Wrote {output_path}{resumed}", file=sys.stderr)
+
+
+def translate_many(text: str, targets: List[str], test_mode: bool = False, output_dir: Optional[str] = None) -> int:
+    """Translate text into several languages concurrently.
+
+    All languages are translated at the same time by one service. Each
+    translation is printed as a labeled section, in the order given and
+    streamed as it arrives, or written to ``<output_dir>/<language>.txt``.
+
+    Args:
+        text: Text to translate
+        targets: Target languages
+        test_mode: If True, use mock client for testing
+        output_dir: Directory to write one file per language to, if any
+
+    Returns:
+        The number of languages whose translation failed
+    """
+    service = _get_ai_service(test_mode)
+    logger.info("Translating text into %d languages", len(targets))
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    failed = 0
+    for index, (target, chunks) in enumerate(translate_concurrently(service, text, targets)):
+        try:
+            if output_dir is not None:
+                path = os.path.join(output_dir, target.replace(os.sep, "_") + ".txt")
+                translation = "".join(chunks).strip()
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(translation + "\n")
+                print(f"{target}: {path}", file=sys.stderr)
+                continue
+            print(("\n" if index else "") + f"=== {target} ===", flush=True)
+            with CoalescingWriter(
+                interval=service.config.output_flush_interval,
+                max_latency=service.config.output_flush_interval,
+                flush_on_newline=sys.stdout.isatty(),
+            ) as writer:
+                for chunk in chunks:
+                    writer.write(chunk)
+            print(flush=True)
+        except Exception as e:
+            logger.error("Error translating to %s: %s", target, e)
+            print(f"# Error ({target}): {e}", file=sys.stderr)
+            failed += 1
+    return failed
+
+
+def batch(
+    path: Optional[str] = None, workers: int = DEFAULT_WORKERS, ordered: bool = False, test_mode: bool = False
+) -> None:
+    """Process JSONL requests from a file or stdin, writing JSONL results to stdout.
+
+    Args:
+        path: Input file; stdin if None or "-"
+        workers: Number of requests processed at the same time
+        ordered: Write results in input order instead of as they complete
+        test_mode: If True, use mock client for testing
+    """
+    service = _get_ai_service(test_mode)
+    progress = sys.stderr if sys.stderr.isatty() else None
+    if path is None or path == "-":
+        summary = run_batch(service, sys.stdin, sys.stdout, workers=workers, ordered=ordered, progress=progress)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            summary = run_batch(service, f, sys.stdout, workers=workers, ordered=ordered, progress=progress)
+    print(f"Batch: {summary}", file=sys.stderr)
+    if service.translation_stats.segments:
+        print(f"Translation: {service.translation_stats}", file=sys.stderr)
+
+
+def list_chat_sessions() -> str:
+    """List the saved chat sessions, most recent first."""
+    config = AIConfig()
+    store = sqlite_history if config.history_store == "sqlite" else session_log
+    sessions = store.list_sessions(config.history_dir)
+    if not sessions:
+        return "No saved chat sessions."
+    return "\n".join(
+        f"{session.session_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(session.updated))}"
+        f"  {session.messages:>4} messages  {session.title}"
+        for session in sessions
+    )
+
+
+def search_history(query: str, limit: int = 20) -> str:
+    """Search every saved chat session, best matches first.
+
+    Sessions saved as append-only logs are copied into the history database
+    first; only messages added since the previous search are read.
+    """
+    config = AIConfig()
+    setup_logging(config.debug)
+    sqlite_history.import_logs(config.history_dir)
+    highlight = (BOLD, NORMAL_INTENSITY) if sys.stdout.isatty() and not os.environ.get("NO_COLOR") else ("[", "]")
+    results = sqlite_history.search(config.history_dir, query, limit=limit, highlight=highlight)
+    if not results:
+        return "No matching messages."
+    return "\n".join(
+        f"{result.session_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(result.created))}"
+        f"  {result.role}: {' '.join(result.snippet.split())}"
+        for result in results
+    )
+
+
+def run_interactive_chat(test_mode: bool = False, resume: Optional[str] = None) -> None:
+    """Run interactive chat session.
+
+    Args:
+        test_mode: Use the mock client
+        resume: Id of a saved session to continue, or "" for the latest one
+    """
     # Load configuration first to setup logging
     config = AIConfig()
     setup_logging(config.debug)
@@ -249,7 +459,7 @@ def run_interactive_chat(test_mode: bool = False) -> None:
 
     try:
         logger.info("Starting interactive chat session")
-        chat = InteractiveChat(test_mode=test_mode)
+        chat = InteractiveChat(test_mode=test_mode, resume=resume)
         chat.run_interactive_chat()
     except Exception as e:
         logger.error("Error in interactive chat: %s", e)
@@ -257,6 +467,29 @@ def run_interactive_chat(test_mode: bool = False) -> None:
         sys.exit(1)
 
 
+TRANSLATE_USAGE = (
+    "Usage: translate <target_language>[,...] [text] [--output-dir DIR] [--glossary FILE]\n"
+    "       translate <target_language> --follow [--glossary FILE]\n"
+    "       translate <target_language> --input FILE --output FILE [--glossary FILE]"
+)
+
+
+def _pop_option(args: List[str], name: str) -> Optional[str]:
+    """Remove an option and its value from ``args``, returning the value.
+
+    Raises:
+        ValueError: If the option has no value
+    """
+    if name not in args:
+        return None
+    index = args.index(name)
+    if index + 1 >= len(args):
+        raise ValueError(f"{name} needs a value")
+    value = args[index + 1]
+    del args[index : index + 2]
+    return value
+
+
 def main() -> None:
     """Main entry point for CLI utilities."""
     # Check for test mode using environment variable
@@ -264,13 +497,15 @@ def main() -> None:
 
     try:
         if len(sys.argv) > 1 and sys.argv[1] == "command":
-            # Command generation mode
-            if len(sys.argv) > 2:
-                prompt = sys.argv[2]
+            # Command generation mode; the plugin runs from its own directory and passes the caller's
+            args = sys.argv[2:]
+            directory = _pop_option(args, "--cwd")
+            if args:
+                prompt = args[0]
             else:
                 prompt = sys.stdin.read().strip()
 
-            result = generate_command(prompt, test_mode)
+            result = generate_command(prompt, test_mode, directory)
             print(result)
 
         elif len(sys.argv) > 1 and sys.argv[1] == "chat":
@@ -287,20 +522,87 @@ def main() -> None:
 
         elif len(sys.argv) > 1 and sys.argv[1] == "interactive":
             # Interactive chat mode
-            run_interactive_chat(test_mode)
+            options = sys.argv[2:]
+            if options == ["--list"]:
+                print(list_chat_sessions())
+            elif options[:1] == ["--resume"] and len(options) <= 2:
+                run_interactive_chat(test_mode, resume=options[1] if len(options) == 2 else "")
+            elif options:
+                print("Usage: interactive [--resume [session_id] | --list]", file=sys.stderr)
+                sys.exit(1)
+            else:
+                run_interactive_chat(test_mode)
+
+        elif len(sys.argv) > 1 and sys.argv[1] == "history":
+            # Saved chat history
+            options = sys.argv[2:]
+            limit = 20
+            if len(options) > 2 and options[-2] == "--limit":
+                limit = int(options[-1])
+                options = options[:-2]
+            if len(options) < 2 or options[0] != "search":
+                print("Usage: history search <query> [--limit N]", file=sys.stderr)
+                sys.exit(1)
+            print(search_history(" ".join(options[1:]), limit=limit))
+
+        elif len(sys.argv) > 1 and sys.argv[1] == "batch":
+            # Bulk JSONL requests
+            options = sys.argv[2:]
+            workers = DEFAULT_WORKERS
+            ordered = "--ordered" in options
+            options = [option for option in options if option != "--ordered"]
+            if "--workers" in options[:-1]:
+                index = options.index("--workers")
+                workers = int(options[index + 1])
+                del options[index : index + 2]
+            if len(options) > 1 or options[:1] == ["--workers"]:
+                print("Usage: batch [file] [--workers N] [--ordered]", file=sys.stderr)
+                sys.exit(1)
+            batch(options[0] if options else None, workers=workers, ordered=ordered, test_mode=test_mode)
 
         elif len(sys.argv) > 1 and sys.argv[1] == "translate":
             # Translation mode
             if len(sys.argv) < 3:
-                print("Usage: translate <target_language> [text]", file=sys.stderr)
+                print(TRANSLATE_USAGE, file=sys.stderr)
+                sys.exit(1)
+            args = sys.argv[2:]
+            follow = "--follow" in args
+            args = [arg for arg in args if arg != "--follow"]
+            output_dir = _pop_option(args, "--output-dir")
+            glossary = _pop_option(args, "--glossary")
+            input_path = _pop_option(args, "--input")
+            output_path = _pop_option(args, "--output")
+            if not args:
+                print(TRANSLATE_USAGE, file=sys.stderr)
                 sys.exit(1)
-            target_language = sys.argv[2]
-            if len(sys.argv) > 3:
-                text = sys.argv[3]
+            if glossary is not None:
+                # Read by the service's configuration
+                os.environ["AI_GLOSSARY"] = glossary
+            target_language = args[0]
+            targets = parse_targets(target_language)
+            if input_path is not None or output_path is not None:
+                if len(targets) != 1 or input_path is None or output_path is None or follow or len(args) > 1:
+                    print(TRANSLATE_USAGE, file=sys.stderr)
+                    sys.exit(1)
+                translate_to_file(input_path, output_path, targets[0], test_mode)
+                return
+            if follow:
+                if len(targets) != 1 or output_dir is not None or len(args) > 1:
+                    print(TRANSLATE_USAGE, file=sys.stderr)
+                    sys.exit(1)
+                translate_stdin(targets[0], test_mode)
+                return
+            if len(targets) > 1 or output_dir is not None:
+                text = args[1] if len(args) > 1 else sys.stdin.read().strip()
+                if translate_many(text, targets, test_mode, output_dir=output_dir):
+                    sys.exit(1)
+                return
+            if len(args) > 1:
+                text = args[1]
             else:
                 text = sys.stdin.read().strip()
-            # Streaming is enabled by default when text is from stdin (len(sys.argv) == 3)
-            stream = len(sys.argv) == 3
+            # Streaming is enabled by default when text is from stdin
+            stream = len(args) == 1
             result = translate(text, target_language, test_mode, stream=stream)
             # Only print result if not in streaming mode (streaming prints as it goes)
             if not stream:
@@ -314,8 +616,19 @@ def main() -> None:
                 "  history-to-json - Convert history to JSON " "(reads from stdin)",
                 file=sys.stderr,
             )
-            print("  interactive - Run interactive chat session", file=sys.stderr)
-            print("  translate <target_language> <text> - Translate text to target language", file=sys.stderr)
+            print("  interactive [--resume [session_id] | --list] - Run interactive chat session", file=sys.stderr)
+            print("  history search <query> [--limit N] - Search saved chat sessions", file=sys.stderr)
+            print(
+                "  translate <target_language>[,...] <text> [--output-dir DIR] [--glossary FILE]"
+                " - Translate text to target languages",
+                file=sys.stderr,
+            )
+            print("  translate <target_language> --follow - Translate stdin as it is read", file=sys.stderr)
+            print(
+                "  translate <target_language> --input FILE --output FILE - Translate a file, resumably",
+                file=sys.stderr,
+            )
+            print("  batch [file] [--workers N] [--ordered] - Process JSONL requests (reads stdin)", file=sys.stderr)
             sys.exit(1)
     except Exception as e:
         print(f"Error: {e}")
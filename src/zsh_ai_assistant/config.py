@@ -8,10 +8,221 @@ Environment Variables:
     AI_TEMPERATURE: Temperature for AI responses (default: 0.7)
     AI_MAX_TOKENS: Maximum tokens for AI responses (default: 1000)
     AI_DEBUG: Enable debug logging (default: False)
+    AI_CLIENT: Client library, "langchain" for ChatOpenAI or "http" for the
+    built-in OpenAI-compatible HTTP client, which starts much faster
+    (default: langchain)
+    AI_OUTPUT_FLUSH_MS: Milliseconds streamed output is buffered before it is
+    written to the terminal; 0 writes every token (default: 16)
+    AI_RENDER_MARKDOWN: Render markdown in interactive chat answers when the
+    output is a terminal and NO_COLOR is not set (default: True)
+    AI_BACKEND_PROFILE: Backend profile, "openai" or "llamacpp" (default: openai)
+    AI_LLAMACPP_SLOTS: Number of llama.cpp server slots to spread sessions over
+    (default: 0, let the server pick)
+    AI_LLAMACPP_SLOT: Pin every request to this llama.cpp slot (default: unset)
+
+Per-mode profiles (MODE is COMMAND, CHAT or TRANSLATE):
+    AI_<MODE>_MODEL: Model for the mode (default: AI_MODEL)
+    AI_<MODE>_BASE_URL: Endpoint for the mode (default: OPENAI_BASE_URL)
+    AI_<MODE>_API_KEY: API key for the mode's endpoint (default: OPENAI_API_KEY)
+    AI_<MODE>_FALLBACK_MODEL: Faster model used while the primary one is too slow
+    (default: unset, no fallback)
+    AI_<MODE>_FALLBACK_BASE_URL: Endpoint of the fallback model
+    (default: AI_<MODE>_BASE_URL)
+    AI_<MODE>_TTFT_SLO_MS: Time-to-first-token SLO in milliseconds above which
+    the fallback model is used (default: unset, no fallback)
+    AI_<MODE>_CONNECT_TIMEOUT: Seconds to wait for a connection
+    (default: AI_CONNECT_TIMEOUT)
+    AI_<MODE>_READ_TIMEOUT: Seconds to wait between received bytes
+    (default: AI_READ_TIMEOUT)
+    AI_<MODE>_TIMEOUT: Total seconds for a request (default: AI_TIMEOUT)
+    AI_<MODE>_MAX_TOKENS: Maximum tokens for the mode
+    (default: AI_MAX_TOKENS, capped at 256 for COMMAND)
+    AI_<MODE>_TEMPERATURE: Temperature for the mode (default: AI_TEMPERATURE)
+    AI_<MODE>_STOP: Stop sequence, or a JSON list of them; backslash escapes
+    such as \\n are decoded (default: none)
+
+Timeouts and failure handling:
+    AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT, AI_TIMEOUT: Default timeouts in
+    seconds for every mode (default: client library defaults)
+    AI_MAX_RETRIES: Client-side retries per request (default: client library default)
+    AI_CIRCUIT_FAILURE_THRESHOLD: Consecutive connection failures after which
+    requests fail fast; 0 disables the circuit breaker (default: 3)
+    AI_CIRCUIT_COOLDOWN: Seconds requests fail fast before a probe is allowed
+    (default: 30)
+
+Interrupted streams:
+    AI_STREAM_RETRIES: Attempts to resume a broken stream (default: 2)
+    AI_STREAM_RETRY_BACKOFF: Base backoff in seconds, doubled per attempt and
+    jittered (default: 0.5)
+    AI_RESUME_STRATEGY: "prefix" sends the partial answer as an assistant
+    prefix, "instruct" also asks the model to continue
+    (default: prefix for llamacpp, instruct otherwise)
+
+Shared state:
+    AI_STATE_DIR: Directory for state shared between processes
+    (default: ~/.zsh/zsh-ai-assistant/state)
+    AI_LATENCY_EWMA_ALPHA: Weight of a new latency sample (default: 0.3)
+    AI_FALLBACK_PROBE_INTERVAL: Seconds before a slow primary model is probed
+    again (default: 60)
+    AI_SINGLE_FLIGHT: Share one request between shells asking for the same
+    command or translation at the same time (default: False)
+
+Host-wide rate limits (shared by every shell; 0 disables a limit):
+    AI_RATE_LIMIT_RPS: Requests per second (default: 0)
+    AI_RATE_LIMIT_TPM: Estimated prompt and completion tokens per minute
+    (default: 0)
+    AI_MAX_IN_FLIGHT: Requests running at the same time, at most 64; bulk
+    translations leave the last one to commands and chat (default: 0)
+
+Command context:
+    AI_COMMAND_CONTEXT: Send a summary of the working directory (entries,
+    project type, git branch and changes) with command requests
+    (default: False)
+    AI_COMMAND_CONTEXT_DEADLINE_MS: Milliseconds gathering a summary that is
+    not cached yet may take; what is not ready is left out (default: 25)
+
+Translation:
+    AI_LANGUAGE_DETECTION: Pass paragraphs and lines already in the target
+    language through without sending them to the model (default: True)
+    AI_TRANSLATION_MEMORY: Remember translated paragraphs in the state
+    directory and only send new or changed ones to the model (default: False)
+    AI_TRANSLATION_MEMORY_FUZZY: Similarity from 0 to 1 above which the
+    translation of a slightly different paragraph is reused; 0 reuses only
+    identical paragraphs (default: 0.95)
+    AI_TRANSLATION_WORKERS: Paragraphs sent to the model at the same time
+    when the translation memory is on or input is followed (default: 4)
+    AI_FOLLOW_IDLE_MS: Milliseconds ``translate --follow`` waits for more
+    input before translating what it has read (default: 500)
+    AI_GLOSSARY: Glossary file of tab-separated terms and translations; the
+    entries whose terms occur in a text are added to its translation prompt
+    (default: unset)
+
+Chat sessions:
+    AI_SAVE_HISTORY: Save interactive chat sessions so they can be resumed
+    with ``aiask --resume`` (default: True)
+    AI_HISTORY_DIR: Directory for saved chat sessions
+    (default: ~/.zsh/zsh-ai-assistant/sessions)
+    AI_HISTORY_STORE: "log" for one append-only log per session, or "sqlite"
+    for a single database searchable with ``cli.py history search``
+    (default: log)
+    AI_HISTORY_CONTEXT_MESSAGES: Number of the latest messages of a resumed
+    session sent back to the model (default: 40)
 """
 
+import codecs
+import json
 import os
 import logging
+from typing import Dict, List, Optional, Tuple
+
+# Modes the service distinguishes between
+MODES = ("command", "chat", "translate")
+
+# A shell command needs far fewer tokens than a chat answer
+DEFAULT_COMMAND_MAX_TOKENS = 256
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean flag from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("true", "1", "yes", "on")
+
+
+def _env_optional_float(name: str) -> Optional[float]:
+    """Read an optional float from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return None
+    return float(value)
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    """Read an optional integer from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return None
+    return int(value)
+
+
+def _env_stop_sequences(name: str) -> List[str]:
+    """Read stop sequences from the environment.
+
+    The value is either a JSON list of strings or a single sequence in which
+    backslash escapes (e.g. ``\\n``) are decoded.
+    """
+    value = os.getenv(name)
+    if not value:
+        return []
+    if value.startswith("["):
+        return [str(item) for item in json.loads(value)]
+    return [codecs.decode(value, "unicode_escape")]
+
+
+class ModeProfile:
+    """Model selection and generation parameters for a single mode."""
+
+    def __init__(
+        self,
+        model: str,
+        base_url: Optional[str],
+        api_key: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        stop: Optional[List[str]] = None,
+        fallback_model: Optional[str] = None,
+        fallback_base_url: Optional[str] = None,
+        ttft_slo_ms: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Initialize a mode profile.
+
+        Args:
+            model: Model to use
+            base_url: Base URL of the OpenAI-compatible endpoint serving the model
+            api_key: API key for the endpoint
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            stop: Stop sequences that end generation
+            fallback_model: Faster model to use while the primary one misses its SLO
+            fallback_base_url: Endpoint serving the fallback model
+            ttft_slo_ms: Time-to-first-token SLO of the primary model in milliseconds
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait between received bytes
+            timeout: Total seconds for a request
+        """
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.stop = stop or []
+        self.fallback_model = fallback_model
+        self.fallback_base_url = fallback_base_url or base_url
+        self.ttft_slo_ms = ttft_slo_ms
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.timeout = timeout
+
+    @property
+    def timeouts(self) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """Return the (connect, read, total) timeouts."""
+        return (self.connect_timeout, self.read_timeout, self.timeout)
+
+    @property
+    def has_fallback(self) -> bool:
+        """Check if latency-driven fallback is configured."""
+        return bool(self.fallback_model) and self.ttft_slo_ms is not None
+
+    def __repr__(self) -> str:
+        """Return string representation of the profile."""
+        return (
+            f"ModeProfile(model='{self.model}', base_url='{self.base_url}', "
+            f"max_tokens={self.max_tokens}, temperature={self.temperature}, stop={self.stop!r})"
+        )
 
 
 def setup_logging(debug: bool = False) -> logging.Logger:
@@ -58,18 +269,94 @@ class AIConfig:
         self.model = os.getenv("AI_MODEL", "gpt-3.5-turbo")
         self.temperature = float(os.getenv("AI_TEMPERATURE", "0.7"))
         self.max_tokens = int(os.getenv("AI_MAX_TOKENS", "1000"))
-        self.debug = os.getenv("AI_DEBUG", "").lower() in ("true", "1", "yes", "on")
+        self.debug = _env_bool("AI_DEBUG")
+        self.client = os.getenv("AI_CLIENT", "langchain").lower()
+        self.output_flush_interval = float(os.getenv("AI_OUTPUT_FLUSH_MS", "16")) / 1000
+        self.render_markdown = _env_bool("AI_RENDER_MARKDOWN", True)
+        self.backend_profile = os.getenv("AI_BACKEND_PROFILE", "openai").lower()
+        self.llamacpp_slots = int(os.getenv("AI_LLAMACPP_SLOTS", "0"))
+        self.llamacpp_slot = _env_optional_int("AI_LLAMACPP_SLOT")
+        self.connect_timeout = _env_optional_float("AI_CONNECT_TIMEOUT")
+        self.read_timeout = _env_optional_float("AI_READ_TIMEOUT")
+        self.timeout = _env_optional_float("AI_TIMEOUT")
+        self.max_retries = _env_optional_int("AI_MAX_RETRIES")
+        self.circuit_failure_threshold = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "3"))
+        self.circuit_cooldown = float(os.getenv("AI_CIRCUIT_COOLDOWN", "30"))
+        self.stream_retries = int(os.getenv("AI_STREAM_RETRIES", "2"))
+        self.stream_retry_backoff = float(os.getenv("AI_STREAM_RETRY_BACKOFF", "0.5"))
+        default_resume_strategy = "prefix" if self.backend_profile == "llamacpp" else "instruct"
+        self.resume_strategy = os.getenv("AI_RESUME_STRATEGY", default_resume_strategy).lower()
+        self.state_dir = os.path.expanduser(os.getenv("AI_STATE_DIR", "~/.zsh/zsh-ai-assistant/state"))
+        self.latency_ewma_alpha = float(os.getenv("AI_LATENCY_EWMA_ALPHA", "0.3"))
+        self.fallback_probe_interval = float(os.getenv("AI_FALLBACK_PROBE_INTERVAL", "60"))
+        self.single_flight = _env_bool("AI_SINGLE_FLIGHT")
+        self.rate_limit_rps = float(os.getenv("AI_RATE_LIMIT_RPS", "0"))
+        self.rate_limit_tpm = int(os.getenv("AI_RATE_LIMIT_TPM", "0"))
+        self.max_in_flight = int(os.getenv("AI_MAX_IN_FLIGHT", "0"))
+        self.command_context = _env_bool("AI_COMMAND_CONTEXT", False)
+        self.command_context_deadline = float(os.getenv("AI_COMMAND_CONTEXT_DEADLINE_MS", "25")) / 1000
+        self.language_detection = _env_bool("AI_LANGUAGE_DETECTION", True)
+        self.translation_memory = _env_bool("AI_TRANSLATION_MEMORY")
+        self.translation_memory_fuzzy = float(os.getenv("AI_TRANSLATION_MEMORY_FUZZY", "0.95"))
+        self.translation_workers = int(os.getenv("AI_TRANSLATION_WORKERS", "4"))
+        self.follow_idle_timeout = float(os.getenv("AI_FOLLOW_IDLE_MS", "500")) / 1000
+        self.glossary = os.path.expanduser(os.getenv("AI_GLOSSARY", "")) or None
+        self.save_history = _env_bool("AI_SAVE_HISTORY", True)
+        self.history_dir = os.path.expanduser(os.getenv("AI_HISTORY_DIR", "~/.zsh/zsh-ai-assistant/sessions"))
+        self.history_store = os.getenv("AI_HISTORY_STORE", "log").lower()
+        self.history_context_messages = int(os.getenv("AI_HISTORY_CONTEXT_MESSAGES", "40"))
+        self.profiles: Dict[str, ModeProfile] = {mode: self._load_profile(mode) for mode in MODES}
+
+    def _load_profile(self, mode: str) -> ModeProfile:
+        """Load the profile for a mode, falling back to the global settings."""
+        prefix = f"AI_{mode.upper()}_"
+        connect_timeout = _env_optional_float(prefix + "CONNECT_TIMEOUT")
+        read_timeout = _env_optional_float(prefix + "READ_TIMEOUT")
+        timeout = _env_optional_float(prefix + "TIMEOUT")
+        default_max_tokens = self.max_tokens
+        if mode == "command":
+            default_max_tokens = min(self.max_tokens, DEFAULT_COMMAND_MAX_TOKENS)
+        return ModeProfile(
+            model=os.getenv(prefix + "MODEL", self.model),
+            base_url=os.getenv(prefix + "BASE_URL", self.base_url),
+            api_key=os.getenv(prefix + "API_KEY", self.api_key),
+            max_tokens=int(os.getenv(prefix + "MAX_TOKENS", str(default_max_tokens))),
+            temperature=float(os.getenv(prefix + "TEMPERATURE", str(self.temperature))),
+            stop=_env_stop_sequences(prefix + "STOP"),
+            fallback_model=os.getenv(prefix + "FALLBACK_MODEL"),
+            fallback_base_url=os.getenv(prefix + "FALLBACK_BASE_URL"),
+            ttft_slo_ms=_env_optional_float(prefix + "TTFT_SLO_MS"),
+            connect_timeout=self.connect_timeout if connect_timeout is None else connect_timeout,
+            read_timeout=self.read_timeout if read_timeout is None else read_timeout,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+
+    def profile(self, mode: str) -> ModeProfile:
+        """Return the profile for a mode."""
+        return self.profiles[mode]
 
     @property
     def is_valid(self) -> bool:
         """Check if configuration is valid."""
         return bool(self.api_key and self.base_url)
 
+    @property
+    def rate_limited(self) -> bool:
+        """Check if any host-wide rate limit is configured."""
+        return self.rate_limit_rps > 0 or self.rate_limit_tpm > 0 or self.max_in_flight > 0
+
+    @property
+    def prompt_cache_enabled(self) -> bool:
+        """Check if server-side prompt caching (llama.cpp slots) is enabled."""
+        return self.backend_profile == "llamacpp"
+
     def __str__(self) -> str:
         """Return string representation of configuration."""
         return (
             f"AIConfig(api_key={'*' * 8 if self.api_key else 'None'}, "
             f"base_url='{self.base_url}', model='{self.model}', "
             f"temperature={self.temperature}, "
-            f"max_tokens={self.max_tokens}, debug={self.debug})"
+            f"max_tokens={self.max_tokens}, debug={self.debug}, "
+            f"client='{self.client}', "
+            f"backend_profile='{self.backend_profile}')"
         )
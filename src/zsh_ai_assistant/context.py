@@ -0,0 +1,252 @@
+"""Summary of the working directory sent with command requests.
+
+Knowing the files, the kind of project and the git state of the directory
+a command is asked for in lets the model use real file names and the
+project's own tools instead of guessing them. The summary is gathered on
+every Enter, so it has to be cheap:
+
+- It is cached in the state directory, keyed by the modification times of
+  the directory and of the repository's ``.git/index`` and ``.git/HEAD``.
+  Adding or removing a file, staging, committing and switching branches
+  all change one of them; editing a tracked file does not, so its dirty
+  state may lag until the next of those.
+- On a miss, ``git status`` runs in its own process while the directory is
+  listed, and whatever is not ready by the deadline is left out of the
+  summary, which is then not cached. A large repository thus costs at
+  most the deadline per request, never the full ``git status``.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple
+
+from .state import SharedStateFile
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Entries listed in the summary, directories first
+MAX_ENTRIES = 30
+# Directories whose summaries are cached; the least recently gathered are dropped
+MAX_CACHED_DIRECTORIES = 64
+
+# Files marking the kind of project a directory holds, in the order they are reported
+_PROJECT_MARKERS = (
+    ("pyproject.toml", "Python"),
+    ("setup.py", "Python"),
+    ("requirements.txt", "Python"),
+    ("package.json", "Node.js"),
+    ("Cargo.toml", "Rust"),
+    ("go.mod", "Go"),
+    ("pom.xml", "Java (Maven)"),
+    ("build.gradle", "Java (Gradle)"),
+    ("build.gradle.kts", "Kotlin (Gradle)"),
+    ("Gemfile", "Ruby"),
+    ("composer.json", "PHP"),
+    ("mix.exs", "Elixir"),
+    ("CMakeLists.txt", "CMake"),
+    ("Makefile", "Make"),
+    ("Dockerfile", "Docker"),
+    ("docker-compose.yml", "Docker Compose"),
+    ("compose.yaml", "Docker Compose"),
+)
+
+
+def find_git_dir(directory: str) -> Optional[str]:
+    """Return the git directory of the repository containing ``directory``, or None."""
+    current = directory
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return candidate
+        if os.path.isfile(candidate):
+            # A worktree or submodule: ".git" names the real git directory
+            try:
+                with open(candidate, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir:"):
+                return os.path.join(current, content[len("gitdir:") :].strip())
+            return None
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _mtime_ns(path: str) -> int:
+    """Return the modification time of a file, or 0 if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def read_branch(git_dir: str) -> Optional[str]:
+    """Return the checked out branch, a short commit id when detached, or None if unknown."""
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r", encoding="utf-8") as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    if head.startswith("ref:"):
+        return head[len("ref:") :].strip().removeprefix("refs/heads/")
+    return f"detached at {head[:7]}" if head else None
+
+
+def list_entries(directory: str) -> List[str]:
+    """Return the visible entries of a directory, directories first.
+
+    Args:
+        directory: Directory to list
+
+    Returns:
+        The entry names, with a trailing ``/`` for directories
+    """
+    directories: List[str] = []
+    files: List[str] = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            (directories if is_dir else files).append(entry.name + "/" if is_dir else entry.name)
+    return sorted(directories) + sorted(files)
+
+
+def project_types(entries: List[str]) -> List[str]:
+    """Return the kinds of project marked by directory entries, without duplicates."""
+    names = set(entries)
+    found: List[str] = []
+    for marker, kind in _PROJECT_MARKERS:
+        if marker in names and kind not in found:
+            found.append(kind)
+    return found
+
+
+def _git_status_counts(output: str) -> Tuple[int, int]:
+    """Return the numbers of changed and untracked files in ``git status --porcelain`` output."""
+    changed = untracked = 0
+    for line in output.splitlines():
+        if line.startswith("??"):
+            untracked += 1
+        elif line.strip():
+            changed += 1
+    return changed, untracked
+
+
+class DirectoryContext:
+    """Cached summaries of working directories."""
+
+    def __init__(self, cache_path: str, deadline: float) -> None:
+        """Initialize the context provider.
+
+        Args:
+            cache_path: JSON file of the cached summaries, shared between processes
+            deadline: Seconds a summary missing from the cache may take to gather
+        """
+        self.cache = SharedStateFile(cache_path)
+        self.deadline = deadline
+
+    def summary(self, directory: str) -> str:
+        """Return the summary of a directory, from the cache if it has not changed.
+
+        Args:
+            directory: Directory commands are generated for
+
+        Returns:
+            Lines describing the directory; parts that could not be read are left out
+        """
+        directory = os.path.abspath(directory)
+        git_dir = find_git_dir(directory)
+        key = [_mtime_ns(directory)]
+        if git_dir is not None:
+            key += [_mtime_ns(os.path.join(git_dir, "index")), _mtime_ns(os.path.join(git_dir, "HEAD"))]
+
+        cached = self.cache.read().get(directory)
+        if isinstance(cached, dict) and cached.get("key") == key:
+            return str(cached.get("summary", ""))
+
+        summary, complete = self._gather(directory, git_dir)
+        if complete:
+            try:
+                with self.cache.update() as data:
+                    data.pop(directory, None)
+                    data[directory] = {"key": key, "summary": summary}
+                    for stale in list(data)[: max(0, len(data) - MAX_CACHED_DIRECTORIES)]:
+                        del data[stale]
+            except OSError as e:
+                logger.debug("Could not cache the directory context: %s", e)
+        return summary
+
+    def _gather(self, directory: str, git_dir: Optional[str]) -> Tuple[str, bool]:
+        """Gather the summary of a directory within the deadline.
+
+        Returns:
+            The summary, and whether nothing was left out for lack of time
+        """
+        started = time.monotonic()
+        status: Optional["subprocess.Popen[str]"] = None
+        if git_dir is not None:
+            try:
+                status = subprocess.Popen(
+                    ["git", "status", "--porcelain", "--ignore-submodules"],
+                    cwd=directory,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    # Do not refresh the index, so a concurrent git command never finds it locked
+                    env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+                )
+            except OSError as e:
+                logger.debug("Could not run git status: %s", e)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        listing = executor.submit(list_entries, directory)
+        complete = True
+        lines = [f"Current directory: {directory}"]
+        try:
+            entries = listing.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            entries = []
+            complete = False
+        except OSError as e:
+            logger.debug("Could not list %s: %s", directory, e)
+            entries = []
+        finally:
+            executor.shutdown(wait=False)
+        # Markers are looked for in the whole listing, not only in the entries shown
+        kinds = project_types(entries)
+        if kinds:
+            lines.append("Project: " + ", ".join(kinds))
+        if entries:
+            shown = entries[:MAX_ENTRIES]
+            more = f" (and {len(entries) - len(shown)} more)" if len(entries) > len(shown) else ""
+            lines.append("Entries: " + ", ".join(shown) + more)
+
+        if git_dir is not None:
+            git = "Git: "
+            branch = read_branch(git_dir)
+            git += f"branch {branch}" if branch else "repository"
+            if status is not None:
+                try:
+                    output, _ = status.communicate(timeout=max(0.0, self.deadline - (time.monotonic() - started)))
+                    if status.returncode == 0:
+                        changed, untracked = _git_status_counts(output)
+                        git += f", {changed} changed, {untracked} untracked" if changed or untracked else ", clean"
+                except subprocess.TimeoutExpired:
+                    status.kill()
+                    status.wait()
+                    complete = False
+            lines.append(git)
+
+        logger.debug("Gathered directory context in %.1fms", (time.monotonic() - started) * 1000)
+        return "\n".join(lines), complete
@@ -0,0 +1,144 @@
+"""Translation of large files that resumes where an interrupted run stopped.
+
+The source file is memory-mapped and cut into paragraphs on its bytes, so
+only the paragraphs being translated are decoded. Translations are
+written to the output file in order as they complete. After each
+paragraph, the output is synced and a line recording how far the source
+and the output got is appended to a checkpoint journal next to the output,
+``<output>.journal``. A run interrupted by Ctrl-C, a crash or a failed
+request is resumed by running the same command again: the output is cut
+back to the last checkpoint and translation continues from there. The
+journal is removed once the whole file is translated.
+"""
+
+import json
+import logging
+import mmap
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from .segmentation import byte_segments
+from .translation import translate_incrementally
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(output: str) -> str:
+    """Return the path of the checkpoint journal of an output file."""
+    return output + JOURNAL_SUFFIX
+
+
+def _journal_header(source: str, target: str) -> Dict[str, Any]:
+    """Return what identifies a translation, so a journal is only resumed by the same one."""
+    stat = os.stat(source)
+    return {"source": os.path.abspath(source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "target": target}
+
+
+def _read_checkpoint(path: str, header: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Return the source offset and output size of the last checkpoint of a matching journal.
+
+    Returns:
+        The checkpoint, or None if there is no journal for this translation
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    try:
+        if json.loads(lines[0]) != header:
+            logger.info("Checkpoint journal %s is for another translation, starting over", path)
+            return None
+    except (IndexError, ValueError):
+        return None
+    checkpoint = (0, 0)
+    for line in lines[1:]:
+        # A line cut short by a crash is ignored
+        if line.endswith("\n"):
+            source_offset, output_size = line.split()
+            checkpoint = (int(source_offset), int(output_size))
+    return checkpoint
+
+
+def translate_file(
+    source: str,
+    output: str,
+    target: str,
+    translate: Callable[[str], Iterator[str]],
+    workers: int,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """Translate a file into another, resuming from the last checkpoint of an earlier run.
+
+    Args:
+        source: File to translate, UTF-8 encoded
+        output: File the translation is written to
+        target: Target language
+        translate: Streams the translation of one paragraph
+        workers: Number of paragraphs translated at the same time
+        progress: Called with the bytes of the source translated so far
+            and its size after each paragraph, if given
+
+    Returns:
+        The source offset translation started from, 0 unless resumed
+
+    Raises:
+        Exception: The error of a failed paragraph; the run can be resumed
+    """
+    header = _journal_header(source, target)
+    journal = journal_path(output)
+    checkpoint = _read_checkpoint(journal, header) if os.path.exists(output) else None
+    resumed_from, output_size = checkpoint or (0, 0)
+    if checkpoint is None:
+        with open(journal, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+    elif resumed_from:
+        logger.info("Resuming translation of %s at byte %d of %d", source, resumed_from, header["size"])
+
+    with open(source, "rb") as source_file, open(output, "r+b" if checkpoint else "wb") as output_file, open(
+        journal, "a", encoding="utf-8"
+    ) as journal_file:
+        # Anything written after the last checkpoint is translated again
+        output_file.truncate(output_size)
+        output_file.seek(output_size)
+        if header["size"] == 0:
+            view: Any = b""
+        else:
+            view = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # Source offsets at the end of the pieces read, in order
+            ends: Deque[int] = deque()
+
+            def pieces() -> Iterator[str]:
+                for start, end in byte_segments(view, resumed_from):
+                    ends.append(end)
+                    yield view[start:end].decode("utf-8", errors="replace")
+
+            def checkpoint_piece(piece: str) -> None:
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                end = ends.popleft()
+                journal_file.write(f"{end} {output_file.tell()}\n")
+                journal_file.flush()
+                if progress is not None:
+                    progress(end, header["size"])
+
+            def fail(piece: str, error: BaseException) -> None:
+                raise error
+
+            for chunk in translate_incrementally(pieces(), translate, workers, fail, on_piece=checkpoint_piece):
+                output_file.write(chunk.encode("utf-8"))
+        finally:
+            if isinstance(view, mmap.mmap):
+                try:
+                    view.close()
+                except BufferError:
+                    # The reader thread is still searching it; it is unmapped once released
+                    pass
+
+    os.unlink(journal)
+    return resumed_from
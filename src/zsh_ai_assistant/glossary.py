@@ -0,0 +1,202 @@
+"""Glossary terms found in a text with an Aho-Corasick automaton.
+
+A glossary file has one entry per line, the term and its translation
+separated by a tab; blank lines and lines starting with ``#`` are
+ignored::
+
+    pull request<TAB>プルリクエスト
+    worktree<TAB>ワークツリー
+
+Only the entries occurring in the text being translated are added to the
+prompt, so a glossary of thousands of terms costs a few prompt tokens.
+All terms are matched in one pass over the text, ignoring case, in time
+linear in the length of the text plus the number of matches. Terms
+starting or ending with a letter or digit of a script written with spaces
+only match whole words.
+
+Compiling the automaton is the slow part, so compiled glossaries are
+cached in the state directory and rebuilt only when the glossary file's
+modification time or size changes.
+"""
+
+import hashlib
+import logging
+import marshal
+import os
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Version of the cached tables; bumped when their layout changes
+CACHE_FORMAT = 1
+
+# Characters from here on (CJK and later scripts) are not separated by spaces
+_SPACELESS_SCRIPTS = 0x2E80
+
+
+def _is_word_char(char: str) -> bool:
+    """Check if a character is part of a word delimited by spaces."""
+    return char.isalnum() and ord(char) < _SPACELESS_SCRIPTS
+
+
+def parse_glossary(content: str) -> Dict[str, str]:
+    """Parse the entries of a glossary file; later entries replace earlier ones."""
+    entries: Dict[str, str] = {}
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        term, separator, translation = line.partition("\t")
+        if not separator or not term.strip() or not translation.strip():
+            logger.warning("Ignoring glossary line %d without a term and a translation", line_number)
+            continue
+        entries[term.strip()] = translation.strip()
+    return entries
+
+
+class Glossary:
+    """Glossary entries with an automaton matching their terms."""
+
+    __slots__ = ("terms", "translations", "_goto", "_fail", "_terminal", "_dictionary")
+
+    def __init__(self, entries: Dict[str, str]) -> None:
+        """Compile the automaton of a glossary.
+
+        Args:
+            entries: Translations by term
+        """
+        self.terms = list(entries)
+        self.translations = [entries[term] for term in self.terms]
+        # Transitions, failure links, the term ending at each state (-1 for
+        # none) and the nearest state on the failure chain where a term ends
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail = [0]
+        self._terminal = [-1]
+        self._dictionary = [-1]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for char in term.casefold():
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._terminal.append(-1)
+                    self._dictionary.append(-1)
+                state = next_state
+            self._terminal[state] = index
+        self._link()
+
+    def _link(self) -> None:
+        """Compute failure and dictionary links breadth-first."""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                fail = self._fail[child]
+                self._dictionary[child] = fail if self._terminal[fail] >= 0 else self._dictionary[fail]
+
+    def _tables(self) -> Tuple[Any, ...]:
+        """Return the compiled glossary as plain data."""
+        return (self.terms, self.translations, self._goto, self._fail, self._terminal, self._dictionary)
+
+    @classmethod
+    def _from_tables(cls, tables: Tuple[Any, ...]) -> "Glossary":
+        """Restore a glossary compiled earlier without compiling it again."""
+        glossary = cls.__new__(cls)
+        for name, value in zip(("terms", "translations", "_goto", "_fail", "_terminal", "_dictionary"), tables):
+            setattr(glossary, name, value)
+        return glossary
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """Return the entries whose terms occur in text, in order of first occurrence."""
+        folded = text.casefold()
+        found: Dict[int, None] = {}
+        state = 0
+        for position, char in enumerate(folded):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            match = state if self._terminal[state] >= 0 else self._dictionary[state]
+            while match >= 0:
+                index = self._terminal[match]
+                if index not in found and self._whole_word(folded, position, len(self.terms[index].casefold())):
+                    found[index] = None
+                match = self._dictionary[match]
+        return [(self.terms[index], self.translations[index]) for index in found]
+
+    @staticmethod
+    def _whole_word(text: str, end: int, length: int) -> bool:
+        """Check that the match of ``length`` characters ending at ``end`` is not part of a longer word."""
+        start = end - length + 1
+        if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        return not (_is_word_char(text[end]) and end + 1 < len(text) and _is_word_char(text[end + 1]))
+
+    def instructions(self, text: str) -> str:
+        """Return prompt lines giving the translations of the terms in text, or "" if none occur."""
+        entries = self.find(text)
+        if not entries:
+            return ""
+        lines = "\n".join(f"- {term}: {translation}" for term, translation in entries)
+        return f"Translate these terms as follows:\n{lines}\n\n"
+
+    def digest(self) -> str:
+        """Return a digest of the entries, telling translations made with different glossaries apart."""
+        content = "".join(f"{term}\t{translation}\n" for term, translation in zip(self.terms, self.translations))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self.terms)
+
+
+def _cache_path(path: str, cache_dir: str) -> str:
+    """Return the file the compiled glossary at ``path`` is cached in."""
+    digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"glossary-{digest}.bin")
+
+
+def load_glossary(path: str, cache_dir: str) -> Glossary:
+    """Load a glossary file, compiling it only if it changed since it was cached.
+
+    Args:
+        path: Glossary file
+        cache_dir: Directory of the compiled glossaries
+
+    Returns:
+        The compiled glossary
+
+    Raises:
+        OSError: If the glossary file cannot be read
+    """
+    stat = os.stat(path)
+    key = (CACHE_FORMAT, stat.st_mtime_ns, stat.st_size)
+    cache_path = _cache_path(path, cache_dir)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = marshal.load(f)
+        if tuple(cached[0]) == key:
+            return Glossary._from_tables(tuple(cached[1]))
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        pass
+
+    with open(path, "r", encoding="utf-8") as f:
+        glossary = Glossary(parse_glossary(f.read()))
+    logger.debug("Compiled glossary %s with %d entries", path, len(glossary))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=cache_dir, prefix=".glossary-")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump((key, glossary._tables()), f)
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        logger.warning("Could not cache the compiled glossary: %s", e)
+    return glossary
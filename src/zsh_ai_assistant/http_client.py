@@ -0,0 +1,184 @@
+"""Minimal OpenAI-compatible chat completions client.
+
+Only what the service needs is implemented: ``invoke()`` and ``stream()`` on
+role/content messages against ``/chat/completions``, with events parsed by
+the incremental parser in ``sse``. It depends on the
+standard library alone, which keeps ``cli.py`` startup far below the cost of
+importing LangChain and the OpenAI SDK.
+"""
+
+import http.client
+import json
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, Generator, List, Optional, Tuple, cast
+from urllib.parse import urlsplit
+
+from .messages import AIMessage, to_openai_messages
+from .sse import iter_delta_content
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Response statuses worth retrying before any output has been received
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class APIError(Exception):
+    """Raised when the server answers a request with an error status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialize the error.
+
+        Args:
+            status: HTTP status code
+            message: Error message returned by the server
+        """
+        super().__init__(f"Error code: {status} - {message}")
+        self.status = status
+
+
+class OpenAIHTTPClient:
+    """Chat completions client speaking the OpenAI HTTP API directly.
+
+    One connection per thread is kept open and reused by consecutive
+    requests, so a client can be shared by a pool of worker threads.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeouts: Tuple[Optional[float], Optional[float], Optional[float]] = (None, None, None),
+        max_retries: Optional[int] = None,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+            api_key: Bearer token sent with every request
+            base_url: API base URL, e.g. http://localhost:8080/v1
+            model: Model name
+            temperature: Default sampling temperature
+            max_tokens: Default maximum number of generated tokens
+            timeouts: (connect, read, total) timeouts in seconds; total is used
+                for whichever of the other two is unset
+            max_retries: Retries of requests failing before any output (default: 2)
+        """
+        url = urlsplit(base_url or "http://localhost:8080/v1")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_retries = 2 if max_retries is None else max_retries
+        self._https = url.scheme == "https"
+        self._host = url.hostname or "localhost"
+        self._port = url.port
+        self._path = url.path.rstrip("/") + "/chat/completions"
+        connect, read, total = timeouts
+        self._connect_timeout = connect if connect is not None else total
+        self._read_timeout = read if read is not None else total
+        self._headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if api_key:
+            self._headers["Authorization"] = f"Bearer {api_key}"
+        # Connection of each thread
+        self._local = threading.local()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        """Return this thread's connected connection, (re)connecting if needed."""
+        connection: Optional[http.client.HTTPConnection] = getattr(self._local, "connection", None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            connection = connection_class(self._host, self._port, timeout=self._connect_timeout)
+            self._local.connection = connection
+        if connection.sock is None:
+            connection.connect()
+            # The connect timeout only applies to connecting; reads get their own
+            cast(socket.socket, connection.sock).settimeout(self._read_timeout)
+        return connection
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _payload(self, messages: List[Any], stream: bool, options: Dict[str, Any]) -> bytes:
+        """Build the request body from messages and per-request options."""
+        body: Dict[str, Any] = {
+            "model": self.model,
+            "messages": to_openai_messages(messages),
+            "temperature": options.get("temperature", self.temperature),
+            "max_tokens": options.get("max_tokens", self.max_tokens),
+        }
+        if options.get("stop"):
+            body["stop"] = options["stop"]
+        if stream:
+            body["stream"] = True
+        body.update(options.get("extra_body") or {})
+        return json.dumps(body).encode("utf-8")
+
+    def _request(self, body: bytes) -> http.client.HTTPResponse:
+        """Send a request, retrying connection failures and transient statuses."""
+        attempt = 0
+        while True:
+            try:
+                connection = self._connect()
+                connection.request("POST", self._path, body, self._headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                # A kept-alive connection may have been closed by the server
+                self.close()
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug("Request failed (%s), retrying", e)
+            else:
+                if response.status < 400:
+                    return response
+                message = response.read().decode("utf-8", "replace")
+                if attempt >= self.max_retries or response.status not in RETRY_STATUSES:
+                    raise APIError(response.status, message)
+                logger.debug("Request failed with status %d, retrying", response.status)
+            attempt += 1
+            time.sleep(min(8.0, 0.5 * 2 ** (attempt - 1)))
+
+    def invoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        """Send a chat completion request and return the response message.
+
+        Args:
+            messages: Messages with ``role`` and ``content``
+            **kwargs: Per-request ``max_tokens``, ``temperature``, ``stop`` and ``extra_body``
+        """
+        response = self._request(self._payload(messages, False, kwargs))
+        result = json.loads(response.read())
+        return AIMessage(content=result["choices"][0]["message"].get("content") or "")
+
+    def stream_text(self, messages: List[Any], **kwargs: Any) -> Generator[str, None, None]:
+        """Stream a chat completion, yielding the text of each delta.
+
+        Closing the generator before the end drops the connection, which
+        makes the server stop generating.
+        """
+        response = self._request(self._payload(messages, True, kwargs))
+        finished = False
+        try:
+            yield from iter_delta_content(response)
+            # Drain the end of the body so the connection can be reused
+            response.read()
+            finished = True
+        finally:
+            if not finished:
+                self.close()
+
+    def stream(self, messages: List[Any], **kwargs: Any) -> Generator[AIMessage, None, None]:
+        """Stream a chat completion, yielding one message chunk per delta."""
+        stream = self.stream_text(messages, **kwargs)
+        try:
+            for text in stream:
+                yield AIMessage(content=text)
+        finally:
+            stream.close()
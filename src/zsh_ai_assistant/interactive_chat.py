@@ -2,9 +2,11 @@
 """Interactive chat functionality for zsh-ai-assistant."""
 
 import json
+import sqlite3
 import sys
 import logging
-from typing import List, Dict, Any
+import uuid
+from typing import List, Optional, Union
 import os
 
 # Add the src directory to Python path to ensure module can be imported
@@ -14,6 +16,12 @@ if _src_dir not in sys.path:
 
 from zsh_ai_assistant.config import AIConfig, setup_logging  # noqa: E402
 from zsh_ai_assistant.ai_service import LangChainAIService  # noqa: E402
+from zsh_ai_assistant.markdown import MarkdownRenderer  # noqa: E402
+from zsh_ai_assistant.messages import AIMessage, BaseMessage, HumanMessage  # noqa: E402
+from zsh_ai_assistant.output import CoalescingWriter  # noqa: E402
+from zsh_ai_assistant import session_log, sqlite_history  # noqa: E402
+from zsh_ai_assistant.session_log import LogChatHistory  # noqa: E402
+from zsh_ai_assistant.sqlite_history import SQLiteChatHistory  # noqa: E402
 
 # Get logger
 logger = logging.getLogger(__name__)
@@ -22,8 +30,17 @@ logger = logging.getLogger(__name__)
 class InteractiveChat:
     """Interactive chat session with AI."""
 
-    def __init__(self, test_mode: bool = False) -> None:
-        """Initialize interactive chat session."""
+    def __init__(
+        self, test_mode: bool = False, resume: Optional[str] = None, history_dir: Optional[str] = None
+    ) -> None:
+        """Initialize interactive chat session.
+
+        Args:
+            test_mode: Use the mock client
+            resume: Id of a saved session to continue, or "" for the latest one
+            history_dir: Directory to save the session in (default: AI_HISTORY_DIR,
+                unless saving is disabled or in test mode)
+        """
         self.test_mode = test_mode
         self.config = AIConfig()
 
@@ -32,27 +49,81 @@ class InteractiveChat:
         logger.debug("Initializing interactive chat with config: %s", self.config)
         logger.debug("Test mode: %s", test_mode)
 
-        self.service = LangChainAIService(self.config, test_mode=test_mode)
-        self.chat_history: List[Dict[str, Any]] = []
+        if history_dir is None and self.config.save_history and not test_mode:
+            history_dir = self.config.history_dir
+        self.history_dir = history_dir
+        # Opened on the first message, so sessions quit right away leave no files
+        self.history: Optional[Union[LogChatHistory, SQLiteChatHistory]] = None
+        self.chat_history: List[BaseMessage] = []
+
+        if resume is not None:
+            if history_dir is None:
+                raise ValueError("Chat sessions are not saved (AI_SAVE_HISTORY is off)")
+            store = sqlite_history if self.config.history_store == "sqlite" else session_log
+            session_id = resume or store.latest_session(history_dir)
+            if session_id is None or not store.session_exists(history_dir, session_id):
+                raise ValueError(f"No saved chat session {resume!r}" if resume else "No saved chat session")
+            # Only the tail that fits the context window is read back
+            self.history = self._open_history(session_id, window=self.config.history_context_messages)
+            self.chat_history = list(self.history.get_messages())
+            logger.info(
+                "Resumed session %s with %d of %d messages", session_id, len(self.chat_history), len(self.history)
+            )
+
+        # A stable session id keeps the whole conversation on one prompt cache slot
+        self.session_id = self.history.session_id if self.history is not None else uuid.uuid4().hex
+        self.service = LangChainAIService(self.config, test_mode=test_mode, session_id=self.session_id)
+        # Styled markdown only makes sense on a terminal
+        self.render_markdown = self.config.render_markdown and sys.stdout.isatty() and not os.environ.get("NO_COLOR")
         logger.info("Interactive chat session initialized")
 
     def add_user_message(self, content: str) -> None:
         """Add user message to chat history."""
-        self.chat_history.append({"role": "user", "content": content})
+        self.chat_history.append(HumanMessage(content))
+        self._save("user", content)
 
     def add_assistant_message(self, content: str) -> None:
         """Add assistant message to chat history."""
-        self.chat_history.append({"role": "assistant", "content": content})
+        self.chat_history.append(AIMessage(content))
+        self._save("assistant", content)
+
+    def _open_history(self, session_id: str, window: int) -> Union[LogChatHistory, SQLiteChatHistory]:
+        """Open a saved session in the configured store."""
+        assert self.history_dir is not None
+        if self.config.history_store == "sqlite":
+            # One transaction per turn: the question and its answer
+            return SQLiteChatHistory(self.history_dir, session_id, window=window, batch_size=2)
+        return LogChatHistory(self.history_dir, session_id, window=window)
+
+    def _save(self, role: str, content: str) -> None:
+        """Append a message to the saved session, if sessions are saved."""
+        if self.history_dir is None:
+            return
+        try:
+            if self.history is None:
+                self.history = self._open_history(self.session_id, window=0)
+            if role == "user":
+                self.history.add_user_message(content)
+            else:
+                self.history.add_ai_message(content)
+        except (OSError, sqlite3.Error) as e:
+            # Losing the saved copy must not end the conversation
+            logger.warning("Could not save chat session %s: %s", self.session_id, e)
+            self.history_dir = None
 
     def get_chat_history_json(self) -> str:
         """Get current chat history as JSON."""
-        return json.dumps(self.chat_history)
+        return json.dumps([message.to_dict() for message in self.chat_history])
 
     def generate_response(self, user_input: str) -> str:
-        """Generate AI response to user input."""
-        # Add user message to history
+        """Generate AI response to user input.
+
+        The question is saved together with its answer, so a turn that fails
+        leaves nothing in the saved session for ``--resume`` to send back.
+        """
         logger.debug("User input: %s", user_input)
-        self.add_user_message(user_input)
+        turn_start = len(self.chat_history)
+        self.chat_history.append(HumanMessage(user_input))
 
         try:
             # Generate response using the AI service with streaming
@@ -62,30 +133,51 @@ class InteractiveChat:
             print("AI: ", end="", flush=True)
 
             response_parts: list[str] = []
-            for chunk in self.service.chat_stream(self.chat_history):
-                response_parts.append(chunk)
-                # Print chunk as it arrives for streaming effect
-                print(chunk, end="", flush=True)
-
-            response = "".join(response_parts).strip()
-
-            # Add assistant response to history
+            # Chunks are written in frames rather than one syscall per token
+            renderer = MarkdownRenderer() if self.render_markdown else None
+            with CoalescingWriter(
+                interval=self.config.output_flush_interval,
+                max_latency=self.config.output_flush_interval,
+                flush_on_newline=True,
+            ) as writer:
+                try:
+                    for chunk in self.service.chat_stream(self.chat_history):
+                        response_parts.append(chunk)
+                        writer.write(renderer.feed(chunk) if renderer is not None else chunk)
+                finally:
+                    if renderer is not None:
+                        # Print held-back text and reset the terminal style
+                        writer.write(renderer.finish())
+
+            raw_response = "".join(response_parts)
+            response = raw_response.strip()
+
+            # Add assistant response to history. With server-side prompt caching the
+            # history must match the generated tokens byte for byte, otherwise the
+            # next turn misses the cache from this message onwards.
             logger.debug("AI response: %s", response)
-            self.add_assistant_message(response)
+            answer = raw_response if self.config.prompt_cache_enabled else response
+            self.chat_history.append(AIMessage(answer))
+            self._save("user", user_input)
+            self._save("assistant", answer)
 
             # Print newline after AI response to separate from next prompt
             print(flush=True)
 
             return response
+        except KeyboardInterrupt:
+            del self.chat_history[turn_start:]
+            raise
         except Exception as e:
             logger.error("Error generating response: %s", e)
-            error_message = f"Error: {e}"
-            # Add error as assistant message for context
-            self.add_assistant_message(error_message)
-            raise Exception(error_message)
+            # The error is only shown; the unanswered question is dropped from the history
+            del self.chat_history[turn_start:]
+            raise Exception(f"Error: {e}")
 
     def run_interactive_chat(self) -> None:
         """Run interactive chat session."""
+        if self.history is not None and self.chat_history:
+            print(f"Resuming session {self.session_id} ({len(self.history)} messages).")
         print("Starting AI chat. Type 'quit', 'exit', or 'q' to end.")
 
         while True:
@@ -111,6 +203,11 @@ class InteractiveChat:
                 print(f"\nError: {e}")
                 break
 
+        if self.history is not None:
+            print(f"Session saved. Resume it with: aiask --resume {self.session_id}")
+            self.history.close()
+            self.history = None
+
 
 def main(test_mode: bool = False) -> None:
     """Main entry point for interactive chat."""
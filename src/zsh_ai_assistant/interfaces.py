@@ -1,7 +1,9 @@
 """Interfaces for the zsh-ai-assistant."""
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, Sequence
+
+from .messages import BaseMessage, MessageLike
 
 
 class AIServiceInterface(ABC):
@@ -13,10 +15,15 @@ class AIServiceInterface(ABC):
         pass
 
     @abstractmethod
-    def chat(self, messages: List[dict]) -> str:
+    def chat(self, messages: Sequence[MessageLike]) -> str:
         """Generate a response from a chat history."""
         pass
 
+    @abstractmethod
+    def chat_stream(self, messages: Sequence[MessageLike]) -> Iterator[str]:
+        """Generate a streaming response from a chat history."""
+        pass
+
     @abstractmethod
     def translate(self, text: str, target_language: str) -> str:
         """Translate text to a target language."""
@@ -37,8 +44,8 @@ class ChatHistoryInterface(ABC):
         pass
 
     @abstractmethod
-    def get_messages(self) -> List[dict]:
-        """Get the current chat history as a list of message dictionaries."""
+    def get_messages(self) -> Sequence[BaseMessage]:
+        """Get a read-only snapshot of the current chat history."""
         pass
 
     @abstractmethod
@@ -0,0 +1,133 @@
+"""Local detection of the language of short texts.
+
+Most languages are told apart by their script alone: kana means Japanese,
+Hangul Korean, Han characters without kana Chinese, and so on. Languages
+written in the Latin script are told apart by their most frequent function
+words. Detection is deliberately cautious: when neither signal is clear
+the language is unknown, and unknown text is always translated.
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+# Target language names, as typed after ``aitrans -t``, by language code
+_NAMES: Dict[str, Tuple[str, ...]] = {
+    "ja": ("japanese", "jp", "日本語"),
+    "zh": ("chinese", "中文", "简体中文", "繁體中文", "zh-cn", "zh-tw"),
+    "ko": ("korean", "한국어"),
+    "ru": ("russian", "русский"),
+    "uk": ("ukrainian", "українська"),
+    "el": ("greek", "ελληνικά"),
+    "ar": ("arabic", "العربية"),
+    "he": ("hebrew", "עברית"),
+    "th": ("thai", "ไทย"),
+    "hi": ("hindi", "हिन्दी"),
+    "en": ("english",),
+    "es": ("spanish", "español"),
+    "fr": ("french", "français"),
+    "de": ("german", "deutsch"),
+    "it": ("italian", "italiano"),
+    "pt": ("portuguese", "português"),
+    "nl": ("dutch", "nederlands"),
+}
+_CODES = {name: code for code, names in _NAMES.items() for name in (code,) + names}
+
+# Code point ranges of scripts used by a single language (or treated as such)
+_SCRIPT_RANGES = (
+    (0x3040, 0x30FF, "kana"),
+    (0x31F0, 0x31FF, "kana"),
+    (0xFF66, 0xFF9F, "kana"),
+    (0x3400, 0x4DBF, "han"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xF900, 0xFAFF, "han"),
+    (0x1100, 0x11FF, "ko"),
+    (0x3130, 0x318F, "ko"),
+    (0xAC00, 0xD7AF, "ko"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0370, 0x03FF, "el"),
+    (0x0590, 0x05FF, "he"),
+    (0x0600, 0x06FF, "ar"),
+    (0x0900, 0x097F, "hi"),
+    (0x0E00, 0x0E7F, "th"),
+)
+
+# Letters only Ukrainian uses among Cyrillic languages detected here
+_UKRAINIAN_LETTERS = frozenset("іїєґІЇЄҐ")
+
+# Share of letters the main script must have for a text to be in its language
+MIN_SCRIPT_SHARE = 0.6
+# Share of kana among Han and kana characters above which text is Japanese
+MIN_KANA_SHARE = 0.05
+
+# Frequent function words of Latin-script languages
+_FUNCTION_WORDS: Dict[str, frozenset] = {
+    "en": frozenset(
+        "the of and to in is it that for on with as was are be this not you or by from at have an which".split()
+    ),
+    "es": frozenset("el la de que y en los se del las por un una para con no es su al lo como más pero".split()),
+    "fr": frozenset("le la les de des et est un une du en que qui dans pour pas sur au avec ce il sont".split()),
+    "de": frozenset("der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch".split()),
+    "it": frozenset("il di che e la per un una non in sono del della le si con è da gli nel".split()),
+    "pt": frozenset("o de que e do da em um para com não uma os no se na por mais as dos".split()),
+    "nl": frozenset("de het een en van in is dat op te zijn niet met voor er maar ook als".split()),
+}
+# Function words of the best language must outnumber the runner-up's by this many
+MIN_WORD_LEAD = 2
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def language_code(name: str) -> Optional[str]:
+    """Return the code of a target language name, or None if it is not known."""
+    return _CODES.get(name.strip().casefold())
+
+
+def _script(char: str) -> Optional[str]:
+    """Return the script of a letter outside the Latin script, or None."""
+    point = ord(char)
+    for start, end, script in _SCRIPT_RANGES:
+        if start <= point <= end:
+            return script
+    return None
+
+
+def detect(text: str) -> Optional[str]:
+    """Return the code of the language of text, or None if it is unclear."""
+    counts: Dict[str, int] = {}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        script = _script(char) or "latin"
+        counts[script] = counts.get(script, 0) + 1
+    if not letters:
+        return None
+
+    cjk = counts.get("han", 0) + counts.get("kana", 0)
+    if cjk >= MIN_SCRIPT_SHARE * letters:
+        return "ja" if counts.get("kana", 0) >= MIN_KANA_SHARE * cjk else "zh"
+    script, count = max(counts.items(), key=lambda item: item[1])
+    if count < MIN_SCRIPT_SHARE * letters or script in ("han", "kana"):
+        return None
+    if script == "cyrillic":
+        return "uk" if any(char in _UKRAINIAN_LETTERS for char in text) else "ru"
+    if script != "latin":
+        return script
+
+    words = [word.casefold() for word in _WORD.findall(text)]
+    scores = sorted(((sum(word in common for word in words), code) for code, common in _FUNCTION_WORDS.items()))
+    (runner_up, _), (best, code) = scores[-2], scores[-1]
+    return code if best - runner_up >= MIN_WORD_LEAD else None
+
+
+def needs_no_translation(text: str, language: str) -> bool:
+    """Check if text is already in ``language``, or has no words to translate.
+
+    Args:
+        text: Text to check
+        language: Code of the target language
+    """
+    if not any(char.isalpha() for char in text):
+        return True
+    return detect(text) == language
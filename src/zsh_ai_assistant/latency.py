@@ -0,0 +1,85 @@
+"""Latency tracking for routing requests away from a saturated model."""
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .state import SharedStateFile
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Exponentially weighted time-to-first-token per model endpoint.
+
+    Samples are kept in a shared state file, so a fresh ``cli.py`` process
+    routes using the history gathered by the ones before it.
+    """
+
+    def __init__(
+        self,
+        state: SharedStateFile,
+        alpha: float = 0.3,
+        probe_interval: float = 60.0,
+        refresh_interval: float = 1.0,
+    ) -> None:
+        """Initialize the tracker.
+
+        Args:
+            state: Shared state file holding the statistics
+            alpha: Weight of a new sample in the moving average
+            probe_interval: Seconds after which a slow target is tried again
+            refresh_interval: Seconds a snapshot of the state file is reused
+        """
+        self.state = state
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self.refresh_interval = refresh_interval
+        self._snapshot: Dict[str, Any] = {}
+        self._snapshot_time: Optional[float] = None
+
+    def _stats(self) -> Dict[str, Any]:
+        """Return a recent snapshot of the statistics."""
+        now = time.monotonic()
+        if self._snapshot_time is None or now - self._snapshot_time >= self.refresh_interval:
+            self._snapshot = self.state.read()
+            self._snapshot_time = now
+        return self._snapshot
+
+    def ewma(self, key: str) -> Optional[float]:
+        """Return the moving average TTFT in milliseconds for a target, if known."""
+        entry = self._stats().get(key)
+        if not entry:
+            return None
+        return float(entry["ewma_ms"])
+
+    def record(self, key: str, ttft_ms: float) -> None:
+        """Fold a TTFT sample into the moving average of a target."""
+        with self.state.update() as stats:
+            entry = stats.get(key)
+            if entry:
+                entry["ewma_ms"] = self.alpha * ttft_ms + (1 - self.alpha) * entry["ewma_ms"]
+                entry["samples"] = entry.get("samples", 0) + 1
+            else:
+                entry = {"ewma_ms": ttft_ms, "samples": 1}
+                stats[key] = entry
+            entry["updated_at"] = time.time()
+            self._snapshot = dict(stats)
+            self._snapshot_time = time.monotonic()
+        logger.debug("TTFT for %s: %.1f ms (EWMA %.1f ms)", key, ttft_ms, entry["ewma_ms"])
+
+    def should_fall_back(self, key: str, slo_ms: float) -> bool:
+        """Decide whether a target is too slow to be used right now.
+
+        A target over its SLO is avoided until ``probe_interval`` seconds have
+        passed since its last sample; the next request then probes it again,
+        and the fresh sample either restores it or keeps it avoided.
+        """
+        entry = self._stats().get(key)
+        if not entry or entry["ewma_ms"] <= slo_ms:
+            return False
+        if time.time() - entry.get("updated_at", 0.0) >= self.probe_interval:
+            logger.info("Probing slow target %s (EWMA %.1f ms)", key, entry["ewma_ms"])
+            return False
+        return True
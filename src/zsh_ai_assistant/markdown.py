@@ -0,0 +1,166 @@
+"""Incremental markdown rendering for streamed chat answers.
+
+The renderer is a small state machine fed one chunk at a time. It only ever
+holds back the first few characters of a line, until it can tell whether the
+line opens a code fence, a heading or a list item; everything else is
+rendered and returned straight away, so each chunk costs time proportional
+to its own length rather than to the whole answer.
+
+Fenced code is printed as is (only colored), so it can be copied from the
+terminal unchanged.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+BOLD = "\x1b[1m"
+DIM = "\x1b[2m"
+NORMAL_INTENSITY = "\x1b[22m"
+CODE_BLOCK = "\x1b[32m"
+CODE_SPAN = "\x1b[36m"
+DEFAULT_COLOR = "\x1b[39m"
+
+BULLET = "•"
+
+_FENCES = ("```", "~~~")
+_HEADING = re.compile(r"(#{1,6})(?: |$)")
+_ORDERED = re.compile(r"\d{1,9}[.)] ")
+_ORDERED_PREFIX = re.compile(r"\d{1,9}[.)]?")
+
+# How a line is rendered: (text to emit now, style closed at the end of the
+# line, whether inline code spans are rendered in it)
+_Line = Tuple[str, str, bool]
+
+
+class MarkdownRenderer:
+    """Render a stream of markdown chunks as ANSI-styled terminal text.
+
+    Handles fenced code blocks, ATX headings, bullet and ordered lists, and
+    inline code spans. Call ``feed()`` with each chunk and print what it
+    returns, then print what ``finish()`` returns at the end of the answer.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the renderer at the start of an answer."""
+        # Marker of the open code fence, if inside one
+        self._fence: Optional[str] = None
+        # Start of the current line, kept until its kind is known
+        self._head = ""
+        self._at_line_start = True
+        # Sequence ending the current line's style
+        self._line_close = ""
+        self._inline = True
+        self._in_code_span = False
+
+    def feed(self, chunk: str) -> str:
+        """Render a chunk, returning the text that can be printed now."""
+        out: List[str] = []
+        pos = 0
+        length = len(chunk)
+        while pos < length:
+            newline = chunk.find("\n", pos)
+            end = length if newline == -1 else newline
+            if self._at_line_start:
+                self._head += chunk[pos:end]
+                line = self._classify(self._head, final=newline != -1)
+                if line is not None:
+                    self._start_line(line, out)
+            else:
+                out.append(self._render_inline(chunk[pos:end]) if self._inline else chunk[pos:end])
+            if newline == -1:
+                break
+            self._end_line(out)
+            out.append("\n")
+            pos = newline + 1
+        return "".join(out)
+
+    def finish(self) -> str:
+        """Render whatever is still held back and reset the terminal style."""
+        out: List[str] = []
+        if self._at_line_start and self._head:
+            line = self._classify(self._head, final=True)
+            if line is not None:
+                self._start_line(line, out)
+        self._end_line(out)
+        return "".join(out)
+
+    def _start_line(self, line: _Line, out: List[str]) -> None:
+        """Emit the start of a line whose kind has just been determined."""
+        text, self._line_close, self._inline = line
+        self._head = ""
+        self._at_line_start = False
+        out.append(text)
+
+    def _end_line(self, out: List[str]) -> None:
+        """Close the styles of the current line."""
+        if self._in_code_span:
+            out.append(DEFAULT_COLOR)
+            self._in_code_span = False
+        out.append(self._line_close)
+        self._line_close = ""
+        self._head = ""
+        self._at_line_start = True
+
+    def _render_inline(self, text: str) -> str:
+        """Render inline code spans, hiding their backticks."""
+        if "`" not in text:
+            return text
+        parts = text.split("`")
+        out = [parts[0]]
+        for part in parts[1:]:
+            self._in_code_span = not self._in_code_span
+            out.append(CODE_SPAN if self._in_code_span else DEFAULT_COLOR)
+            out.append(part)
+        return "".join(out)
+
+    def _classify(self, head: str, final: bool) -> Optional[_Line]:
+        """Decide how the line starting with ``head`` is rendered.
+
+        Args:
+            head: Text of the line received so far
+            final: Whether the line is complete
+
+        Returns:
+            How to render the line, or None if more characters are needed
+        """
+        stripped = head.lstrip(" ")
+        indent = head[: len(head) - len(stripped)]
+
+        if self._fence is not None:
+            if stripped.startswith(self._fence):
+                self._fence = None
+                return DIM + head, NORMAL_INTENSITY, False
+            if not final and self._fence.startswith(stripped):
+                return None
+            return CODE_BLOCK + head, DEFAULT_COLOR, False
+
+        if not stripped:
+            return (head, "", True) if final else None
+
+        for fence in _FENCES:
+            if stripped.startswith(fence):
+                self._fence = fence
+                return DIM + head, NORMAL_INTENSITY, False
+            if not final and fence.startswith(stripped):
+                return None
+
+        if not final and len(stripped) <= 6 and stripped == "#" * len(stripped):
+            return None
+        heading = _HEADING.match(stripped)
+        if heading:
+            text = stripped[heading.end() :]
+            return indent + BOLD + self._render_inline(text), NORMAL_INTENSITY, True
+
+        if stripped[:2] in ("- ", "* ", "+ "):
+            return indent + BULLET + " " + self._render_inline(stripped[2:]), "", True
+        if not final and stripped in ("-", "*", "+"):
+            return None
+
+        ordered = _ORDERED.match(stripped)
+        if ordered:
+            marker = stripped[: ordered.end()]
+            return indent + BOLD + marker + NORMAL_INTENSITY + self._render_inline(stripped[ordered.end() :]), "", True
+        if not final and _ORDERED_PREFIX.fullmatch(stripped):
+            return None
+
+        return self._render_inline(head), "", True
@@ -0,0 +1,296 @@
+"""Lightweight chat messages.
+
+The service builds its requests from these instead of LangChain's message
+classes, so a process using the direct HTTP client never imports LangChain.
+Names, ``type`` and ``content`` mirror LangChain's messages; the LangChain
+backend converts them at the boundary.
+
+Chat histories keep these too. A message holds a single slot, its content,
+while the role is shared by its class, so it takes a fraction of the memory
+of a ``{"role": ..., "content": ...}`` dictionary. Messages still read like
+those dictionaries (``message["role"]``, ``message.get("content")``) and
+compare equal to them, so code and tests written against dictionaries keep
+working.
+
+Requests of a chat session grow by a message or two per turn, so
+``ConversionCache`` converts only the messages appended since the previous
+request instead of the whole conversation.
+"""
+
+import threading
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+
+class Role(str, Enum):
+    """OpenAI API role of a message."""
+
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+
+    def __str__(self) -> str:
+        """Return the role as sent to the API."""
+        return self.value
+
+
+_KEYS = ("role", "content")
+
+
+def _hashable(value: Any) -> Any:
+    """Return a hashable form of message content, equal for equal content.
+
+    Multi-part content is a list of dictionaries, which cannot be hashed as is.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    return value
+
+
+class BaseMessage:
+    """A message with a role and text content."""
+
+    __slots__ = ("content",)
+
+    # LangChain message type: "system", "human" or "ai"
+    type = ""
+    # OpenAI API role
+    role: Role
+
+    def __init__(self, content: Any) -> None:
+        """Initialize the message.
+
+        Args:
+            content: Text of the message (or content parts, passed through as is)
+        """
+        self.content = content
+
+    def __eq__(self, other: object) -> bool:
+        """Compare messages by type and content, or with a message dictionary."""
+        if isinstance(other, BaseMessage):
+            return self.type == other.type and self.content == other.content
+        if isinstance(other, dict):
+            return other == self.to_dict()
+        return NotImplemented
+
+    def __getitem__(self, key: str) -> Any:
+        """Return the role or content, like a message dictionary."""
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the role or content, or ``default`` for other keys."""
+        return self[key] if key in _KEYS else default
+
+    def keys(self) -> Sequence[str]:
+        """Return the keys of the equivalent message dictionary."""
+        return _KEYS
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the message as an OpenAI API dictionary."""
+        return {"role": self.role.value, "content": self.content}
+
+    def __hash__(self) -> int:
+        """Hash messages by type and content, consistently with ``__eq__``."""
+        return hash((self.type, _hashable(self.content)))
+
+    def __repr__(self) -> str:
+        """Return a string representation of the message."""
+        return f"{self.__class__.__name__}(content={self.content!r})"
+
+
+class SystemMessage(BaseMessage):
+    """Instructions for the model."""
+
+    __slots__ = ()
+    type = "system"
+    role = Role.SYSTEM
+
+
+class HumanMessage(BaseMessage):
+    """A message from the user."""
+
+    __slots__ = ()
+    type = "human"
+    role = Role.USER
+
+
+class AIMessage(BaseMessage):
+    """A message from the model."""
+
+    __slots__ = ()
+    type = "ai"
+    role = Role.ASSISTANT
+
+
+# A message, or the equivalent dictionary
+MessageLike = Union[BaseMessage, Mapping[str, Any]]
+
+# Message class for each OpenAI role and LangChain type
+_CLASSES: Dict[str, type] = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "human": HumanMessage,
+    "assistant": AIMessage,
+    "ai": AIMessage,
+}
+
+
+def to_message(message: MessageLike) -> BaseMessage:
+    """Return a message dictionary as a message; messages are returned as is.
+
+    Raises:
+        ValueError: If the role is not system, user or assistant
+    """
+    if isinstance(message, BaseMessage):
+        return message
+    cls = _CLASSES.get(str(message.get("role")))
+    if cls is None:
+        raise ValueError(f"Unknown message role: {message.get('role')!r}")
+    result: BaseMessage = cls(message.get("content"))
+    return result
+
+
+class MessageView(Sequence[BaseMessage]):
+    """Read-only snapshot of the first ``length`` messages of a list.
+
+    Histories only ever append to their lists (clearing one starts a new
+    list), so a view of the current length stays a consistent snapshot and
+    is taken in O(1) instead of copying the list.
+    """
+
+    __slots__ = ("_messages", "_length")
+
+    def __init__(self, messages: List[BaseMessage], length: int) -> None:
+        """Initialize the view.
+
+        Args:
+            messages: Append-only list of messages
+            length: Number of messages in the snapshot
+        """
+        self._messages = messages
+        self._length = length
+
+    def __getitem__(self, index: Any) -> Any:
+        """Return a message, or a list of messages for a slice."""
+        if isinstance(index, slice):
+            return self._messages[: self._length][index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message index out of range")
+        return self._messages[index]
+
+    def __len__(self) -> int:
+        """Return the number of messages in the snapshot."""
+        return self._length
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        """Iterate over the messages of the snapshot."""
+        messages = self._messages
+        for index in range(self._length):
+            yield messages[index]
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with another sequence of messages or message dictionaries."""
+        if not isinstance(other, (MessageView, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        """Return a string representation of the snapshot."""
+        return f"MessageView({list(self)!r})"
+
+
+def to_openai_messages(messages: List[Any]) -> List[Dict[str, str]]:
+    """Convert messages to OpenAI API ``{"role", "content"}`` dictionaries."""
+    return [{"role": message.role.value, "content": message.content} for message in messages]
+
+
+def to_langchain_message(message: Any) -> Any:
+    """Convert a message to a LangChain message.
+
+    LangChain is imported here rather than at module level; by the time this
+    runs a LangChain client exists, so the import is already paid for.
+    """
+    from langchain_core import messages as lc
+
+    classes = {"system": lc.SystemMessage, "human": lc.HumanMessage, "ai": lc.AIMessage}
+    return classes[message.type](content=message.content)
+
+
+def to_langchain_messages(messages: List[Any]) -> List[Any]:
+    """Convert messages to LangChain messages."""
+    return [to_langchain_message(message) for message in messages]
+
+
+class ConversionCache:
+    """Convert lists of messages, reusing the conversions of a shared prefix.
+
+    The cache remembers the messages of the last list it converted, by
+    identity, and their conversions. A list starting with the same message
+    objects, such as the next request of a chat session, only has its new
+    messages converted; a list that diverges is converted again from where
+    it diverges. Finding the shared prefix compares references only, which
+    is far cheaper than building the messages again. Calling the cache
+    converts a list, so it can be used in place of ``to_langchain_messages``.
+    """
+
+    __slots__ = ("_convert", "_counted", "_sources", "_converted", "_ends", "_counts", "_lock")
+
+    def __init__(
+        self,
+        convert: Callable[[Any], Optional[Any]],
+        counted: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            convert: Conversion of one message; messages converted to None are dropped
+            counted: Optional predicate on converted messages, counted by ``convert()``
+        """
+        self._convert = convert
+        self._counted = counted
+        # Messages of the last list, and the output length and count after each
+        self._sources: List[Any] = []
+        self._converted: List[Any] = []
+        self._ends: List[int] = []
+        self._counts: List[int] = []
+        self._lock = threading.Lock()
+
+    def convert(self, messages: Sequence[Any]) -> Tuple[List[Any], int]:
+        """Convert a list of messages, converting only those not converted before.
+
+        Returns:
+            A new list of the converted messages, and how many of them match ``counted``
+        """
+        with self._lock:
+            sources = self._sources
+            limit = min(len(sources), len(messages))
+            shared = 0
+            while shared < limit and messages[shared] is sources[shared]:
+                shared += 1
+            if shared < len(sources):
+                del self._converted[self._ends[shared - 1] if shared else 0 :]
+                del sources[shared:], self._ends[shared:], self._counts[shared:]
+            count = self._counts[-1] if self._counts else 0
+            for index in range(shared, len(messages)):
+                message = messages[index]
+                converted = self._convert(message)
+                if converted is not None:
+                    self._converted.append(converted)
+                    if self._counted is not None and self._counted(converted):
+                        count += 1
+                sources.append(message)
+                self._ends.append(len(self._converted))
+                self._counts.append(count)
+            return list(self._converted), count
+
+    def __call__(self, messages: Sequence[Any]) -> List[Any]:
+        """Convert a list of messages, converting only those not converted before."""
+        return self.convert(messages)[0]
@@ -16,11 +16,12 @@ class MockClient:
         self.call_count = 0
         self.calls: List[List[Dict[str, Any]]] = []
 
-    def invoke(self, messages: List[Any]) -> Any:
+    def invoke(self, messages: List[Any], **kwargs: Any) -> Any:
         """Invoke the mock client with messages.
 
         Args:
             messages: List of message objects
+            **kwargs: Per-request options (ignored)
 
         Returns:
             Response object (simulated)
@@ -48,11 +49,12 @@ class MockClient:
         else:
             return self._handle_chat_mode(messages)
 
-    def stream(self, messages: List[Any]) -> Iterator[Any]:
+    def stream(self, messages: List[Any], **kwargs: Any) -> Iterator[Any]:
         """Stream mock responses for testing.
 
         Args:
             messages: List of message objects
+            **kwargs: Per-request options (ignored)
 
         Yields:
             Response chunks (simulated streaming)
@@ -0,0 +1,136 @@
+"""Terminal output for streamed responses."""
+
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional, TextIO, cast
+
+# Defaults: about one frame at 60 Hz, and a size that fits a pipe buffer
+DEFAULT_FLUSH_INTERVAL = 0.016
+DEFAULT_MAX_BUFFERED = 4096
+
+
+class CoalescingWriter:
+    """Write streamed chunks to a stream in frames instead of one by one.
+
+    Printing every token with ``flush=True`` costs a write syscall per token,
+    which is slow over SSH or tmux at high token rates. Chunks are buffered
+    and written together once ``interval`` seconds have passed since the last
+    write or ``max_buffered`` characters are pending. In adaptive mode a chunk
+    containing a newline is written at once, so complete lines never wait.
+
+    A slow stream writes every chunk as it comes, and only fast bursts
+    coalesce. With ``max_latency`` set, a background thread also writes text
+    that has been pending that long, so a stream stalling mid-response never
+    hides what it already sent; otherwise buffered text waits for the next
+    chunk. Call ``close()`` (or leave the ``with`` block) at the end of a
+    response.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_buffered: int = DEFAULT_MAX_BUFFERED,
+        flush_on_newline: bool = False,
+        max_latency: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the writer.
+
+        Args:
+            stream: Stream to write to (default: sys.stdout at the time of writing)
+            interval: Seconds between writes while chunks keep arriving; 0 writes every chunk
+            max_buffered: Pending characters that force a write
+            flush_on_newline: Write at once when a chunk completes a line
+            max_latency: Seconds after which pending text is written even if no
+                further chunk arrives; None waits for the next chunk
+            clock: Monotonic clock, replaceable for testing
+        """
+        self._stream = stream
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self.flush_on_newline = flush_on_newline
+        self.max_latency = max_latency
+        self._clock = clock
+        self._parts: List[str] = []
+        self._buffered = 0
+        self._last_write = clock()
+        # When the oldest pending chunk arrived
+        self._pending_since = 0.0
+        self.writes = 0
+        # Guards the pending chunks, shared with the thread writing stalled text
+        self._condition = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def stream(self) -> TextIO:
+        """The stream written to."""
+        return self._stream if self._stream is not None else sys.stdout
+
+    def write(self, text: str) -> None:
+        """Buffer a chunk, writing the pending ones if a threshold is reached."""
+        if not text:
+            return
+        with self._condition:
+            if not self._parts:
+                self._pending_since = self._clock()
+            self._parts.append(text)
+            self._buffered += len(text)
+            if (
+                self._buffered >= self.max_buffered
+                or (self.flush_on_newline and "\n" in text)
+                or self._clock() - self._last_write >= self.interval
+            ):
+                self._flush()
+            elif self.max_latency is not None and not self._closed:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._write_stalled, name="output-flush", daemon=True)
+                    self._flusher.start()
+                self._condition.notify()
+
+    def _write_stalled(self) -> None:
+        """Write text that has been pending for ``max_latency``, until the writer is closed."""
+        max_latency = cast(float, self.max_latency)
+        with self._condition:
+            while not self._closed:
+                if not self._parts:
+                    self._condition.wait()
+                    continue
+                remaining = self._pending_since + max_latency - self._clock()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._flush()
+
+    def flush(self) -> None:
+        """Write and flush everything pending."""
+        with self._condition:
+            self._flush()
+
+    def close(self) -> None:
+        """Write everything pending and stop the background writes."""
+        with self._condition:
+            self._flush()
+            self._closed = True
+            self._condition.notify_all()
+
+    def _flush(self) -> None:
+        """Write and flush everything pending; the caller holds the lock."""
+        if self._parts:
+            stream = self.stream
+            stream.write("".join(self._parts))
+            stream.flush()
+            self._parts.clear()
+            self._buffered = 0
+            self.writes += 1
+        self._last_write = self._clock()
+
+    def __enter__(self) -> "CoalescingWriter":
+        """Return the writer for use in a ``with`` block."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Write what is still pending, also when streaming failed."""
+        self.close()
@@ -0,0 +1,242 @@
+"""Host-wide rate limiting shared by every shell.
+
+Each ``cli.py`` process is short-lived, so limits are kept in a small
+memory-mapped file that all of them update under an advisory lock. The
+file holds two token buckets, one refilled at the allowed requests per
+second and one at the allowed tokens per minute, and a table of in-flight
+request slots, each recording the process holding it. Slots of processes
+that died are reclaimed, so a crashed shell never leaks capacity.
+
+Interactive modes (command and chat) take priority over bulk translation:
+a waiting interactive request holds bulk requests back until it is
+served, and bulk requests may not take the last free in-flight slot.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZAR1"
+
+# Magic, request bucket level and refill time, token bucket level and refill
+# time, time until which interactive requests are waiting
+HEADER = struct.Struct(">4sddddd")
+SLOT = struct.Struct(">I")
+MAX_SLOTS = 64
+SIZE = HEADER.size + MAX_SLOTS * SLOT.size
+
+# Modes served before bulk requests
+INTERACTIVE_MODES = ("command", "chat")
+
+# Seconds between checks while a request waits for capacity
+POLL_INTERVAL = 0.05
+# Longest single sleep, so limits changed by other processes are noticed
+MAX_SLEEP = 1.0
+
+# Rough number of characters per token, to estimate a request's size
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(characters: int) -> int:
+    """Estimate the number of tokens in a text of ``characters`` characters."""
+    return characters // CHARS_PER_TOKEN + 1
+
+
+def _pid_alive(pid: int) -> bool:
+    """Check if a process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Lease:
+    """Capacity taken by one request, returned by ``RateLimiter.release()``."""
+
+    __slots__ = ("slot", "tokens")
+
+    def __init__(self, slot: Optional[int], tokens: int) -> None:
+        """Initialize the lease.
+
+        Args:
+            slot: In-flight slot held by the request, if concurrency is capped
+            tokens: Tokens charged to the tokens-per-minute bucket
+        """
+        self.slot = slot
+        self.tokens = tokens
+
+
+class _State:
+    """Decoded header of the shared file."""
+
+    __slots__ = ("requests", "requests_time", "tokens", "tokens_time", "interactive_until")
+
+    def __init__(self, values: List[float]) -> None:
+        """Initialize the state from the unpacked header values."""
+        self.requests, self.requests_time, self.tokens, self.tokens_time, self.interactive_until = values
+
+
+class RateLimiter:
+    """Requests-per-second, tokens-per-minute and in-flight limits shared between processes."""
+
+    def __init__(
+        self,
+        path: str,
+        requests_per_second: float = 0.0,
+        tokens_per_minute: int = 0,
+        max_in_flight: int = 0,
+    ) -> None:
+        """Initialize the limiter; a limit of 0 disables it.
+
+        Args:
+            path: Location of the shared state file
+            requests_per_second: Requests allowed per second, with bursts of up to one second's worth
+            tokens_per_minute: Estimated prompt and completion tokens allowed per minute
+            max_in_flight: Requests allowed to run at the same time (at most 64)
+        """
+        self.path = path
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = min(max_in_flight, MAX_SLOTS)
+        self.request_burst = max(1.0, requests_per_second)
+
+    @contextmanager
+    def _locked(self) -> Iterator[mmap.mmap]:
+        """Map the shared file, holding an exclusive lock on it."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size < SIZE:
+                os.ftruncate(fd, SIZE)
+            with mmap.mmap(fd, SIZE) as view:
+                yield view
+        finally:
+            os.close(fd)
+
+    def _load(self, view: mmap.mmap, now: float) -> _State:
+        """Read the buckets, refilled up to ``now``."""
+        magic, *values = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            # A new file starts with full buckets and no request in flight
+            view[:] = bytes(SIZE)
+            values = [self.request_burst, now, float(self.tokens_per_minute), now, 0.0]
+        state = _State(values)
+        # Clocks may have gone back, e.g. after a reboot
+        elapsed = max(0.0, now - state.requests_time)
+        state.requests = min(self.request_burst, state.requests + elapsed * self.requests_per_second)
+        elapsed = max(0.0, now - state.tokens_time)
+        state.tokens = min(float(self.tokens_per_minute), state.tokens + elapsed * self.tokens_per_minute / 60)
+        state.requests_time = state.tokens_time = now
+        return state
+
+    def _store(self, view: mmap.mmap, state: _State) -> None:
+        """Write the buckets back."""
+        HEADER.pack_into(
+            view,
+            0,
+            MAGIC,
+            state.requests,
+            state.requests_time,
+            state.tokens,
+            state.tokens_time,
+            state.interactive_until,
+        )
+
+    def _free_slot(self, view: mmap.mmap, reserved: int) -> Optional[int]:
+        """Return a free in-flight slot, reclaiming those of dead processes.
+
+        Args:
+            view: Mapped shared file
+            reserved: Free slots that must remain after taking one
+
+        Returns:
+            The index of a free slot, or None if the cap is reached
+        """
+        free = []
+        for index in range(self.max_in_flight):
+            offset = HEADER.size + index * SLOT.size
+            (pid,) = SLOT.unpack_from(view, offset)
+            if pid and not _pid_alive(pid):
+                logger.debug("Reclaiming in-flight slot of exited process %d", pid)
+                SLOT.pack_into(view, offset, 0)
+                pid = 0
+            if not pid:
+                free.append(index)
+        return free[0] if len(free) > reserved else None
+
+    def _wait_time(self, view: mmap.mmap, state: _State, now: float, interactive: bool, tokens: int) -> float:
+        """Return how long a request has to wait, or 0 if it may start now."""
+        wait = 0.0
+        if not interactive and now < state.interactive_until:
+            wait = POLL_INTERVAL
+        if self.requests_per_second > 0 and state.requests < 1:
+            wait = max(wait, (1 - state.requests) / self.requests_per_second)
+        if self.tokens_per_minute > 0 and state.tokens < tokens:
+            wait = max(wait, (tokens - state.tokens) * 60 / self.tokens_per_minute)
+        if self.max_in_flight > 0:
+            # Bulk requests leave the last slot to interactive ones
+            reserved = 1 if not interactive and self.max_in_flight > 1 else 0
+            if self._free_slot(view, reserved) is None:
+                wait = max(wait, POLL_INTERVAL)
+        return wait
+
+    def acquire(self, mode: str, tokens: int) -> Lease:
+        """Wait until a request may start, and take its share of the limits.
+
+        Args:
+            mode: Mode of the request; interactive modes are served first
+            tokens: Estimated prompt and completion tokens of the request
+
+        Returns:
+            The lease to pass to ``release()`` once the request is done
+        """
+        interactive = mode in INTERACTIVE_MODES
+        # A request larger than the whole bucket waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._locked() as view:
+                now = time.time()
+                state = self._load(view, now)
+                wait = self._wait_time(view, state, now, interactive, tokens)
+                if wait <= 0:
+                    if self.requests_per_second > 0:
+                        state.requests -= 1
+                    state.tokens -= tokens
+                    slot = self._free_slot(view, 0) if self.max_in_flight > 0 else None
+                    if slot is not None:
+                        SLOT.pack_into(view, HEADER.size + slot * SLOT.size, os.getpid())
+                    self._store(view, state)
+                    return Lease(slot, tokens)
+                if interactive:
+                    # Hold bulk requests back until this one is served
+                    state.interactive_until = max(state.interactive_until, now + min(wait, MAX_SLEEP) + POLL_INTERVAL)
+                self._store(view, state)
+            logger.debug("Rate limited %s request, waiting %.2fs", mode, wait)
+            time.sleep(min(wait, MAX_SLEEP))
+
+    def release(self, lease: Lease, used_tokens: Optional[int] = None) -> None:
+        """Return a request's in-flight slot and refund tokens it did not use.
+
+        Args:
+            lease: Lease returned by ``acquire()``
+            used_tokens: Tokens the request actually used, if known
+        """
+        with self._locked() as view:
+            if lease.slot is not None:
+                SLOT.pack_into(view, HEADER.size + lease.slot * SLOT.size, 0)
+            if used_tokens is not None and used_tokens < lease.tokens:
+                state = self._load(view, time.time())
+                state.tokens = min(float(self.tokens_per_minute), state.tokens + lease.tokens - used_tokens)
+                self._store(view, state)
@@ -0,0 +1,217 @@
+"""Splitting of text into segments translated independently.
+
+A segment is a paragraph: text between blank lines. The whitespace around
+each paragraph is kept apart from it, so a translated document keeps the
+layout of the original, and the same paragraph is recognized wherever it
+moves to. Paragraphs mixing lines that need translation with lines that
+do not, e.g. in logs, are further split into runs of consecutive lines.
+
+Files are cut into segments on their bytes, e.g. memory-mapped, so a large
+file's boundaries are found without decoding the whole file at once.
+
+Input that is still arriving, such as ``tail -f log | aitrans``, is cut
+into segments as it is read: at paragraph breaks, at the end of a line
+ending a sentence once enough text is buffered, and whenever the input
+pauses, so nothing waits for the end of the input.
+"""
+
+import codecs
+import mmap
+import os
+import re
+import select
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+# One or more blank lines, with the whitespace around them
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+# A line ending with the end of a sentence, possibly followed by closing quotes
+_SENTENCE_END = re.compile(r"[.!?。！？][)\]\"'」』]*[ \t]*\n")
+
+_PARAGRAPH_BREAK_BYTES = re.compile(rb"\n[ \t]*\n\s*")
+
+# Characters buffered before input is cut at the end of a sentence
+MIN_SEGMENT_CHARS = 200
+# Characters after which input is cut at the last line break, or anywhere
+MAX_SEGMENT_CHARS = 2000
+
+
+class Segment:
+    """A paragraph and the whitespace around it."""
+
+    __slots__ = ("before", "text", "after")
+
+    def __init__(self, before: str, text: str, after: str) -> None:
+        """Initialize the segment.
+
+        Args:
+            before: Whitespace before the paragraph
+            text: The paragraph, without surrounding whitespace; empty if
+                the segment is only whitespace
+            after: Whitespace after the paragraph, up to the next one
+        """
+        self.before = before
+        self.text = text
+        self.after = after
+
+    def render(self, text: str) -> str:
+        """Return ``text`` in place of the paragraph, with the original whitespace."""
+        return self.before + text + self.after
+
+    def __repr__(self) -> str:
+        """Return a debug representation of the segment."""
+        return f"Segment({self.before!r}, {self.text!r}, {self.after!r})"
+
+
+def split_segments(text: str) -> List[Segment]:
+    """Split text into paragraphs; rendering them unchanged gives back ``text``."""
+    segments = []
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        segments.append(_segment(text[start : match.start()], match.group()))
+        start = match.end()
+    if start < len(text) or not segments:
+        segments.append(_segment(text[start:], ""))
+    return segments
+
+
+def _segment(paragraph: str, separator: str) -> Segment:
+    """Build a segment from a paragraph and the separator that follows it."""
+    body = paragraph.strip()
+    if not body:
+        return Segment("", "", paragraph + separator)
+    before = paragraph[: len(paragraph) - len(paragraph.lstrip())]
+    after = paragraph[len(before) + len(body) :]
+    return Segment(before, body, after + separator)
+
+
+def split_runs(segment: Segment, keep: Callable[[str], bool]) -> List[Tuple[Segment, bool]]:
+    """Split a paragraph into runs of consecutive lines that are all kept or all not.
+
+    A paragraph kept as a whole is not split, so a line too short to be
+    recognized on its own does not break up the paragraph around it. Lines
+    without letters, such as code fences, rules and numbers, never start a
+    run of their own: they stay with the lines around them, and between a
+    kept run and one that is not, with the one that is not, so what is
+    sent on keeps the lines framing it.
+
+    Args:
+        segment: Paragraph to split
+        keep: Checks if a line is kept unchanged
+
+    Returns:
+        The runs, each with whether it is kept; rendering them unchanged
+        gives back the paragraph
+    """
+    if keep(segment.text):
+        return [(segment, True)]
+    groups: List[Tuple[List[str], bool]] = []
+    # Lines without letters since the last line with some
+    pending: List[str] = []
+    for line in segment.text.splitlines(keepends=True):
+        if not any(char.isalpha() for char in line):
+            pending.append(line)
+            continue
+        kept = keep(line.strip())
+        if groups and groups[-1][1] == kept:
+            groups[-1][0].extend(pending + [line])
+        elif groups and kept:
+            groups[-1][0].extend(pending)
+            groups.append(([line], kept))
+        else:
+            groups.append((pending + [line], kept))
+        pending = []
+    if not groups:
+        return [(segment, False)]
+    groups[-1][0].extend(pending)
+    runs = [(_segment("".join(lines), ""), kept) for lines, kept in groups]
+    first, last = runs[0][0], runs[-1][0]
+    first.before = segment.before + first.before
+    last.after += segment.after
+    return runs
+
+
+def _cut(buffer: str, min_chars: int, max_chars: int) -> Optional[int]:
+    """Return where to cut the start of buffered input into a segment, or None to wait."""
+    paragraph_break = _PARAGRAPH_BREAK.search(buffer)
+    if paragraph_break is not None:
+        return paragraph_break.end()
+    if len(buffer) >= min_chars:
+        ends = [match.end() for match in _SENTENCE_END.finditer(buffer, 0, max_chars)]
+        if ends:
+            return ends[-1]
+    if len(buffer) >= max_chars:
+        line_end = buffer.rfind("\n", 0, max_chars)
+        return line_end + 1 if line_end >= 0 else max_chars
+    return None
+
+
+def read_segments(
+    fd: int, idle_timeout: float, min_chars: int = MIN_SEGMENT_CHARS, max_chars: int = MAX_SEGMENT_CHARS
+) -> Iterator[str]:
+    """Read UTF-8 input from a file descriptor, yielding segments as soon as they are complete.
+
+    Args:
+        fd: File descriptor to read, e.g. of stdin
+        idle_timeout: Seconds without input after which the complete lines
+            buffered, or the partial line if there are none, are yielded
+        min_chars: Characters buffered before input is cut at the end of a sentence
+        max_chars: Characters after which input is cut at the last line break
+
+    Yields:
+        str: The input in consecutive pieces; joined they give back the input
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    while True:
+        ready, _, _ = select.select([fd], [], [], idle_timeout if buffer else None)
+        if not ready:
+            # Complete lines go first; a partial line only if it is all there is
+            line_end = buffer.rfind("\n") + 1 or len(buffer)
+            yield buffer[:line_end]
+            buffer = buffer[line_end:]
+            continue
+        data = os.read(fd, 65536)
+        if not data:
+            buffer += decoder.decode(b"", final=True)
+            if buffer:
+                yield buffer
+            return
+        buffer += decoder.decode(data)
+        cut = _cut(buffer, min_chars, max_chars)
+        while cut is not None:
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+            cut = _cut(buffer, min_chars, max_chars)
+
+
+def byte_segments(
+    data: Union[bytes, "mmap.mmap"], start: int = 0, max_bytes: int = 4 * MAX_SEGMENT_CHARS
+) -> Iterator[Tuple[int, int]]:
+    """Yield the byte ranges of the paragraphs of UTF-8 data, from ``start`` on.
+
+    Each range ends after the blank lines following its paragraph, so the
+    ranges cover the data without gaps. Paragraphs longer than
+    ``max_bytes`` are cut at their last line break within the limit, or
+    else between two characters.
+
+    Args:
+        data: Data to split, e.g. a memory-mapped file
+        start: Offset to start at, which must be the start of a range
+        max_bytes: Longest range
+    """
+    size = len(data)
+    while start < size:
+        paragraph_break = _PARAGRAPH_BREAK_BYTES.search(data, start, min(size, start + max_bytes))
+        if paragraph_break is not None:
+            end = paragraph_break.end()
+        elif start + max_bytes >= size:
+            end = size
+        else:
+            end = data.rfind(b"\n", start, start + max_bytes) + 1
+            if end <= start:
+                end = start + max_bytes
+                # Do not cut inside a character: skip back over continuation bytes
+                while end > start + 1 and data[end] & 0xC0 == 0x80:
+                    end -= 1
+        yield start, end
+        start = end
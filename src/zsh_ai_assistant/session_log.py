@@ -0,0 +1,311 @@
+"""Persistent chat sessions stored as append-only logs.
+
+Each session is two files in the sessions directory:
+
+``<id>.log``
+    The messages, one record each: the payload length and its CRC-32 as
+    4-byte big-endian integers, then the payload, a UTF-8 JSON object with
+    the role and content.
+``<id>.idx``
+    The log offset of every record as an 8-byte big-endian integer, so the
+    n-th message is found without reading the ones before it.
+
+Appending a message writes one record and one index entry however long the
+session is. Resuming memory-maps the log and decodes only the messages of
+the context window. A crash between the two writes is repaired when the
+session is opened: index entries pointing past the log are dropped, records
+missing from the index are indexed, and a torn record at the end of the log
+is cut off.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from .interfaces import ChatHistoryInterface
+from .messages import AIMessage, BaseMessage, HumanMessage, MessageView, to_message
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">II")
+OFFSET = struct.Struct(">Q")
+
+LOG_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+
+# Session ids become file names, so they are kept to a safe alphabet
+_SESSION_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+TITLE_LENGTH = 60
+
+
+def new_session_id() -> str:
+    """Return a new session id that sorts by creation time."""
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+
+def _path(directory: str, session_id: str, suffix: str) -> str:
+    """Return the path of one of a session's files."""
+    if not _SESSION_ID.fullmatch(session_id):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    return os.path.join(directory, session_id + suffix)
+
+
+def session_exists(directory: str, session_id: str) -> bool:
+    """Check if a session with at least one message is stored in ``directory``."""
+    try:
+        return os.path.getsize(_path(directory, session_id, INDEX_SUFFIX)) >= OFFSET.size
+    except (OSError, ValueError):
+        return False
+
+
+class SessionInfo:
+    """Summary of a stored session."""
+
+    def __init__(self, session_id: str, messages: int, updated: float, title: str) -> None:
+        """Initialize the summary.
+
+        Args:
+            session_id: Id of the session
+            messages: Number of messages in the session
+            updated: Time of the last message, in seconds since the epoch
+            title: Start of the first message
+        """
+        self.session_id = session_id
+        self.messages = messages
+        self.updated = updated
+        self.title = title
+
+    def __repr__(self) -> str:
+        """Return string representation of the summary."""
+        return f"SessionInfo(session_id='{self.session_id}', messages={self.messages}, title={self.title!r})"
+
+
+def session_title(content: str) -> str:
+    """Return the first line of a message, shortened to a session title."""
+    lines = content.strip().splitlines()
+    title = lines[0] if lines else ""
+    return title if len(title) <= TITLE_LENGTH else title[: TITLE_LENGTH - 1] + "…"
+
+
+def _read_title(log_path: str) -> str:
+    """Return the start of the first message in a log, or "" if unreadable."""
+    try:
+        with open(log_path, "rb") as f:
+            length, _ = HEADER.unpack(f.read(HEADER.size))
+            content = json.loads(f.read(length)).get("content", "")
+    except (OSError, ValueError, struct.error, AttributeError):
+        return ""
+    return session_title(str(content))
+
+
+def list_sessions(directory: str) -> List[SessionInfo]:
+    """List the non-empty sessions in ``directory``, most recently updated first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    sessions = []
+    for name in names:
+        session_id, suffix = os.path.splitext(name)
+        if suffix != INDEX_SUFFIX or not _SESSION_ID.fullmatch(session_id):
+            continue
+        log_path = os.path.join(directory, session_id + LOG_SUFFIX)
+        try:
+            messages = os.path.getsize(os.path.join(directory, name)) // OFFSET.size
+            updated = os.path.getmtime(log_path)
+        except OSError:
+            continue
+        if messages:
+            sessions.append(SessionInfo(session_id, messages, updated, _read_title(log_path)))
+    sessions.sort(key=lambda session: session.updated, reverse=True)
+    return sessions
+
+
+def latest_session(directory: str) -> Optional[str]:
+    """Return the id of the most recently updated session, if any."""
+    sessions = list_sessions(directory)
+    return sessions[0].session_id if sessions else None
+
+
+class LogChatHistory(ChatHistoryInterface):
+    """Chat history persisted in an append-only session log.
+
+    ``get_messages()`` returns the messages of the context window: the last
+    ``window`` messages stored when the session was opened, followed by
+    every message added since. Older messages stay on disk and can be read
+    with ``read()``; ``len()`` counts all of them.
+    """
+
+    def __init__(self, directory: str, session_id: Optional[str] = None, window: Optional[int] = None) -> None:
+        """Open a session, creating it if it does not exist.
+
+        Args:
+            directory: Directory holding the session files
+            session_id: Session to open (default: a new session)
+            window: Number of stored messages to load on first use (default: all)
+        """
+        self.session_id = session_id or new_session_id()
+        self.directory = directory
+        self.log_path = _path(directory, self.session_id, LOG_SUFFIX)
+        self.index_path = _path(directory, self.session_id, INDEX_SUFFIX)
+        os.makedirs(directory, exist_ok=True)
+        # Appends always land at the end of the file, even with several writers
+        self._log = open(self.log_path, "a+b")
+        self._index = open(self.index_path, "a+b")
+        with self._locked():
+            self._count = self._recover()
+        self._start = self._count - min(window, self._count) if window is not None else 0
+        # Messages of the context window, decoded on first use
+        self._window: Optional[List[BaseMessage]] = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold an exclusive lock on the session while writing it."""
+        fcntl.flock(self._log, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._log, fcntl.LOCK_UN)
+
+    def _record_end(self, offset: int, log_size: int) -> Optional[int]:
+        """Return the end of the record at ``offset``, or None if it is torn or corrupt."""
+        fd = self._log.fileno()
+        if offset + HEADER.size > log_size:
+            return None
+        length, crc = HEADER.unpack(os.pread(fd, HEADER.size, offset))
+        end: int = offset + HEADER.size + length
+        if end > log_size or zlib.crc32(os.pread(fd, length, offset + HEADER.size)) != crc:
+            return None
+        return end
+
+    def _recover(self) -> int:
+        """Reconcile the index with the log after an interrupted append.
+
+        Only the last indexed record is checked when the files agree, so
+        opening a long session stays cheap.
+
+        Returns:
+            The number of messages in the session
+        """
+        log_size = os.fstat(self._log.fileno()).st_size
+        index_size = os.fstat(self._index.fileno()).st_size
+        count = index_size // OFFSET.size
+        end = 0
+        while count:
+            (offset,) = OFFSET.unpack(os.pread(self._index.fileno(), OFFSET.size, (count - 1) * OFFSET.size))
+            record_end = self._record_end(offset, log_size)
+            if record_end is not None:
+                end = record_end
+                break
+            count -= 1
+        if count * OFFSET.size != index_size:
+            logger.warning(
+                "Dropping %d stale index bytes of session %s", index_size - count * OFFSET.size, self.session_id
+            )
+            os.ftruncate(self._index.fileno(), count * OFFSET.size)
+
+        missing = []
+        while end < log_size:
+            record_end = self._record_end(end, log_size)
+            if record_end is None:
+                logger.warning("Truncating torn record at offset %d of session %s", end, self.session_id)
+                os.ftruncate(self._log.fileno(), end)
+                break
+            missing.append(end)
+            end = record_end
+        if missing:
+            self._index.write(b"".join(OFFSET.pack(offset) for offset in missing))
+            self._index.flush()
+        return count + len(missing)
+
+    def _append(self, message: BaseMessage) -> None:
+        """Append a message to the log and the index."""
+        payload = json.dumps(message.to_dict(), ensure_ascii=False).encode("utf-8")
+        record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._locked():
+            # Another process may have appended since, so the offset comes from the file
+            offset = os.fstat(self._log.fileno()).st_size
+            self._log.write(record)
+            self._log.flush()
+            self._index.write(OFFSET.pack(offset))
+            self._index.flush()
+            self._count = os.fstat(self._index.fileno()).st_size // OFFSET.size
+        if self._window is not None:
+            self._window.append(message)
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> List[BaseMessage]:
+        """Read stored messages ``start`` to ``stop`` (default: to the end).
+
+        Only the index entries of the range are read, and the records are
+        decoded straight from a memory map of the log.
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        if start >= stop:
+            return []
+        offsets = os.pread(self._index.fileno(), (stop - start) * OFFSET.size, start * OFFSET.size)
+        messages = []
+        with mmap.mmap(self._log.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for (offset,) in OFFSET.iter_unpack(offsets):
+                length, _ = HEADER.unpack_from(view, offset)
+                begin = offset + HEADER.size
+                messages.append(to_message(json.loads(view[begin : begin + length])))
+        return messages
+
+    def add_user_message(self, message: str) -> None:
+        """Add a user message to the chat history."""
+        self._append(HumanMessage(message))
+
+    def add_ai_message(self, message: str) -> None:
+        """Add an AI message to the chat history."""
+        self._append(AIMessage(message))
+
+    def get_messages(self) -> MessageView:
+        """Get a read-only snapshot of the messages of the context window."""
+        if self._window is None:
+            window = self.read(self._start)
+            # A window starting with an answer would lack its question
+            if window and window[0].role == "assistant":
+                del window[0]
+                self._start += 1
+            self._window = window
+        return MessageView(self._window, len(self._window))
+
+    def clear(self) -> None:
+        """Clear the chat history, deleting the stored messages."""
+        with self._locked():
+            os.ftruncate(self._log.fileno(), 0)
+            os.ftruncate(self._index.fileno(), 0)
+        self._count = self._start = 0
+        self._window = []
+
+    def close(self) -> None:
+        """Close the session files."""
+        self._log.close()
+        self._index.close()
+
+    def __enter__(self) -> "LogChatHistory":
+        """Return the history for use in a ``with`` block."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close the session files."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of messages stored in the session."""
+        return self._count
+
+    def __bool__(self) -> bool:
+        """Return True if the session has messages."""
+        return self._count > 0
@@ -0,0 +1,248 @@
+"""Single-flight coalescing of identical requests across processes.
+
+When several shells ask for the same command or translation at the same
+time, only the first one calls the model. It takes an exclusive lock on
+``<key>.lock`` and writes the response, as it streams in, to
+``<key>.stream``; identical callers find the lock taken and follow the
+stream file instead of making their own request, so every token reaches
+all of them.
+
+A stream file is a sequence of records: a kind byte and a 4-byte
+big-endian payload length, then the payload. Data records carry UTF-8
+text, the end record closes a complete response, and an error record
+carries the leader's error message. A stream without an end record whose
+lock is free was abandoned; followers that have not received anything yet
+retry, possibly as the new leader.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Callable, Generator, Iterator, List, Optional, Tuple
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+RECORD = struct.Struct(">BI")
+
+DATA = 0
+END = 1
+ERROR = 2
+
+LOCK_SUFFIX = ".lock"
+STREAM_SUFFIX = ".stream"
+
+# Seconds between checks of a stream file for new records
+POLL_INTERVAL = 0.01
+
+
+class SingleFlightError(Exception):
+    """Raised to followers when the shared request failed or was abandoned."""
+
+
+def request_key(*parts: Any) -> str:
+    """Return the key identifying a request made of ``parts`` (JSON serializable)."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so prompts differing only in spacing share a request."""
+    return " ".join(prompt.split())
+
+
+def _same_file(path: str, fd: int) -> bool:
+    """Check that ``path`` still names the file open as ``fd``."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+class SingleFlight:
+    """Coalesce identical concurrent requests through files in a directory."""
+
+    def __init__(self, directory: str) -> None:
+        """Initialize single-flight coordination.
+
+        Args:
+            directory: Directory for the lock and stream files of in-flight requests
+        """
+        self.directory = directory
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        """Return the lock and stream file paths of a request."""
+        base = os.path.join(self.directory, key)
+        return base + LOCK_SUFFIX, base + STREAM_SUFFIX
+
+    def _try_lead(self, lock_path: str) -> Optional[int]:
+        """Take the request's lock if nobody holds it.
+
+        Returns:
+            The locked file descriptor, or None if another caller leads
+        """
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        # The previous leader may have removed the file between our open and lock
+        if not _same_file(lock_path, fd):
+            os.close(fd)
+            return None
+        return fd
+
+    def stream(self, key: str, produce: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Stream a response, sharing it with identical concurrent callers.
+
+        Args:
+            key: Key of the request, see ``request_key()``
+            produce: Makes the request; only called by the leading caller
+
+        Yields:
+            str: Chunks of the response
+
+        Raises:
+            SingleFlightError: If the shared request failed or was abandoned midway
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path, stream_path = self._paths(key)
+        while True:
+            lock_fd = self._try_lead(lock_path)
+            if lock_fd is not None:
+                yield from self._lead(lock_fd, lock_path, stream_path, produce)
+                return
+            try:
+                stream_fd = os.open(stream_path, os.O_RDONLY)
+            except FileNotFoundError:
+                # The leader has not created the stream yet, or has just finished
+                time.sleep(POLL_INTERVAL)
+                continue
+            logger.debug("Following in-flight request %s", key[:12])
+            received = yield from self._follow(stream_fd, lock_path, stream_path)
+            if received is not None:
+                return
+            logger.debug("In-flight request %s was abandoned, retrying", key[:12])
+
+    def call(self, key: str, produce: Callable[[], str]) -> str:
+        """Return a response, sharing it with identical concurrent callers.
+
+        Args:
+            key: Key of the request, see ``request_key()``
+            produce: Makes the request; only called by the leading caller
+        """
+        return "".join(self.stream(key, lambda: iter([produce()])))
+
+    def _lead(
+        self, lock_fd: int, lock_path: str, stream_path: str, produce: Callable[[], Iterator[str]]
+    ) -> Iterator[str]:
+        """Make the request, writing each chunk to the stream file as it is yielded."""
+        # A new file replaces any stream left behind by a crashed leader
+        fd, tmp_path = tempfile.mkstemp(prefix=".stream-", dir=self.directory)
+        os.replace(tmp_path, stream_path)
+        completed = False
+        try:
+            for chunk in produce():
+                payload = chunk.encode("utf-8")
+                os.write(fd, RECORD.pack(DATA, len(payload)) + payload)
+                yield chunk
+            os.write(fd, RECORD.pack(END, 0))
+            completed = True
+        except Exception as e:
+            payload = str(e).encode("utf-8")
+            os.write(fd, RECORD.pack(ERROR, len(payload)) + payload)
+            completed = True
+            raise
+        finally:
+            if not completed:
+                logger.debug("Abandoning in-flight request")
+            # Followers keep reading the unlinked file; new callers start a new request
+            if _same_file(stream_path, fd):
+                os.unlink(stream_path)
+            os.close(fd)
+            os.unlink(lock_path)
+            os.close(lock_fd)
+
+    def _leader_gone(self, lock_path: str, stream_path: str, stream_fd: int) -> bool:
+        """Check if the leader writing a stream has stopped."""
+        if not _same_file(stream_path, stream_fd):
+            return True
+        try:
+            fd = os.open(lock_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        finally:
+            os.close(fd)
+        return True
+
+    def _follow(self, stream_fd: int, lock_path: str, stream_path: str) -> Generator[str, None, Optional[int]]:
+        """Yield the chunks written to a stream file until its end record.
+
+        Returns:
+            The number of chunks received, or None if the stream was abandoned
+            before any was received (the caller then retries)
+        """
+        buffer = b""
+        received = 0
+        leader_gone = False
+        try:
+            while True:
+                data = os.read(stream_fd, 65536)
+                if data:
+                    buffer += data
+                    chunks, end, error, buffer = _parse(buffer)
+                    for chunk in chunks:
+                        received += 1
+                        yield chunk
+                    if error is not None:
+                        raise SingleFlightError(error)
+                    if end:
+                        return received
+                    continue
+                if leader_gone:
+                    # Everything the leader wrote has been read and it never finished
+                    if received:
+                        raise SingleFlightError("The shared request was abandoned")
+                    return None
+                # Read once more after the leader is gone, in case it finished meanwhile
+                leader_gone = self._leader_gone(lock_path, stream_path, stream_fd)
+                if not leader_gone:
+                    time.sleep(POLL_INTERVAL)
+        finally:
+            os.close(stream_fd)
+
+
+def _parse(buffer: bytes) -> Tuple[List[str], bool, Optional[str], bytes]:
+    """Split the complete records off a stream buffer.
+
+    Returns:
+        The data chunks, whether the end record was reached, the error message
+        if an error record was reached, and the bytes of an incomplete record
+    """
+    chunks: List[str] = []
+    pos = 0
+    while len(buffer) - pos >= RECORD.size:
+        kind, length = RECORD.unpack_from(buffer, pos)
+        end = pos + RECORD.size + length
+        if end > len(buffer):
+            break
+        payload = buffer[pos + RECORD.size : end]
+        pos = end
+        if kind == END:
+            return chunks, True, None, b""
+        if kind == ERROR:
+            return chunks, False, payload.decode("utf-8", "replace"), b""
+        chunks.append(payload.decode("utf-8"))
+    return chunks, False, None, buffer[pos:]
@@ -0,0 +1,365 @@
+"""Chat sessions stored in SQLite with full-text search.
+
+All sessions live in one database, ``history.db`` in the sessions directory,
+so past answers can be searched across every shell. The database runs in WAL
+mode: readers never wait for writers, and writers only wait for each other
+for the length of one short transaction. Messages are inserted in batches,
+one transaction per batch, and an FTS5 index over their content is kept up
+to date by triggers. SQLite builds without FTS5 fall back to a ``LIKE`` scan.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .interfaces import ChatHistoryInterface
+from .messages import BaseMessage, MessageLike, MessageView, to_message
+from . import session_log
+from .session_log import SessionInfo, new_session_id, session_title
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "history.db"
+SCHEMA_VERSION = 1
+DEFAULT_BATCH_SIZE = 32
+
+# Milliseconds a writer waits for another one before giving up
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        messages INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS messages_by_session ON messages(session_id, id)",
+    "CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions(updated)",
+)
+
+# The index stores no copy of the text; triggers keep it in step with messages
+_FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+)
+
+
+def database_path(directory: str) -> str:
+    """Return the path of the history database in ``directory``."""
+    return os.path.join(directory, DATABASE_NAME)
+
+
+def connect(directory: str) -> sqlite3.Connection:
+    """Open the history database, creating it if needed.
+
+    The connection is in autocommit mode; writes use explicit transactions.
+    """
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(database_path(directory), timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    connection.execute("PRAGMA foreign_keys = ON")
+    if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            try:
+                for statement in _FTS_SCHEMA:
+                    connection.execute(statement)
+            except sqlite3.OperationalError as e:
+                logger.warning("Full-text search is unavailable, falling back to LIKE: %s", e)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    # WAL only needs a full sync at checkpoints
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def _has_fts(connection: sqlite3.Connection) -> bool:
+    """Check if the database has the full-text index."""
+    row = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+    return row is not None
+
+
+def session_exists(directory: str, session_id: str) -> bool:
+    """Check if a session with at least one message is stored in ``directory``."""
+    if not os.path.exists(database_path(directory)):
+        return False
+    with closing(connect(directory)) as connection:
+        row = connection.execute("SELECT 1 FROM sessions WHERE id = ? AND messages > 0", (session_id,)).fetchone()
+    return row is not None
+
+
+def list_sessions(directory: str, limit: Optional[int] = None) -> List[SessionInfo]:
+    """List the non-empty sessions in ``directory``, most recently updated first."""
+    if not os.path.exists(database_path(directory)):
+        return []
+    with closing(connect(directory)) as connection:
+        rows = connection.execute(
+            "SELECT id, messages, updated, title FROM sessions WHERE messages > 0 ORDER BY updated DESC LIMIT ?",
+            (-1 if limit is None else limit,),
+        ).fetchall()
+    return [SessionInfo(session_id, messages, updated, title) for session_id, messages, updated, title in rows]
+
+
+def latest_session(directory: str) -> Optional[str]:
+    """Return the id of the most recently updated session, if any."""
+    sessions = list_sessions(directory, limit=1)
+    return sessions[0].session_id if sessions else None
+
+
+class SearchResult:
+    """A message matching a history search."""
+
+    def __init__(self, session_id: str, role: str, snippet: str, created: float, rank: float) -> None:
+        """Initialize the result.
+
+        Args:
+            session_id: Session the message belongs to
+            role: Role of the message
+            snippet: Part of the message around the matches
+            created: Time the message was stored, in seconds since the epoch
+            rank: Relevance, lower is better
+        """
+        self.session_id = session_id
+        self.role = role
+        self.snippet = snippet
+        self.created = created
+        self.rank = rank
+
+    def __repr__(self) -> str:
+        """Return string representation of the result."""
+        return f"SearchResult(session_id='{self.session_id}', role='{self.role}', snippet={self.snippet!r})"
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Every word is quoted, so punctuation such as ``'`` or ``-`` in shell
+    snippets is searched for literally instead of being parsed as syntax.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search(directory: str, query: str, limit: int = 20, highlight: Tuple[str, str] = ("[", "]")) -> List[SearchResult]:
+    """Search the content of every stored message.
+
+    Args:
+        directory: Directory holding the history database
+        query: Words that must all appear in a message
+        limit: Maximum number of results
+        highlight: Text inserted before and after each match in the snippets
+
+    Returns:
+        The best matching messages, best first
+    """
+    if not query.split() or not os.path.exists(database_path(directory)):
+        return []
+    with closing(connect(directory)) as connection:
+        if _has_fts(connection):
+            rows = connection.execute(
+                "SELECT m.session_id, m.role, snippet(messages_fts, 0, ?, ?, '…', 16), m.created, "
+                "bm25(messages_fts) AS score FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "WHERE messages_fts MATCH ? ORDER BY score LIMIT ?",
+                (highlight[0], highlight[1], _fts_query(query), limit),
+            ).fetchall()
+        else:
+            conditions = " AND ".join("content LIKE ? ESCAPE '\\'" for _ in query.split())
+            patterns = [
+                "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for word in query.split()
+            ]
+            rows = connection.execute(
+                f"SELECT session_id, role, content, created, 0 FROM messages WHERE {conditions} "
+                "ORDER BY id DESC LIMIT ?",
+                (*patterns, limit),
+            ).fetchall()
+    return [SearchResult(*row) for row in rows]
+
+
+def import_logs(directory: str) -> int:
+    """Copy messages of append-only session logs into the history database.
+
+    Only messages the database does not have yet are read, so calling this
+    before every search costs little once the logs have been imported.
+
+    Returns:
+        The number of messages imported
+    """
+    logs = session_log.list_sessions(directory)
+    if not logs:
+        return 0
+    with closing(connect(directory)) as connection:
+        stored = dict(connection.execute("SELECT id, messages FROM sessions").fetchall())
+    imported = 0
+    for info in logs:
+        start = stored.get(info.session_id, 0)
+        if info.messages <= start:
+            continue
+        with session_log.LogChatHistory(directory, info.session_id, window=0) as log:
+            messages = log.read(start)
+        with SQLiteChatHistory(directory, info.session_id, batch_size=DEFAULT_BATCH_SIZE * 16) as history:
+            history.add_messages(messages, created=info.updated)
+        imported += len(messages)
+    if imported:
+        logger.info("Imported %d messages from session logs", imported)
+    return imported
+
+
+class SQLiteChatHistory(ChatHistoryInterface):
+    """Chat history of one session in the shared SQLite database.
+
+    Added messages are buffered and written ``batch_size`` at a time in a
+    single transaction; ``flush()`` (or ``close()``) writes the rest.
+    ``get_messages()`` returns the context window: the last ``window``
+    messages stored when the session was opened, followed by every message
+    added since.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        session_id: Optional[str] = None,
+        window: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Open a session, creating it on its first message.
+
+        Args:
+            directory: Directory holding the history database
+            session_id: Session to open (default: a new session)
+            window: Number of stored messages to load on first use (default: all)
+            batch_size: Messages buffered before they are written
+        """
+        self.session_id = session_id or new_session_id()
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self._connection = connect(directory)
+        self._window_size = window
+        self._pending: List[Tuple[str, str, float]] = []
+        row = self._connection.execute("SELECT messages FROM sessions WHERE id = ?", (self.session_id,)).fetchone()
+        self._count: int = row[0] if row else 0
+        # Messages of the context window, loaded on first use
+        self._window: Optional[List[BaseMessage]] = None
+
+    def _add(self, role: str, content: str, created: Optional[float] = None) -> None:
+        """Buffer a message, writing the batch once it is full."""
+        self._pending.append((role, content, time.time() if created is None else created))
+        self._count += 1
+        if self._window is not None:
+            self._window.append(to_message({"role": role, "content": content}))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_messages(self, messages: Iterable[MessageLike], created: Optional[float] = None) -> None:
+        """Add messages in bulk, e.g. when importing other sessions.
+
+        Args:
+            messages: Message dictionaries with a role and content
+            created: Time to store the messages with (default: now)
+        """
+        for message in messages:
+            self._add(str(message.get("role", "user")), str(message.get("content", "")), created)
+
+    def add_user_message(self, message: str) -> None:
+        """Add a user message to the chat history."""
+        self._add("user", message)
+
+    def add_ai_message(self, message: str) -> None:
+        """Add an AI message to the chat history."""
+        self._add("assistant", message)
+
+    def flush(self) -> None:
+        """Write the buffered messages in one transaction."""
+        if not self._pending:
+            return
+        pending = self._pending
+        title = next((session_title(content) for role, content, _ in pending if role == "user"), "")
+        connection = self._connection
+        # Take the write lock up front, so the transaction never has to upgrade
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO sessions (id, created, updated, title, messages) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, messages = messages + excluded.messages, "
+                "title = CASE WHEN title = '' THEN excluded.title ELSE title END",
+                (self.session_id, pending[0][2], pending[-1][2], title, len(pending)),
+            )
+            connection.executemany(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                [(self.session_id, role, content, created) for role, content, created in pending],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._pending = []
+
+    def get_messages(self) -> MessageView:
+        """Get a read-only snapshot of the messages of the context window."""
+        if self._window is None:
+            stored = self._count - len(self._pending)
+            limit = stored if self._window_size is None else min(self._window_size, stored)
+            rows = self._connection.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, limit),
+            ).fetchall()
+            window = [to_message({"role": role, "content": content}) for role, content in reversed(rows)]
+            # A window starting with an answer would lack its question
+            if window and window[0].role == "assistant":
+                del window[0]
+            window.extend(to_message({"role": role, "content": content}) for role, content, _ in self._pending)
+            self._window = window
+        return MessageView(self._window, len(self._window))
+
+    def clear(self) -> None:
+        """Clear the chat history, deleting the stored messages."""
+        self._pending = []
+        self._connection.execute("DELETE FROM sessions WHERE id = ?", (self.session_id,))
+        self._count = 0
+        self._window = []
+
+    def close(self) -> None:
+        """Write the buffered messages and close the database."""
+        try:
+            self.flush()
+        finally:
+            self._connection.close()
+
+    def __enter__(self) -> "SQLiteChatHistory":
+        """Return the history for use in a ``with`` block."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Write the buffered messages and close the database."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of messages in the session."""
+        return self._count
+
+    def __bool__(self) -> bool:
+        """Return True if the session has messages."""
+        return self._count > 0
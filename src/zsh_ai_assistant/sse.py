@@ -0,0 +1,182 @@
+"""Incremental server-sent events parser for chat completion streams.
+
+Local models stream hundreds of tokens per second, one small event each, so
+the parser avoids per-event copies: events that arrive whole within one
+network read are located by offset in the read buffer, and only the
+``delta.content`` string of an event is decoded. Events split across reads
+are reassembled in a reusable ``bytearray``. Anything the fast path does not
+recognize (escapes aside) is handed to ``json.loads``.
+"""
+
+import json
+from typing import Any, Iterator, Optional, Tuple, cast
+
+# The data of one event: (buffer, start, end)
+Span = Tuple[bytes, int, int]
+
+_DONE = b"[DONE]"
+_WHITESPACE = b" \t\r\n"
+_DECODER = json.JSONDecoder()
+
+
+class SSEParser:
+    """Split a byte stream into the data of server-sent events.
+
+    Feed it the bytes of each read in order; it yields the ``data`` of every
+    event completed by them. Multi-line data is joined with newlines,
+    comments and other fields are ignored, and the ``[DONE]`` sentinel ends
+    the stream.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the parser."""
+        # Start of an event whose end has not been received yet
+        self._pending = bytearray()
+        self.done = False
+
+    def feed(self, data: bytes) -> Iterator[Span]:
+        """Yield the data spans of the events completed by ``data``.
+
+        The spans refer to ``data`` itself unless an event straddles reads,
+        so no bytes are copied for events received in one piece.
+        """
+        if self.done or not data:
+            return
+        pending = self._pending
+        if b"\r" in data or (pending and pending[-1] == 13):
+            # CRLF line endings are rare; normalize them on a copy, rejoining
+            # a CR and LF split across reads
+            data = (bytes(pending) + data).replace(b"\r\n", b"\n")
+            pending.clear()
+        start = 0
+        if pending:
+            if pending[-1] == 10 and data[0] == 10:
+                # The blank line ending the event starts this read
+                pending.pop()
+                start = 1
+            else:
+                end = data.find(b"\n\n")
+                if end == -1:
+                    pending += data
+                    return
+                pending += memoryview(data)[:end]
+                start = end + 2
+            event = bytes(pending)
+            pending.clear()
+            yield from self._event(event, 0, len(event))
+            if self.done:
+                return
+        find = data.find
+        end = find(b"\n\n", start)
+        while end != -1:
+            yield from self._event(data, start, end)
+            if self.done:
+                return
+            start = end + 2
+            end = find(b"\n\n", start)
+        if start < len(data):
+            pending += memoryview(data)[start:]
+
+    def _event(self, buffer: bytes, start: int, end: int) -> Iterator[Span]:
+        """Yield the data span of the event at ``buffer[start:end]``, if it has data."""
+        if buffer.startswith(b"data:", start) and buffer.find(b"\n", start, end) == -1:
+            # Common case: a single data line
+            start += 5
+            if start < end and buffer[start] == 32:
+                start += 1
+            span = (buffer, start, end)
+        else:
+            lines = []
+            for line in buffer[start:end].split(b"\n"):
+                if line.startswith(b"data:"):
+                    value = line[5:]
+                    lines.append(value[1:] if value.startswith(b" ") else value)
+            if not lines:
+                return
+            joined = b"\n".join(lines)
+            span = (joined, 0, len(joined))
+        data, data_start, data_end = span
+        if data_end - data_start == len(_DONE) and data.startswith(_DONE, data_start):
+            self.done = True
+            return
+        yield span
+
+    def flush(self) -> Iterator[Span]:
+        """Yield the data of an event left unterminated at the end of the stream."""
+        if self._pending and not self.done:
+            event = bytes(self._pending).rstrip(b"\n")
+            self._pending.clear()
+            yield from self._event(event, 0, len(event))
+
+
+def _skip_whitespace(buffer: bytes, index: int, end: int) -> int:
+    """Return the index of the first non-whitespace byte at or after ``index``."""
+    while index < end and buffer[index] in _WHITESPACE:
+        index += 1
+    return index
+
+
+def _parse_delta_content(event: Any) -> Optional[str]:
+    """Return ``choices[0].delta.content`` of a parsed event, if any."""
+    if not isinstance(event, dict):
+        return None
+    choices = event.get("choices")
+    if not choices:
+        return None
+    content = (choices[0].get("delta") or {}).get("content")
+    return content if isinstance(content, str) else None
+
+
+def delta_content(buffer: bytes, start: int, end: int) -> Optional[str]:
+    """Extract ``choices[0].delta.content`` from the JSON event at ``buffer[start:end]``.
+
+    Only the content string is decoded when the delta is a flat object whose
+    ``content`` is a string or null; other events are parsed in full.
+
+    Returns:
+        The content, or None if the event carries none
+    """
+    delta = buffer.find(b'"delta"', start, end)
+    key = buffer.find(b'"content"', delta, end) if delta != -1 else -1
+    # A brace in between means content may belong to a nested object
+    if key == -1 or buffer.find(b"}", delta, key) != -1 or buffer.find(b'"tool_calls"', delta, end) != -1:
+        return _parse_delta_content(json.loads(buffer[start:end]))
+    index = _skip_whitespace(buffer, key + 9, end)
+    if index >= end or buffer[index] != 58:  # ":"
+        return _parse_delta_content(json.loads(buffer[start:end]))
+    index = _skip_whitespace(buffer, index + 1, end)
+    if buffer.startswith(b"null", index):
+        return None
+    if index >= end or buffer[index] != 34:  # '"'
+        return _parse_delta_content(json.loads(buffer[start:end]))
+    close = buffer.find(b'"', index + 1, end)
+    if close == -1:
+        return _parse_delta_content(json.loads(buffer[start:end]))
+    if buffer.find(b"\\", index + 1, close) == -1:
+        return str(memoryview(buffer)[index + 1 : close], "utf-8")
+    # Escapes: let the JSON decoder handle the string from here
+    return cast(str, _DECODER.raw_decode(str(memoryview(buffer)[index:end], "utf-8"))[0])
+
+
+def iter_data(stream: Any, chunk_size: int = 65536) -> Iterator[Span]:
+    """Yield the data spans of the events read from a binary stream.
+
+    ``read1`` is preferred so each token is handled as soon as it arrives
+    instead of waiting for a full ``chunk_size`` read.
+    """
+    read = getattr(stream, "read1", None) or stream.read
+    parser = SSEParser()
+    while not parser.done:
+        data = read(chunk_size)
+        if not data:
+            yield from parser.flush()
+            return
+        yield from parser.feed(data)
+
+
+def iter_delta_content(stream: Any, chunk_size: int = 65536) -> Iterator[str]:
+    """Yield the non-empty delta contents of a chat completion event stream."""
+    for buffer, start, end in iter_data(stream, chunk_size):
+        content = delta_content(buffer, start, end)
+        if content:
+            yield content
@@ -0,0 +1,80 @@
+"""Small state files shared between short-lived CLI processes.
+
+Every Enter on a comment starts a new ``cli.py`` process, so anything learned
+about the backend (latency, failures) has to live on disk to be useful to the
+next one. The files are tiny JSON documents guarded by an advisory lock and
+replaced atomically, so concurrent shells never see a half-written file.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+
+class SharedStateFile:
+    """JSON document shared between processes."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the state file.
+
+        Args:
+            path: Location of the JSON file; a ``.lock`` file is kept next to it
+        """
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the document, treating a missing or corrupt file as empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug("Ignoring unreadable state file %s: %s", self.path, e)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def read(self) -> Dict[str, Any]:
+        """Return a snapshot of the document.
+
+        Writers replace the file atomically, so reading needs no lock.
+        """
+        return self._load()
+
+    @contextmanager
+    def update(self) -> Iterator[Dict[str, Any]]:
+        """Read-modify-write the document under an exclusive lock.
+
+        Yields:
+            The current document; changes made to it are written back on exit
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._load()
+                yield data
+                self._write(data)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """Atomically replace the document."""
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".state-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
@@ -0,0 +1,337 @@
+"""Translation pipelines built on the service's streaming translation.
+
+Every target language is translated by its own worker thread, all sharing
+one service and its connections, so translating into four languages takes
+about as long as the slowest one. Each translation is handed back as an
+iterator over its streamed chunks; chunks arriving for a language that is
+not being read yet are buffered until it is.
+
+With a translation memory, a text is translated paragraph by paragraph:
+paragraphs translated before are emitted straight from the memory, and
+only the others are sent to the model, a few at a time, with their
+translations streamed in order and stored as they complete. Paragraphs
+and lines already in the target language are passed through unchanged.
+
+Input still arriving is translated segment by segment as it is read, a
+few segments at a time, with the translations streamed in input order.
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, cast
+
+from .ratelimit import estimate_tokens
+from .segmentation import Segment, split_runs, split_segments
+from .translation_memory import TranslationMemory
+
+if TYPE_CHECKING:
+    from .ai_service import LangChainAIService
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Marks the end of a translation in its queue
+_DONE = object()
+
+
+def parse_targets(spec: str) -> List[str]:
+    """Split a comma-separated list of target languages, dropping duplicates."""
+    targets: List[str] = []
+    for target in spec.split(","):
+        target = target.strip()
+        if target and target not in targets:
+            targets.append(target)
+    return targets
+
+
+class ChunkStream:
+    """Chunks produced by a worker thread, read by another thread."""
+
+    def __init__(self) -> None:
+        """Initialize an empty stream."""
+        self._queue: "queue.Queue[Union[str, BaseException, object]]" = queue.Queue()
+
+    def feed(self, produce: Callable[[], Iterator[str]]) -> None:
+        """Put every chunk of ``produce()`` into the stream, then its end or error."""
+        try:
+            for chunk in produce():
+                self._queue.put(chunk)
+        except Exception as e:
+            self._queue.put(e)
+        self._queue.put(_DONE)
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield the chunks as they arrive, raising the producer's error if it failed."""
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield str(item)
+
+
+def translate_concurrently(
+    service: "LangChainAIService", text: str, targets: List[str]
+) -> List[Tuple[str, ChunkStream]]:
+    """Start translating a text into every target language at the same time.
+
+    Args:
+        service: Service shared by the workers
+        text: Text to translate
+        targets: Target languages
+
+    Returns:
+        The target languages with the streams of their translations, in order
+    """
+    streams = []
+    for target in targets:
+        stream = ChunkStream()
+        # Daemon threads do not keep an interrupted process alive
+        worker = threading.Thread(
+            target=stream.feed,
+            args=(lambda target=target: service.translate_stream(text, target),),
+            name=f"translate-{target}",
+            daemon=True,
+        )
+        worker.start()
+        streams.append((target, stream))
+    return streams
+
+
+def _strip_stream(chunks: Iterator[str]) -> Iterator[str]:
+    """Yield streamed chunks without the whitespace around the whole text."""
+    started = False
+    held = ""
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        body = chunk.rstrip()
+        if body:
+            yield held + body
+            held = ""
+        held += chunk[len(body) :]
+
+
+class TranslationStats:
+    """Segments of translated texts, and the requests and tokens saved by not sending some."""
+
+    __slots__ = ("segments", "passed_through", "remembered", "translated", "requests_saved", "tokens_saved", "_lock")
+
+    def __init__(self) -> None:
+        """Initialize all counts to zero."""
+        self.segments = 0
+        self.passed_through = 0
+        self.remembered = 0
+        self.translated = 0
+        self.requests_saved = 0
+        self.tokens_saved = 0
+        # Translations running in several threads add to the same counts
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        segments: int,
+        passed_through: int,
+        remembered: int,
+        translated: int,
+        requests_saved: int,
+        tokens_saved: int,
+    ) -> None:
+        """Add the counts of one translation."""
+        with self._lock:
+            self.segments += segments
+            self.passed_through += passed_through
+            self.remembered += remembered
+            self.translated += translated
+            self.requests_saved += requests_saved
+            self.tokens_saved += tokens_saved
+
+    def __str__(self) -> str:
+        """Return the counts as logged after a translation."""
+        return (
+            f"{self.segments} segments: {self.translated} translated, {self.remembered} from memory, "
+            f"{self.passed_through} already in the target language; "
+            f"saved {self.requests_saved} requests and about {self.tokens_saved} tokens"
+        )
+
+
+def _merge(first: Segment, second: Segment) -> Segment:
+    """Return one segment spanning two consecutive ones."""
+    return Segment(first.before, first.text + first.after + second.before + second.text, second.after)
+
+
+def translate_segments(
+    text: str,
+    target: str,
+    translate_segment: Callable[[str], Iterator[str]],
+    memory: Optional[TranslationMemory],
+    model: str,
+    workers: int,
+    passthrough: Optional[Callable[[str], bool]] = None,
+    stats: Optional[TranslationStats] = None,
+    glossary: str = "",
+) -> Iterator[str]:
+    """Translate a text segment by segment, sending only what needs translating.
+
+    Segments that ``passthrough`` accepts are emitted unchanged. With a
+    memory, every other paragraph is looked up and only those not found
+    are sent to the model; without one, consecutive segments to translate
+    are sent together.
+
+    Args:
+        text: Text to translate
+        target: Target language
+        translate_segment: Streams the translation of one segment
+        memory: Memory paragraphs are looked up in and stored to, if any
+        model: Model the translations are made with
+        workers: Number of segments sent to the model at the same time
+        passthrough: Checks if a segment needs no translation, if any
+        stats: Counts updated with this translation, if any
+        glossary: Digest of the glossary the translations are made with, "" for none
+
+    Yields:
+        str: The translated text, in order
+    """
+    paragraphs = split_segments(text)
+    units: List[Tuple[Segment, Optional[str]]] = []
+    for paragraph in paragraphs:
+        if not paragraph.text or passthrough is None:
+            units.append((paragraph, "" if not paragraph.text else None))
+            continue
+        for run, kept in split_runs(paragraph, passthrough):
+            units.append((run, run.text if kept else None))
+    passed_through = [unit for unit, found in units if found]
+    if memory is None:
+        # Without a memory there is nothing to gain from separate requests
+        merged: List[Tuple[Segment, Optional[str]]] = []
+        for unit, found in units:
+            if found is None and merged and merged[-1][1] is None:
+                unit = _merge(merged.pop()[0], unit)
+            merged.append((unit, found))
+        units = merged
+    else:
+        units = [
+            (unit, memory.lookup(unit.text, target, model, glossary) if found is None else found)
+            for unit, found in units
+        ]
+    missing = [index for index, (_, found) in enumerate(units) if found is None]
+
+    if stats is not None:
+        passed_ids = {id(unit) for unit in passed_through}
+        remembered = [unit for unit, found in units if found and id(unit) not in passed_ids]
+        # Compared to sending every paragraph, or the whole text, as it is
+        baseline = (
+            sum(1 for paragraph in paragraphs if paragraph.text) if memory is not None else int(bool(text.strip()))
+        )
+        stats.add(
+            segments=sum(1 for unit, _ in units if unit.text),
+            passed_through=len(passed_through),
+            remembered=len(remembered),
+            translated=len(missing),
+            requests_saved=max(0, baseline - len(missing)),
+            # The prompt and a completion of about the same length
+            tokens_saved=sum(2 * estimate_tokens(len(unit.text)) for unit in passed_through + remembered),
+        )
+    logger.info("Translating %d of %d segments", len(missing), len(units))
+
+    streams: Dict[int, ChunkStream] = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing))), thread_name_prefix="translate")
+    try:
+        # Segments are started in order, so the next one to emit is never queued behind later ones
+        for index in missing:
+            streams[index] = ChunkStream()
+            executor.submit(streams[index].feed, partial(translate_segment, units[index][0].text))
+        for index, (segment, translation) in enumerate(units):
+            if translation is not None:
+                yield segment.render(translation)
+                continue
+            yield segment.before
+            parts = []
+            for chunk in _strip_stream(iter(streams.pop(index))):
+                parts.append(chunk)
+                yield chunk
+            if memory is not None:
+                memory.store(segment.text, "".join(parts), target, model, glossary)
+            yield segment.after
+    finally:
+        # Stops segments not started yet if the reader gives up early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _translate_piece(translate: Callable[[str], Iterator[str]], text: str) -> Iterator[str]:
+    """Translate the paragraphs of a piece of input, keeping its whitespace."""
+    for segment in split_segments(text):
+        yield segment.before
+        if segment.text:
+            yield from _strip_stream(translate(segment.text))
+        yield segment.after
+
+
+def translate_incrementally(
+    pieces: Iterable[str],
+    translate: Callable[[str], Iterator[str]],
+    workers: int,
+    on_error: Callable[[str, BaseException], None],
+    on_piece: Optional[Callable[[str], None]] = None,
+) -> Iterator[str]:
+    """Translate input as it arrives, in order, a few pieces at a time.
+
+    Pieces are read by a separate thread, so translations are yielded
+    while the reader waits for more input. At most ``workers`` pieces are
+    translated or waiting to be yielded ahead of the one being yielded.
+
+    Args:
+        pieces: Input cut into pieces, e.g. by ``read_segments()``
+        translate: Streams the translation of one paragraph
+        workers: Number of pieces translated at the same time
+        on_error: Called with a piece whose translation failed and the
+            error; the piece is then yielded untranslated, unless part of
+            its translation already was
+        on_piece: Called with each piece once its translation has been
+            yielded and processed by the caller, if given
+
+    Yields:
+        str: The translated input, in order
+    """
+    ordered: "queue.Queue[Union[Tuple[str, ChunkStream], BaseException, object]]" = queue.Queue(maxsize=workers)
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="translate")
+
+    def read() -> None:
+        try:
+            for piece in pieces:
+                stream = ChunkStream()
+                executor.submit(stream.feed, partial(_translate_piece, translate, piece))
+                ordered.put((piece, stream))
+        except Exception as e:
+            ordered.put(e)
+        ordered.put(_DONE)
+
+    # A daemon thread does not keep an interrupted process waiting for input
+    threading.Thread(target=read, name="translate-reader", daemon=True).start()
+    try:
+        while True:
+            item = ordered.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            piece, stream = cast(Tuple[str, ChunkStream], item)
+            emitted = ""
+            try:
+                for chunk in stream:
+                    emitted += chunk
+                    yield chunk
+            except Exception as e:
+                on_error(piece, e)
+                # Only whitespace copied from the piece may have been yielded
+                if not emitted.strip():
+                    yield piece[len(emitted) :]
+            if on_piece is not None:
+                on_piece(piece)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
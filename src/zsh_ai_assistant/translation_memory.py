@@ -0,0 +1,249 @@
+"""Persistent memory of translated segments.
+
+Translations are stored in SQLite, ``translations.db`` in the state
+directory, keyed by the hash of the source segment, the target language,
+the model and the digest of the glossary they were made with. A segment seen before is found by an exact lookup. A
+segment that changed only slightly, e.g. in whitespace or punctuation, is
+found by a fuzzy lookup: each stored segment has a MinHash signature over
+its character trigrams, indexed in bands (locality-sensitive hashing), so
+candidates are found without scanning the table. The Jaccard similarity of
+each candidate is then computed exactly and the best one at or above the
+threshold is used. Segments whose numbers differ never match fuzzily.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "translations.db"
+SCHEMA_VERSION = 2
+
+# Milliseconds a writer waits for another one before giving up
+BUSY_TIMEOUT_MS = 5000
+
+# Characters per shingle; trigrams work for scripts without spaces too
+SHINGLE_SIZE = 3
+# A signature of BANDS * ROWS minimum hashes; a segment is a candidate if
+# all rows of any band are equal, which is nearly certain above a
+# similarity of 0.8 and unlikely below 0.3
+BANDS = 8
+ROWS = 4
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(0x5EED)
+# Fixed permutations, so signatures are comparable between processes
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+_BAND = struct.Struct(f">{ROWS}Q")
+
+_NUMBER = re.compile(r"\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+_SEGMENTS = """CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    target TEXT NOT NULL,
+    model TEXT NOT NULL,
+    glossary TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (source_hash, target, model, glossary)
+)"""
+
+_SCHEMA = (
+    _SEGMENTS.format(name="segments"),
+    """CREATE TABLE IF NOT EXISTS bands (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+        PRIMARY KEY (band, bucket, segment_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS bands_by_segment ON bands(segment_id)",
+)
+
+# Version 1 keyed segments without the glossary; its translations are kept
+# as made without one. The table is rebuilt to change its unique key, with
+# the same ids so the bands still point at their segments.
+_MIGRATION_FROM_1 = (
+    _SEGMENTS.format(name="segments_v2"),
+    """INSERT INTO segments_v2 (id, source_hash, target, model, source, translation, updated)
+    SELECT id, source_hash, target, model, source, translation, updated FROM segments""",
+    "DROP TABLE segments",
+    "ALTER TABLE segments_v2 RENAME TO segments",
+)
+
+
+def database_path(directory: str) -> str:
+    """Return the path of the translation memory in ``directory``."""
+    return os.path.join(directory, DATABASE_NAME)
+
+
+def source_hash(source: str) -> str:
+    """Return the key of a source segment."""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str) -> Set[str]:
+    """Return the character trigrams of text, ignoring case and whitespace runs."""
+    normalized = _WHITESPACE.sub(" ", text.casefold().strip())
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i : i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Return the Jaccard similarity of two sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def band_buckets(grams: Iterable[str]) -> List[int]:
+    """Return the bucket of each band of the MinHash signature of ``grams``."""
+    hashes = [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams]
+    signature = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    buckets = []
+    for band in range(BANDS):
+        rows = _BAND.pack(*signature[band * ROWS : (band + 1) * ROWS])
+        # Seven bytes fit SQLite's signed 64-bit integers
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=7).digest(), "big"))
+    return buckets
+
+
+class TranslationMemory:
+    """Translated segments with exact and fuzzy lookup."""
+
+    def __init__(self, directory: str, fuzzy_threshold: float = 0.95) -> None:
+        """Open the translation memory, creating it if needed.
+
+        Args:
+            directory: Directory of the database
+            fuzzy_threshold: Minimum similarity between 0 and 1 of a fuzzy
+                match; 0 disables fuzzy matching
+        """
+        self.fuzzy_threshold = fuzzy_threshold
+        # The connection is shared by the threads translating into several languages
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(
+            database_path(directory), timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            # Foreign keys are still off, so dropping the old segments table keeps the bands
+            with self._transaction():
+                # Read again inside the transaction, in case another process migrated meanwhile
+                version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+                if version == 1:
+                    for statement in _MIGRATION_FROM_1:
+                        self.connection.execute(statement)
+                for statement in _SCHEMA:
+                    self.connection.execute(statement)
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        # WAL only needs a full sync at checkpoints
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run the block in a write transaction, rolled back if it raises."""
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def lookup(self, source: str, target: str, model: str, glossary: str = "") -> Optional[str]:
+        """Return the stored translation of a segment, or of a similar one.
+
+        Args:
+            source: Source segment
+            target: Target language
+            model: Model the translation was made with
+            glossary: Digest of the glossary it was made with, "" for none
+
+        Returns:
+            The translation, or None if no stored segment matches
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT translation FROM segments WHERE source_hash = ? AND target = ? AND model = ? AND glossary = ?",
+                (source_hash(source), target, model, glossary),
+            ).fetchone()
+            if row is not None:
+                return str(row[0])
+            if self.fuzzy_threshold <= 0:
+                return None
+            return self._fuzzy_lookup(source, target, model, glossary)
+
+    def _fuzzy_lookup(self, source: str, target: str, model: str, glossary: str) -> Optional[str]:
+        """Return the translation of the most similar stored segment above the threshold."""
+        grams = shingles(source)
+        buckets = band_buckets(grams)
+        bands = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+        parameters: List[object] = [value for pair in enumerate(buckets) for value in pair]
+        rows = self.connection.execute(
+            f"""SELECT source, translation FROM segments WHERE target = ? AND model = ? AND glossary = ? AND id IN (
+                SELECT segment_id FROM bands WHERE {bands}
+            )""",
+            [target, model, glossary, *parameters],
+        ).fetchall()
+        numbers = _NUMBER.findall(source)
+        best, best_similarity = None, self.fuzzy_threshold
+        for candidate, translation in rows:
+            # A changed number changes the meaning, however similar the rest is
+            if _NUMBER.findall(candidate) != numbers:
+                continue
+            similarity = jaccard(grams, shingles(candidate))
+            if similarity >= best_similarity:
+                best, best_similarity = str(translation), similarity
+        if best is not None:
+            logger.debug("Fuzzy translation memory match with similarity %.2f", best_similarity)
+        return best
+
+    def store(self, source: str, translation: str, target: str, model: str, glossary: str = "") -> None:
+        """Store the translation of a segment, replacing any previous one.
+
+        Args:
+            source: Source segment
+            translation: Its translation
+            target: Target language
+            model: Model the translation was made with
+            glossary: Digest of the glossary it was made with, "" for none
+        """
+        key = (source_hash(source), target, model, glossary)
+        with self._transaction():
+            self.connection.execute(
+                """INSERT INTO segments (source_hash, target, model, glossary, source, translation, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source_hash, target, model, glossary) DO UPDATE SET
+                    translation = excluded.translation, updated = excluded.updated""",
+                (*key, source, translation, time.time()),
+            )
+            segment_id = self.connection.execute(
+                "SELECT id FROM segments WHERE source_hash = ? AND target = ? AND model = ? AND glossary = ?", key
+            ).fetchone()[0]
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO bands (band, bucket, segment_id) VALUES (?, ?, ?)",
+                [(band, bucket, segment_id) for band, bucket in enumerate(band_buckets(shingles(source)))],
+            )
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self.connection.close()
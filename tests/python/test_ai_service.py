@@ -1,10 +1,25 @@
 """Test cases for LangChainAIService."""
 
+import logging
 import os
+import subprocess
+import sys
+import threading
+import time
 import pytest
+from typing import List
 from unittest.mock import Mock, patch
 from zsh_ai_assistant.config import AIConfig
-from zsh_ai_assistant.ai_service import LangChainAIService
+from zsh_ai_assistant.messages import HumanMessage, to_message
+from zsh_ai_assistant.ratelimit import HEADER, SLOT, RateLimiter
+from zsh_ai_assistant.ai_service import (
+    DEFAULT_CHAT_SYSTEM_MESSAGE,
+    BackendCapabilities,
+    ChatBackend,
+    LangChainAIService,
+    TotalTimeoutError,
+    first_command_line,
+)
 
 
 class TestLangChainAIService:
@@ -156,6 +171,40 @@ class TestLangChainAIService:
 
         assert result == "mock_response"
 
+    def test_chat_adds_default_system_message(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that histories without a system message get the shared default one."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        service = LangChainAIService(AIConfig())
+
+        service.chat([{"role": "user", "content": "Hello!"}])
+
+        sent = mock_langchain_client.invoke.call_args[0][0]
+        assert sent[0] is DEFAULT_CHAT_SYSTEM_MESSAGE
+        assert sent[1] == {"role": "user", "content": "Hello!"}
+
+    def test_chat_converts_only_new_messages(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that each turn converts only the messages appended since the previous one."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        service = LangChainAIService(AIConfig())
+        history = [{"role": "user", "content": "Hello!"}]
+        service.chat(history)
+        first = mock_langchain_client.invoke.call_args[0][0]
+
+        history += [{"role": "assistant", "content": "Hi"}, {"role": "user", "content": "Bye"}]
+        with patch("zsh_ai_assistant.ai_service.to_message", wraps=to_message) as convert:
+            service.chat(history)
+
+        sent = mock_langchain_client.invoke.call_args[0][0]
+        assert convert.call_count == 2
+        assert sent[1] is first[1]
+        assert sent[2:] == history[1:]
+
     def test_service_initialization_with_valid_config(self, reset_env) -> None:  # type: ignore[no-untyped-def]
         """Test that service initializes correctly with valid config."""
         os.environ["OPENAI_API_KEY"] = "test-api-key"
@@ -219,7 +268,7 @@ class TestLangChainAIService:
         # Mock the invoke method to capture the messages
         captured_messages = []
 
-        def capture_invoke(messages: list) -> Mock:
+        def capture_invoke(messages: list, **kwargs: object) -> Mock:
             captured_messages.extend(messages)
             mock_response = Mock()
             mock_response.content = "mock_command"
@@ -533,3 +582,902 @@ class TestLangChainAIService:
         # Test fallback for unknown content
         result = service.chat([{"role": "user", "content": "unknown query"}])
         assert "I received your message: unknown query" in result
+
+
+class TestPromptCacheAffinity:
+    """Test cases for llama.cpp prompt cache slot affinity."""
+
+    def test_default_profile_sends_no_extra_body(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that the default profile calls the client without extra options."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+
+        service = LangChainAIService(AIConfig())
+        service.chat([{"role": "user", "content": "Hello"}])
+
+        args, kwargs = mock_langchain_client.invoke.call_args
+        assert kwargs == {}
+
+    def test_llamacpp_profile_sends_cache_prompt(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that the llamacpp profile enables cache_prompt with a server-chosen slot."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_BACKEND_PROFILE"] = "llamacpp"
+
+        service = LangChainAIService(AIConfig())
+        service.chat([{"role": "user", "content": "Hello"}])
+
+        _, kwargs = mock_langchain_client.invoke.call_args
+        assert kwargs["extra_body"] == {"cache_prompt": True, "id_slot": -1}
+
+    def test_session_sticks_to_one_slot(self, reset_env, mock_langchain_client) -> None:  # type: ignore[no-untyped-def]
+        """Test that every turn of a session is sent to the same slot."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_BACKEND_PROFILE"] = "llamacpp"
+        os.environ["AI_LLAMACPP_SLOTS"] = "4"
+
+        service = LangChainAIService(AIConfig(), session_id="session-a")
+        slots = set()
+        for turn in ("Hello", "world", "again"):
+            service.chat([{"role": "user", "content": turn}])
+            slots.add(mock_langchain_client.invoke.call_args[1]["extra_body"]["id_slot"])
+
+        assert len(slots) == 1
+        assert slots.pop() in range(4)
+
+    def test_pinned_slot_overrides_hashing(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that AI_LLAMACPP_SLOT pins requests to one slot."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_BACKEND_PROFILE"] = "llamacpp"
+        os.environ["AI_LLAMACPP_SLOTS"] = "4"
+        os.environ["AI_LLAMACPP_SLOT"] = "7"
+
+        service = LangChainAIService(AIConfig(), session_id="session-a")
+        service.generate_command("list files")
+
+        assert mock_langchain_client.invoke.call_args[1]["extra_body"]["id_slot"] == 7
+
+
+class TestModeProfiles:
+    """Test cases for per-mode generation profiles."""
+
+    def test_command_mode_uses_smaller_token_budget(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that command generation passes its own max_tokens and stop sequences."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_COMMAND_TEMPERATURE"] = "0.1"
+        os.environ["AI_COMMAND_STOP"] = "\\n\\n"
+
+        service = LangChainAIService(AIConfig())
+        service.generate_command("list files")
+
+        _, kwargs = mock_langchain_client.invoke.call_args
+        assert kwargs == {"max_tokens": 256, "temperature": 0.1, "stop": ["\n\n"]}
+
+    def test_translate_mode_overrides(self, reset_env, mock_langchain_client) -> None:  # type: ignore[no-untyped-def]
+        """Test that translate mode only passes the settings it overrides."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_TRANSLATE_MAX_TOKENS"] = "4000"
+
+        service = LangChainAIService(AIConfig())
+        service.translate("Hello", "japanese")
+
+        _, kwargs = mock_langchain_client.invoke.call_args
+        assert kwargs == {"max_tokens": 4000}
+
+
+class TestChatBackend:
+    """Test cases for backend capability detection."""
+
+    def test_importing_service_does_not_import_langchain(self) -> None:
+        """Test that LangChain is only imported once a ChatOpenAI client is created."""
+        code = (
+            "import sys, zsh_ai_assistant.ai_service, zsh_ai_assistant.cli; "
+            "print(any(name.startswith(('langchain', 'openai', 'httpx')) for name in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == "False"
+
+    def test_langchain_backend_converts_messages(self) -> None:
+        """Test that LangChain chat models receive LangChain messages."""
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        from zsh_ai_assistant.messages import HumanMessage
+
+        backend = ChatBackend.for_client(FakeListChatModel(responses=["Hello there"]))
+
+        assert backend.invoke([HumanMessage(content="Hi")], {}).content == "Hello there"
+        assert "".join(backend.stream([HumanMessage(content="Hi")], {})) == "Hello there"
+
+    def test_langchain_chat_model_streams(self) -> None:
+        """Test that a real ChatOpenAI client is detected as a streaming backend."""
+        from langchain_openai import ChatOpenAI
+
+        client = ChatOpenAI(api_key="test-api-key", base_url="https://api.example.com", model="gpt-4")  # type: ignore
+        backend = ChatBackend.for_client(client, prompt_caching=True)
+
+        assert backend.capabilities.streaming
+        assert backend.capabilities.batch
+        assert backend.capabilities.prompt_caching
+
+    def test_declared_capabilities_win(self) -> None:
+        """Test that a client declaring its capabilities is taken at its word."""
+        client = Mock(capabilities=BackendCapabilities(streaming=True))
+
+        backend = ChatBackend.for_client(client)
+
+        assert backend.capabilities is client.capabilities
+
+    def test_unknown_client_is_invoke_only(self) -> None:
+        """Test that clients without declared capabilities are only invoked."""
+        backend = ChatBackend.for_client(Mock())
+
+        assert not backend.capabilities.streaming
+        assert repr(backend.capabilities) == "BackendCapabilities(invoke only)"
+
+    def test_stream_yields_text_and_skips_empty_chunks(self) -> None:
+        """Test that backends stream plain text."""
+        client = Mock()
+        client.stream.return_value = iter([Mock(content="Hello"), Mock(content=""), Mock(content=" world")])
+        backend = ChatBackend(client, BackendCapabilities(streaming=True))
+
+        assert list(backend.stream(["message"], {})) == ["Hello", " world"]
+        client.stream.assert_called_once_with(["message"])
+
+    def test_backend_is_detected_once_per_client(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that capabilities are cached until the client is replaced."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        service = LangChainAIService(AIConfig(), test_mode=True)
+
+        with patch.object(ChatBackend, "for_client", wraps=ChatBackend.for_client) as for_client:
+            service.translate("Hello", "japanese")
+            service.translate("Hello", "japanese")
+            assert for_client.call_count == 1
+
+            service.client = Mock(capabilities=BackendCapabilities(streaming=True))
+            assert service._supports_streaming("translate")
+            assert for_client.call_count == 2
+
+
+class TestCommandStreaming:
+    """Test cases for early termination of streamed command generation."""
+
+    def test_first_command_line_waits_for_newline(self) -> None:
+        """Test that an unterminated line is not considered complete."""
+        assert first_command_line("ls -la") is None
+        assert first_command_line("ls -la\n") == "ls -la"
+
+    def test_first_command_line_skips_fences(self) -> None:
+        """Test that markdown fences and blank lines are skipped."""
+        assert first_command_line("\n```bash\ngit status\n") == "git status"
+
+    def test_first_command_line_handles_continuations(self) -> None:
+        """Test that continued lines and open quotes wait for more input."""
+        assert first_command_line("find . \\\n") is None
+        assert first_command_line("find . \\\n  -name '*.py'\n") == "find . \\\n  -name '*.py'"
+        assert first_command_line("echo 'a\n") is None
+        assert first_command_line("echo 'a\nb'\n") == "echo 'a\nb'"
+
+    def test_first_command_line_waits_for_compound_commands(self) -> None:
+        """Test that loops, conditionals, groups and subshells are read up to their end."""
+        loop = "for f in *.txt; do\n  echo $f\ndone\n"
+        assert first_command_line(loop[: loop.index("  echo")]) is None
+        assert first_command_line(loop[: loop.index("done")]) is None
+        assert first_command_line(loop + "This prints") == loop.strip()
+        assert first_command_line("if [ -f x ]; then\n  cat x\nfi\n") == "if [ -f x ]; then\n  cat x\nfi"
+        assert first_command_line("case $1 in\n  a) echo a;;\nesac\n") == "case $1 in\n  a) echo a;;\nesac"
+        assert first_command_line("{\n  date\n} > log\n") == "{\n  date\n} > log"
+        assert first_command_line("(\n  cd /tmp && ls\n)\n") == "(\n  cd /tmp && ls\n)"
+        assert first_command_line("ls |\n") is None
+        assert first_command_line("echo done\n") == "echo done"
+
+    def test_first_command_line_waits_for_function_bodies(self) -> None:
+        """Test that a function definition is only complete once its body is closed."""
+        assert first_command_line("foo() {\n  bar\n") is None
+        assert first_command_line("foo() {\n  bar\n}\n") == "foo() {\n  bar\n}"
+        assert first_command_line("function f {\n  echo\n") is None
+        assert first_command_line("function f {\n  echo\n}\n") == "function f {\n  echo\n}"
+        assert first_command_line("function f() (\n  cd /tmp\n)\n") == "function f() (\n  cd /tmp\n)"
+        assert first_command_line("f() { echo; }\n") == "f() { echo; }"
+
+    def test_first_command_line_ignores_escaped_substitutions(self) -> None:
+        """Test that an escaped "$(" opens nothing to wait for."""
+        assert first_command_line("echo \\$(\n") == "echo \\$("
+
+    def test_first_command_line_handles_here_documents(self) -> None:
+        """Test that only real here-documents wait for their delimiter."""
+        assert first_command_line("cat <<EOF\nhello\n") is None
+        assert first_command_line("cat <<-'EOF' > f\n\thello\n\tEOF\n") == "cat <<-'EOF' > f\n\thello\n\tEOF"
+        assert first_command_line('grep x <<< "$text"\n') == 'grep x <<< "$text"'
+        assert first_command_line("echo $((1<<2))\n") == "echo $((1<<2))"
+
+    def test_unfinished_command_falls_back_without_fences(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that a stream ending before a complete command returns it without code fences."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        def fake_stream(messages: list, **kwargs: object):  # type: ignore[no-untyped-def]
+            yield from (Mock(content=token) for token in ["```bash\n", "cat <<EOF\n", "hi\n", "```"])
+
+        service = LangChainAIService(AIConfig(), test_mode=True)
+        service.client = Mock(stream=fake_stream, capabilities=BackendCapabilities(streaming=True))
+
+        assert service.generate_command("say hi") == "cat <<EOF\nhi"
+
+    def test_stream_is_closed_after_first_command(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that the stream is abandoned once the first command line is complete."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+
+        consumed = []
+
+        def fake_stream(messages: list, **kwargs: object):  # type: ignore[no-untyped-def]
+            try:
+                for token in ["ls", " -la", "\n", "This lists", " all files"]:
+                    consumed.append(token)
+                    yield Mock(content=token)
+            finally:
+                consumed.append("closed")
+
+        fake_client = Mock(stream=fake_stream, capabilities=BackendCapabilities(streaming=True))
+
+        service = LangChainAIService(AIConfig(), test_mode=True)
+        service.client = fake_client
+
+        assert service.generate_command("list all files") == "ls -la"
+        assert consumed == ["ls", " -la", "\n", "closed"]
+        fake_client.invoke.assert_not_called()
+
+
+class TestModelRouting:
+    """Test cases for per-mode model and endpoint routing."""
+
+    def test_command_mode_routes_to_its_own_model(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that a command model gets its own lazily created client."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_MODEL"] = "large-model"
+        os.environ["AI_COMMAND_MODEL"] = "small-model"
+        os.environ["AI_COMMAND_BASE_URL"] = "http://localhost:8081/v1"
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            default_client, command_client = Mock(), Mock()
+            mock_class.side_effect = [default_client, command_client]
+
+            service = LangChainAIService(AIConfig())
+            assert mock_class.call_count == 1
+
+            service.generate_command("list files")
+            service.generate_command("list files again")
+            service.chat([{"role": "user", "content": "Hello"}])
+
+            assert mock_class.call_count == 2
+            assert mock_class.call_args.kwargs["model"] == "small-model"
+            assert mock_class.call_args.kwargs["base_url"] == "http://localhost:8081/v1"
+            assert command_client.invoke.call_count == 2
+            assert default_client.invoke.call_count == 1
+
+    def test_modes_sharing_a_model_share_a_client(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that one client is created per distinct model/endpoint pair."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_COMMAND_MODEL"] = "small-model"
+        os.environ["AI_TRANSLATE_MODEL"] = "small-model"
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            mock_class.side_effect = lambda **kwargs: Mock()
+
+            service = LangChainAIService(AIConfig())
+            service.generate_command("list files")
+            service.translate("Hello", "japanese")
+
+            assert mock_class.call_count == 2
+
+    def test_mode_with_its_own_api_key_gets_its_own_client(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that a mode keeping the default model and endpoint but not the API key is not sent the default one."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_COMMAND_API_KEY"] = "command-api-key"
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            default_client, command_client = Mock(), Mock()
+            mock_class.side_effect = [default_client, command_client]
+
+            LangChainAIService(AIConfig()).generate_command("list files")
+
+            assert mock_class.call_args.kwargs["api_key"] == "command-api-key"
+            assert command_client.invoke.call_count == 1
+            default_client.invoke.assert_not_called()
+
+
+class TestLatencyFallback:
+    """Test cases for latency-driven fallback routing."""
+
+    def _configure(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_MODEL"] = "big-model"
+        os.environ["AI_STATE_DIR"] = str(tmp_path)
+        os.environ["AI_COMMAND_FALLBACK_MODEL"] = "small-model"
+        os.environ["AI_COMMAND_TTFT_SLO_MS"] = "800"
+
+    def test_latency_not_tracked_without_fallback(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that no state is kept when no fallback is configured."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+
+        service = LangChainAIService(AIConfig())
+
+        assert service.latency is None
+
+    def test_slow_primary_routes_to_fallback(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a primary model over its SLO is replaced by the fallback model."""
+        self._configure(tmp_path)
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            clients = {"big-model": Mock(), "small-model": Mock()}
+            mock_class.side_effect = lambda **kwargs: clients[kwargs["model"]]
+
+            service = LangChainAIService(AIConfig())
+            assert service.latency is not None
+            service.latency.record("big-model@https://api.example.com", 2000.0)
+
+            service.generate_command("list files")
+
+            clients["small-model"].invoke.assert_called_once()
+            clients["big-model"].invoke.assert_not_called()
+            assert service.latency.ewma("small-model@https://api.example.com") is not None
+
+    def test_fast_primary_is_kept(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the primary model is used while it meets its SLO."""
+        self._configure(tmp_path)
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            clients = {"big-model": Mock(), "small-model": Mock()}
+            mock_class.side_effect = lambda **kwargs: clients[kwargs["model"]]
+
+            service = LangChainAIService(AIConfig())
+            service.generate_command("list files")
+
+            clients["big-model"].invoke.assert_called_once()
+            assert mock_class.call_count == 1
+
+    def test_shared_and_remembered_requests_use_the_routed_model(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path
+    ) -> None:
+        """Test that a call is routed once, and keyed and remembered under the model it went to."""
+        self._configure(tmp_path)
+        monkeypatch.setenv("AI_TRANSLATE_FALLBACK_MODEL", "small-model")
+        monkeypatch.setenv("AI_TRANSLATE_TTFT_SLO_MS", "800")
+        monkeypatch.setenv("AI_SINGLE_FLIGHT", "1")
+        monkeypatch.setenv("AI_TRANSLATION_MEMORY", "1")
+        monkeypatch.setenv("AI_COMMAND_CONTEXT", "false")
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            clients = {model: Mock(spec=["invoke"]) for model in ("big-model", "small-model")}
+            clients["small-model"].invoke.return_value = Mock(content="mock_response")
+            mock_class.side_effect = lambda **kwargs: clients[kwargs["model"]]
+            service = LangChainAIService(AIConfig())
+            assert service.single_flight is not None and service.translation_memory is not None
+            service.latency.record("big-model@https://api.example.com", 2000.0)  # type: ignore[union-attr]
+
+            with patch.object(service, "_route", wraps=service._route) as route, patch.object(
+                service.single_flight, "stream", wraps=service.single_flight.stream
+            ) as stream:
+                service.generate_command("list files")
+                service.translate("Hello.", "japanese")
+
+            assert route.call_count == 2
+            assert [call.args[0] for call in stream.call_args_list] == [
+                service._flight_key("command", ("small-model", "https://api.example.com", None), "list files", ""),
+                service._flight_key(
+                    "translate", ("small-model", "https://api.example.com", None), "Hello.", "japanese", ""
+                ),
+            ]
+            assert service.translation_memory.lookup("Hello.", "japanese", "small-model") is not None
+            assert service.translation_memory.lookup("Hello.", "japanese", "big-model") is None
+            clients["big-model"].invoke.assert_not_called()
+
+
+class TestSingleFlightIntegration:
+    """Test cases for sharing identical in-flight requests."""
+
+    def test_requests_go_through_single_flight(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that commands and translations are keyed by mode, parameters and prompt."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_SINGLE_FLIGHT", "1")
+        service = LangChainAIService(AIConfig())
+        assert service.single_flight is not None
+
+        with patch.object(service.single_flight, "stream", wraps=service.single_flight.stream) as stream:
+            assert service.generate_command("list  files ") == "mock_response"
+            service.generate_command("list files")
+            assert service.translate("Hello", "japanese") == "mock_response"
+
+        keys = [call.args[0] for call in stream.call_args_list]
+        assert keys[0] == keys[1] != keys[2]
+        assert os.listdir(tmp_path / "inflight") == []
+
+    def test_translations_with_different_glossaries_are_not_shared(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that the glossary is part of the key of a shared translation."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_SINGLE_FLIGHT", "1")
+        keys: List[str] = []
+        for content in ("", "worktree\tワークツリー\n", "worktree\t作業ツリー\n", "worktree\t作業ツリー\n"):
+            if content:
+                glossary = tmp_path / f"glossary-{len(keys)}.tsv"
+                glossary.write_text(content, encoding="utf-8")
+                monkeypatch.setenv("AI_GLOSSARY", str(glossary))
+            service = LangChainAIService(AIConfig())
+            assert service.single_flight is not None
+            with patch.object(service.single_flight, "stream", wraps=service.single_flight.stream) as stream:
+                service.translate("Remove the worktree", "japanese")
+            keys.append(stream.call_args.args[0])
+
+        assert len(set(keys[:3])) == 3
+        assert keys[2] == keys[3]
+
+    def test_single_flight_is_off_by_default(  # type: ignore[no-untyped-def]
+        self, reset_env, mock_langchain_client
+    ) -> None:
+        """Test that requests are not shared unless enabled."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        assert LangChainAIService(AIConfig()).single_flight is None
+
+
+class TestTranslationMemoryIntegration:
+    """Test cases for translations through the translation memory."""
+
+    def test_remembered_paragraphs_are_not_sent_again(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that retranslating a revised text only sends the changed paragraph."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_TRANSLATION_MEMORY", "1")
+        service = LangChainAIService(AIConfig())
+        assert service.translation_memory is not None
+
+        assert service.translate("Hello.\n\nBye.", "japanese") == "mock_response\n\nmock_response"
+        assert mock_langchain_client.invoke.call_count == 2
+
+        assert "".join(service.translate_stream("Hello.\n\nSee you.", "japanese")) == "mock_response\n\nmock_response"
+        assert mock_langchain_client.invoke.call_count == 3
+        assert "See you." in mock_langchain_client.invoke.call_args.args[0][1].content
+
+
+class TestLanguageDetectionIntegration:
+    """Test cases for skipping text already in the target language."""
+
+    def test_text_in_the_target_language_is_not_sent(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, mock_langchain_client
+    ) -> None:
+        """Test that a translation into the language of the text makes no request."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        service = LangChainAIService(AIConfig())
+
+        assert "".join(service.translate_stream("これは日本語です。", "japanese")) == "これは日本語です。"
+        assert mock_langchain_client.invoke.call_count == 0
+        assert (service.translation_stats.passed_through, service.translation_stats.requests_saved) == (1, 1)
+
+        monkeypatch.setenv("AI_LANGUAGE_DETECTION", "false")
+        LangChainAIService(AIConfig()).translate("これは日本語です。", "japanese")
+        assert mock_langchain_client.invoke.call_count == 1
+
+    def test_streamed_translation_logs_the_counts(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, caplog, mock_langchain_client
+    ) -> None:
+        """Test that the saved requests and tokens are logged once a streamed translation is read."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        service = LangChainAIService(AIConfig())
+
+        with caplog.at_level(logging.INFO, logger="zsh_ai_assistant.ai_service"):
+            stream = service.translate_stream("これは日本語です。\n\nThis is English.", "japanese")
+            next(stream)
+            assert not any(record.message.startswith("Translation: ") for record in caplog.records)
+            list(stream)
+
+        assert f"Translation: {service.translation_stats}" in caplog.messages
+        assert (service.translation_stats.segments, service.translation_stats.passed_through) == (2, 1)
+
+
+class TestGlossaryIntegration:
+    """Test cases for glossary entries in translation prompts."""
+
+    def test_terms_in_the_text_are_added_to_the_prompt(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that only the entries of terms occurring in the text are sent."""
+        glossary = tmp_path / "glossary.tsv"
+        glossary.write_text("worktree\tワークツリー\nrebase\tリベース\n", encoding="utf-8")
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path / "state"))
+        monkeypatch.setenv("AI_GLOSSARY", str(glossary))
+        service = LangChainAIService(AIConfig())
+
+        service.translate("Remove the worktree", "japanese")
+
+        prompt = mock_langchain_client.invoke.call_args.args[0][1].content
+        assert prompt == (
+            "Translate these terms as follows:\n- worktree: ワークツリー\n\n"
+            "Translate the following text to japanese:\nRemove the worktree"
+        )
+
+    def test_remembered_translations_are_kept_per_glossary(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that a translation remembered under one glossary is not reused under another."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path / "state"))
+        monkeypatch.setenv("AI_TRANSLATION_MEMORY", "1")
+        for index, translation in enumerate(("ワークツリー", "作業ツリー", "ワークツリー")):
+            glossary = tmp_path / f"glossary-{index}.tsv"
+            glossary.write_text(f"worktree\t{translation}\n", encoding="utf-8")
+            monkeypatch.setenv("AI_GLOSSARY", str(glossary))
+            LangChainAIService(AIConfig()).translate("Remove the worktree.", "japanese")
+
+        # The third glossary has the same entries as the first, so its translation is reused
+        assert mock_langchain_client.invoke.call_count == 2
+
+
+class TestCommandContextIntegration:
+    """Test cases for the working directory summary in command requests."""
+
+    def test_directory_summary_is_added_to_the_system_message(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that the summary of the working directory is sent when it is turned on."""
+        (tmp_path / "work").mkdir()
+        (tmp_path / "work" / "package.json").write_text("{}")
+        monkeypatch.chdir(tmp_path / "work")
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path / "state"))
+        monkeypatch.setenv("AI_COMMAND_CONTEXT", "true")
+        monkeypatch.setenv("AI_COMMAND_CONTEXT_DEADLINE_MS", "5000")
+
+        LangChainAIService(AIConfig()).generate_command("install dependencies")
+
+        messages = mock_langchain_client.invoke.call_args.args[0]
+        assert messages[0].content.endswith(
+            f"The command runs in this environment:\nCurrent directory: {tmp_path / 'work'}\n"
+            "Project: Node.js\nEntries: package.json"
+        )
+        assert messages[1].content == "install dependencies"
+
+        monkeypatch.delenv("AI_COMMAND_CONTEXT")
+        LangChainAIService(AIConfig()).generate_command("install dependencies")
+
+        assert "Current directory" not in mock_langchain_client.invoke.call_args.args[0][0].content
+
+    def test_given_directory_is_summarized(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that the directory passed by the caller is summarized instead of the working directory."""
+        (tmp_path / "plugin").mkdir()
+        (tmp_path / "plugin" / "pyproject.toml").write_text("")
+        (tmp_path / "work").mkdir()
+        (tmp_path / "work" / "Cargo.toml").write_text("")
+        monkeypatch.chdir(tmp_path / "plugin")
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path / "state"))
+        monkeypatch.setenv("AI_COMMAND_CONTEXT", "true")
+        monkeypatch.setenv("AI_COMMAND_CONTEXT_DEADLINE_MS", "5000")
+
+        service = LangChainAIService(AIConfig())
+        service.working_directory = str(tmp_path / "work")
+        service.generate_command("build it")
+
+        content = mock_langchain_client.invoke.call_args.args[0][0].content
+        assert f"Current directory: {tmp_path / 'work'}\nProject: Rust\nEntries: Cargo.toml" in content
+        assert "pyproject.toml" not in content
+
+
+class TestRateLimitIntegration:
+    """Test cases for host-wide rate limits around requests."""
+
+    def test_requests_take_and_return_a_lease(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, mock_langchain_client
+    ) -> None:
+        """Test that each request is charged by mode and its lease is released."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_MAX_IN_FLIGHT", "2")
+        service = LangChainAIService(AIConfig())
+        limiter = service.rate_limiter
+        assert limiter is not None
+
+        with patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire, patch.object(
+            limiter, "release", wraps=limiter.release
+        ) as release:
+            service.generate_command("list files")
+            service.translate("Hello", "japanese")
+
+        assert [call.args[0] for call in acquire.call_args_list] == ["command", "translate"]
+        # Charged the prompt estimate plus the mode's completion budget
+        assert acquire.call_args_list[0].args[1] > service.config.profile("command").max_tokens
+        assert release.call_count == 2
+        assert (tmp_path / "ratelimit.bin").exists()
+
+    def test_failed_stream_releases_its_slot(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path
+    ) -> None:
+        """Test that a broken stream does not keep its in-flight slot."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_MAX_IN_FLIGHT", "1")
+        monkeypatch.setenv("AI_STREAM_RETRIES", "0")
+        service = LangChainAIService(AIConfig(), test_mode=True)
+        service.rate_limiter = RateLimiter(str(tmp_path / "ratelimit.bin"), max_in_flight=1)
+        client = Mock(capabilities=BackendCapabilities(streaming=True))
+        client.stream.side_effect = ConnectionError("reset")
+        service.client = client
+
+        with pytest.raises(ConnectionError):
+            list(service.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert SLOT.unpack_from((tmp_path / "ratelimit.bin").read_bytes(), HEADER.size) == (0,)
+
+
+class TestCircuitBreakerIntegration:
+    """Test cases for fast failure on unreachable backends."""
+
+    def test_unreachable_backend_fails_fast(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the client is no longer called once the circuit is open."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_STATE_DIR"] = str(tmp_path)
+        os.environ["AI_CIRCUIT_FAILURE_THRESHOLD"] = "2"
+
+        from zsh_ai_assistant.circuit_breaker import CircuitOpenError
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            client = Mock()
+            client.invoke.side_effect = ConnectionRefusedError("connection refused")
+            mock_class.return_value = client
+
+            service = LangChainAIService(AIConfig())
+            for _ in range(2):
+                with pytest.raises(ConnectionRefusedError):
+                    service.generate_command("list files")
+
+            # A new process sees the open circuit too
+            with pytest.raises(CircuitOpenError):
+                LangChainAIService(AIConfig()).generate_command("list files")
+            assert client.invoke.call_count == 2
+
+    def test_invoke_is_cut_off_at_the_total_timeout(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path
+    ) -> None:
+        """Test that a response slower than the total timeout fails at the deadline without opening the circuit."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_TIMEOUT", "0.1")
+        monkeypatch.setenv("AI_CIRCUIT_FAILURE_THRESHOLD", "1")
+        release = threading.Event()
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            client = Mock(spec=["invoke"])
+            client.invoke.side_effect = lambda *args, **kwargs: release.wait(5) and Mock(content="ls")
+            mock_class.return_value = client
+            service = LangChainAIService(AIConfig())
+
+            started = time.monotonic()
+            with pytest.raises(TimeoutError):
+                service._invoke([HumanMessage(content="list files")], "command")
+            release.set()
+
+            assert time.monotonic() - started < 2
+            # A slow backend is reachable: the next request is still sent
+            assert service._invoke([HumanMessage(content="list files")], "command").content == "ls"
+
+        assert service.breaker is not None
+        assert all(entry.get("failures", 0) == 0 for entry in service.breaker.state.read().values())
+
+    def test_abandoned_invoke_keeps_its_lease_until_it_ends(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path
+    ) -> None:
+        """Test that the rate-limit lease of a request cut off at the total timeout is returned when it ends."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("AI_STATE_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_TIMEOUT", "0.1")
+        monkeypatch.setenv("AI_MAX_IN_FLIGHT", "2")
+        release = threading.Event()
+        ended = threading.Event()
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            client = Mock(spec=["invoke"])
+            client.invoke.side_effect = lambda *args, **kwargs: release.wait(5) and Mock(content="ls")
+            mock_class.return_value = client
+            service = LangChainAIService(AIConfig())
+            original_release = service._release
+
+            def release_lease(*args):  # type: ignore[no-untyped-def]
+                original_release(*args)
+                ended.set()
+
+            with patch.object(service, "_release", side_effect=release_lease) as mock_release:
+                with pytest.raises(TotalTimeoutError):
+                    service._invoke([HumanMessage(content="list files")], "command")
+                mock_release.assert_not_called()
+
+                release.set()
+                assert ended.wait(5)
+                assert mock_release.call_args.args[2] is None
+
+    def test_other_errors_do_not_open_circuit(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that API errors other than connection failures are not counted."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_STATE_DIR"] = str(tmp_path)
+        os.environ["AI_CIRCUIT_FAILURE_THRESHOLD"] = "1"
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            client = Mock()
+            client.invoke.side_effect = [ValueError("bad request"), Mock(content="ls")]
+            mock_class.return_value = client
+
+            service = LangChainAIService(AIConfig())
+            with pytest.raises(ValueError):
+                service.generate_command("list files")
+
+            assert service.generate_command("list files") == "ls"
+
+    def test_timeouts_are_passed_to_client(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that configured timeouts give a mode its own client."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_COMMAND_CONNECT_TIMEOUT"] = "0.5"
+        os.environ["AI_COMMAND_TIMEOUT"] = "10"
+        os.environ["AI_MAX_RETRIES"] = "0"
+
+        with patch("zsh_ai_assistant.ai_service.ChatOpenAI") as mock_class:
+            mock_class.side_effect = lambda **kwargs: Mock()
+
+            service = LangChainAIService(AIConfig())
+            assert "timeout" not in mock_class.call_args.kwargs
+            service.generate_command("list files")
+
+            kwargs = mock_class.call_args.kwargs
+            assert kwargs["max_retries"] == 0
+            assert kwargs["timeout"].connect == 0.5
+            assert kwargs["timeout"].read == 10
+
+
+class TestStreamResume:
+    """Test cases for resuming interrupted streams."""
+
+    def _service(self, stream_side_effect) -> LangChainAIService:  # type: ignore[no-untyped-def]
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        calls = []
+
+        def fake_stream(messages: list, **kwargs: object):  # type: ignore[no-untyped-def]
+            calls.append(messages)
+            yield from stream_side_effect(len(calls))
+
+        fake_client = Mock(stream=fake_stream, capabilities=BackendCapabilities(streaming=True))
+        service = LangChainAIService(AIConfig(), test_mode=True)
+        service.client = fake_client
+        service.calls = calls  # type: ignore[attr-defined]
+        return service
+
+    def test_resume_yields_only_remaining_tokens(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that a broken stream is continued instead of restarted."""
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            if call == 1:
+                yield Mock(content="Hello ")
+                raise ConnectionResetError("connection reset")
+            yield Mock(content="world")
+
+        service = self._service(tokens)
+        with patch("zsh_ai_assistant.ai_service.time.sleep") as mock_sleep:
+            result = list(service.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert result == ["Hello ", "world"]
+        mock_sleep.assert_called_once()
+        continuation = service.calls[1]  # type: ignore[attr-defined]
+        assert continuation[-2].content == "Hello "
+        assert continuation[-1].content.startswith("Your previous answer was cut off")
+        service.client.invoke.assert_not_called()  # type: ignore[union-attr]
+
+    def test_repeated_prefix_is_dropped(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that a continuation starting over does not duplicate output."""
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            if call == 1:
+                yield Mock(content="Hello ")
+                raise ConnectionResetError("connection reset")
+            yield Mock(content="Hel")
+            yield Mock(content="lo wor")
+            yield Mock(content="ld")
+
+        service = self._service(tokens)
+        with patch("zsh_ai_assistant.ai_service.time.sleep"):
+            result = "".join(service.translate_stream("Hello world", "japanese"))
+
+        assert result == "Hello world"
+
+    def test_prefix_strategy_sends_partial_as_assistant_prefix(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that the prefix strategy ends the continuation with the partial answer."""
+        os.environ["AI_RESUME_STRATEGY"] = "prefix"
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            if call == 1:
+                yield Mock(content="Hello ")
+                raise ConnectionResetError("connection reset")
+            yield Mock(content="world")
+
+        service = self._service(tokens)
+        with patch("zsh_ai_assistant.ai_service.time.sleep"):
+            list(service.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert service.calls[1][-1].content == "Hello "  # type: ignore[attr-defined]
+
+    def test_retry_budget_is_bounded(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that the error is raised once the retry budget is exhausted."""
+        os.environ["AI_STREAM_RETRIES"] = "2"
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            yield Mock(content=f"part{call} ")
+            raise ConnectionResetError("connection reset")
+
+        service = self._service(tokens)
+        received = []
+        with patch("zsh_ai_assistant.ai_service.time.sleep") as mock_sleep:
+            with pytest.raises(ConnectionResetError):
+                for token in service.chat_stream([{"role": "user", "content": "Hi"}]):
+                    received.append(token)
+
+        assert received == ["part1 ", "part2 ", "part3 "]
+        assert mock_sleep.call_count == 2
+
+    def test_error_responses_are_not_resumed(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that errors other than transport failures are raised without another request."""
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            yield Mock(content="Hello ")
+            raise ValueError("Error code: 401 - invalid API key")
+
+        service = self._service(tokens)
+        with patch("zsh_ai_assistant.ai_service.time.sleep") as mock_sleep:
+            with pytest.raises(ValueError):
+                list(service.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert len(service.calls) == 1  # type: ignore[attr-defined]
+        mock_sleep.assert_not_called()
+
+    def test_total_timeout_is_not_resumed(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that a stream running past the total timeout does not start another request."""
+        monkeypatch.setenv("AI_TIMEOUT", "0.05")
+
+        def tokens(call: int):  # type: ignore[no-untyped-def]
+            while True:
+                time.sleep(0.02)
+                yield Mock(content="more ")
+
+        service = self._service(tokens)
+        with pytest.raises(TotalTimeoutError):
+            list(service.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert len(service.calls) == 1  # type: ignore[attr-defined]
@@ -0,0 +1,111 @@
+"""Test cases for bulk JSONL processing."""
+
+import json
+import threading
+import time
+from io import StringIO
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+
+from zsh_ai_assistant.batch import process_line, run_batch, run_request
+from zsh_ai_assistant.interfaces import AIServiceInterface
+
+
+@pytest.fixture
+def service() -> Mock:
+    """Create a service answering every mode."""
+    mock = Mock(spec=AIServiceInterface)
+    mock.generate_command.side_effect = lambda prompt: f"cmd {prompt}\n"
+    mock.translate.side_effect = lambda text, target: f"{target}:{text}"
+    mock.chat.return_value = "Hello!"
+    return mock
+
+
+def _records(output: StringIO) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+class TestRunRequest:
+    """Test cases for single requests."""
+
+    def test_modes(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that each mode calls the matching service method."""
+        assert run_request(service, {"mode": "command", "prompt": "ls"}) == "cmd ls"
+        assert run_request(service, {"mode": "translate", "text": "Hi", "target": "ja"}) == "ja:Hi"
+        assert run_request(service, {"mode": "chat", "messages": [{"role": "user", "content": "Hi"}]}) == "Hello!"
+
+    def test_malformed_requests(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that malformed requests become error records with their id."""
+        assert process_line(service, '{"id": "a", "mode": "translate", "text": "Hi"}', 1) == {
+            "id": "a",
+            "mode": "translate",
+            "error": "A translate request needs a 'text' and a 'target'",
+        }
+        assert process_line(service, "not json", 7)["id"] == 7
+        assert "Unknown mode" in process_line(service, '{"mode": "draw"}', 1)["error"]
+
+
+class TestRunBatch:
+    """Test cases for running a batch."""
+
+    def test_results_and_summary(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that every request produces a record and failures are counted."""
+        service.translate.side_effect = ZeroDivisionError("division by zero")
+        lines = [
+            '{"id": 1, "mode": "command", "prompt": "ls"}\n',
+            "\n",
+            '{"mode": "translate", "text": "boom", "target": "ja"}\n',
+        ]
+        output = StringIO()
+
+        summary = run_batch(service, lines, output, workers=2)
+
+        records = sorted(_records(output), key=lambda record: str(record["id"]))
+        assert records == [
+            {"id": 1, "mode": "command", "result": "cmd ls"},
+            {"id": 3, "mode": "translate", "error": "division by zero"},
+        ]
+        assert (summary.total, summary.failed) == (2, 1)
+        assert "2 requests (1 failed)" in str(summary)
+
+    def test_requests_run_concurrently(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that workers process requests at the same time."""
+        barrier = threading.Barrier(4, timeout=5)
+
+        def translate(text: str, target: str) -> str:
+            barrier.wait()
+            return text
+
+        service.translate.side_effect = translate
+        lines = [json.dumps({"mode": "translate", "text": str(i), "target": "ja"}) for i in range(4)]
+
+        summary = run_batch(service, lines, StringIO(), workers=4)
+
+        assert summary.failed == 0
+
+    def test_ordered_output(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that results are written in input order when requested."""
+
+        def translate(text: str, target: str) -> str:
+            # Earlier requests finish last
+            time.sleep(0.01 * (5 - int(text)))
+            return text
+
+        service.translate.side_effect = translate
+        lines = [json.dumps({"mode": "translate", "text": str(i), "target": "ja"}) for i in range(5)]
+        output = StringIO()
+
+        run_batch(service, lines, output, workers=5, ordered=True)
+
+        assert [record["result"] for record in _records(output)] == ["0", "1", "2", "3", "4"]
+
+    def test_progress_line(self, service) -> None:  # type: ignore[no-untyped-def]
+        """Test that progress is shown in place and erased at the end."""
+        progress = StringIO()
+
+        run_batch(service, ['{"mode": "command", "prompt": "ls"}'], StringIO(), progress=progress)
+
+        assert progress.getvalue().startswith("\r1 done, 0 failed")
+        assert progress.getvalue().endswith("\r\x1b[K")
@@ -30,16 +30,28 @@ class TestInMemoryChatHistory:
         assert messages[1]["role"] == "assistant"
         assert messages[1]["content"] == "Hello, user!"
 
-    def test_get_messages_returns_a_copy(self) -> None:
-        """Test that get_messages returns a copy, not the original list."""
+    def test_get_messages_returns_a_snapshot(self) -> None:
+        """Test that get_messages returns a read-only snapshot, not the original list."""
         chat_history = InMemoryChatHistory()
         chat_history.add_user_message("Hello")
 
         messages = chat_history.get_messages()
-        messages.append({"role": "user", "content": "modified"})
+        chat_history.add_ai_message("Hi")
 
-        assert len(chat_history) == 1
-        assert len(messages) == 2
+        assert not hasattr(messages, "append")
+        assert len(chat_history) == 2
+        assert messages == [{"role": "user", "content": "Hello"}]
+
+    def test_snapshot_survives_clear(self) -> None:
+        """Test that clearing the history does not change earlier snapshots."""
+        chat_history = InMemoryChatHistory()
+        chat_history.add_user_message("Hello")
+
+        messages = chat_history.get_messages()
+        chat_history.clear()
+        chat_history.add_user_message("Other")
+
+        assert list(messages) == [{"role": "user", "content": "Hello"}]
 
     def test_clear_chat_history(self) -> None:
         """Test clearing the chat history."""
@@ -0,0 +1,96 @@
+"""Test cases for the circuit breaker."""
+
+import errno
+import socket
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from zsh_ai_assistant.circuit_breaker import CircuitBreaker, CircuitOpenError, is_connection_error
+from zsh_ai_assistant.state import SharedStateFile
+
+
+class TestIsConnectionError:
+    """Test cases for connection error classification."""
+
+    def test_builtin_connection_errors(self) -> None:
+        """Test that socket level failures are connection errors."""
+        assert is_connection_error(ConnectionRefusedError()) is True
+        assert is_connection_error(TimeoutError()) is True
+        assert is_connection_error(ValueError("bad request")) is False
+
+    def test_name_resolution_and_network_errors(self) -> None:
+        """Test that DNS failures and unreachable networks are connection errors."""
+        assert is_connection_error(socket.gaierror(socket.EAI_NONAME, "Name or service not known")) is True
+        assert is_connection_error(OSError(errno.ENETUNREACH, "Network is unreachable")) is True
+
+    def test_wrapped_connection_errors(self) -> None:
+        """Test that errors raised from a connection failure are recognised."""
+        try:
+            try:
+                raise httpx.ConnectError("refused")
+            except httpx.ConnectError as e:
+                raise RuntimeError("request failed") from e
+        except RuntimeError as e:
+            assert is_connection_error(e) is True
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker class."""
+
+    def _breaker(  # type: ignore[no-untyped-def]
+        self, tmp_path, threshold: int = 2, cooldown: float = 30.0
+    ) -> CircuitBreaker:
+        return CircuitBreaker(SharedStateFile(str(tmp_path / "circuits.json")), threshold, cooldown)
+
+    def test_closed_circuit_allows_calls(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that calls pass while failures stay below the threshold."""
+        breaker = self._breaker(tmp_path)
+
+        breaker.record_failure("model@url")
+        breaker.before_call("model@url")
+
+    def test_circuit_opens_after_threshold(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that consecutive failures open the circuit for every process."""
+        breaker = self._breaker(tmp_path)
+        breaker.record_failure("model@url")
+        breaker.record_failure("model@url")
+
+        with pytest.raises(CircuitOpenError, match="unreachable"):
+            self._breaker(tmp_path).before_call("model@url")
+        # Other endpoints are unaffected
+        breaker.before_call("other@url")
+
+    def test_success_resets_failures(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a success in between keeps failures from adding up."""
+        breaker = self._breaker(tmp_path)
+        breaker.record_failure("model@url")
+        breaker.record_success("model@url")
+        breaker.record_failure("model@url")
+
+        breaker.before_call("model@url")
+
+    def test_half_open_allows_single_probe(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that one probe is let through after the cool-down."""
+        breaker = self._breaker(tmp_path, cooldown=30.0)
+        breaker.record_failure("model@url")
+        breaker.record_failure("model@url")
+
+        with patch("zsh_ai_assistant.circuit_breaker.time.time", return_value=time.time() + 31):
+            breaker.before_call("model@url")
+            with pytest.raises(CircuitOpenError):
+                breaker.before_call("model@url")
+
+    def test_successful_probe_closes_circuit(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a successful probe closes the circuit."""
+        breaker = self._breaker(tmp_path, cooldown=0.0)
+        breaker.record_failure("model@url")
+        breaker.record_failure("model@url")
+
+        breaker.before_call("model@url")
+        breaker.record_success("model@url")
+
+        breaker.before_call("model@url")
+        assert breaker.state.read() == {}
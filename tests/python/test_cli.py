@@ -30,6 +30,9 @@ class TestCLIGenerateCommand:
             assert result == "echo 'Hello World'"
             mock_service.generate_command.assert_called_once_with("list files in current directory")
 
+            generate_command("list files", directory="/home/user/project")
+            assert mock_service.working_directory == "/home/user/project"
+
     def test_generate_command_with_invalid_config(self, reset_env) -> None:  # type: ignore[no-untyped-def]
         """Test generate_command with invalid config."""
         # No API key set
@@ -187,7 +190,7 @@ class TestCLIMain:
             with patch.object(sys, "argv", ["cli", "command", "test prompt"]):
                 main()
 
-            mock_generate.assert_called_once_with("test prompt", False)
+            mock_generate.assert_called_once_with("test prompt", False, None)
 
             # Check output
             captured = capsys.readouterr()
@@ -206,12 +209,25 @@ class TestCLIMain:
                 with patch("sys.stdin", MagicMock(read=MagicMock(return_value="test prompt\n"))):
                     main()
 
-            mock_generate.assert_called_once_with("test prompt", False)
+            mock_generate.assert_called_once_with("test prompt", False, None)
 
             # Check output
             captured = capsys.readouterr()
             assert captured.out.strip() == "echo 'test'"
 
+    def test_main_with_command_cwd(self, reset_env, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test main passes the directory given with --cwd."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        with patch("zsh_ai_assistant.cli.generate_command") as mock_generate:
+            mock_generate.return_value = "ls"
+
+            with patch.object(sys, "argv", ["cli", "command", "--cwd", "/home/user/project", "test prompt"]):
+                main()
+
+            mock_generate.assert_called_once_with("test prompt", False, "/home/user/project")
+            assert capsys.readouterr().out.strip() == "ls"
+
     def test_main_with_chat_arg(self, reset_env, capsys) -> None:  # type: ignore[no-untyped-def]
         """Test main with chat arg."""
         os.environ["OPENAI_API_KEY"] = "test-api-key"
@@ -359,6 +375,162 @@ class TestCLIMain:
             # In streaming mode, output is printed by translate function, not captured here
             # So we just verify the function was called correctly
 
+    def test_main_with_interactive_resume(self) -> None:
+        """Test that --resume is passed on, with "" meaning the latest session."""
+        with patch("zsh_ai_assistant.cli.run_interactive_chat") as mock_run:
+            with patch.object(sys, "argv", ["cli", "interactive", "--resume"]):
+                main()
+            with patch.object(sys, "argv", ["cli", "interactive", "--resume", "abc"]):
+                main()
+
+        assert [c.kwargs["resume"] for c in mock_run.call_args_list] == ["", "abc"]
+
+    def test_main_with_interactive_list(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, capsys
+    ) -> None:
+        """Test that --list prints the saved sessions."""
+        from zsh_ai_assistant.session_log import LogChatHistory
+
+        monkeypatch.setenv("AI_HISTORY_DIR", str(tmp_path))
+        with patch.object(sys, "argv", ["cli", "interactive", "--list"]):
+            main()
+            assert capsys.readouterr().out.strip() == "No saved chat sessions."
+
+            with LogChatHistory(str(tmp_path), "s1") as history:
+                history.add_user_message("How do I list files?\nDetails")
+            main()
+
+        out = capsys.readouterr().out
+        assert out.startswith("s1  ")
+        assert "1 messages  How do I list files?" in out
+        assert "Details" not in out
+
+    def test_main_with_history_search(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, capsys
+    ) -> None:
+        """Test that history search finds messages of saved session logs."""
+        from zsh_ai_assistant.session_log import LogChatHistory
+
+        monkeypatch.setenv("AI_HISTORY_DIR", str(tmp_path))
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("second column?")
+            history.add_ai_message("awk '{print $2}'\nworks")
+        with patch.object(sys, "argv", ["cli", "history", "search", "print", "--limit", "5"]):
+            main()
+
+        out = capsys.readouterr().out.strip()
+        assert out.startswith("s1  ")
+        assert out.endswith("assistant: awk '{[print] $2}' works")
+
+    def test_main_with_history_invalid_usage(self, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that history without a search query prints usage."""
+        with patch.object(sys, "argv", ["cli", "history", "search"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        assert exc_info.value.code == 1
+        assert "Usage:" in capsys.readouterr().err
+
+    def test_main_with_batch(self, reset_env, monkeypatch, tmp_path, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that batch reads JSONL from a file and writes a result per line."""
+        monkeypatch.setenv("ZSH_AI_ASSISTANT_TEST_MODE", "1")
+        requests = tmp_path / "requests.jsonl"
+        requests.write_text(
+            '{"id": "a", "mode": "command", "prompt": "list files"}\n'
+            '{"id": "b", "mode": "translate", "text": "Hello", "target": "japanese"}\n'
+        )
+        with patch.object(sys, "argv", ["cli", "batch", str(requests), "--workers", "2", "--ordered"]):
+            main()
+
+        captured = capsys.readouterr()
+        records = [json.loads(line) for line in captured.out.splitlines()]
+        assert [record["id"] for record in records] == ["a", "b"]
+        assert all("result" in record for record in records)
+        assert captured.err.startswith("Batch: 2 requests (0 failed)")
+
+    def test_main_with_several_translation_targets(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, capsys
+    ) -> None:
+        """Test that comma-separated targets print a labeled section each, or write a file each."""
+        monkeypatch.setenv("ZSH_AI_ASSISTANT_TEST_MODE", "1")
+        with patch.object(sys, "argv", ["cli", "translate", "japanese, french", "Hello"]):
+            main()
+
+        output = capsys.readouterr().out
+        assert output.index("=== japanese ===") < output.index("=== french ===")
+        assert "[Translation to french: Hello]" in output
+
+        with patch.object(sys, "argv", ["cli", "translate", "japanese,french", "Hello", "--output-dir", str(tmp_path)]):
+            main()
+
+        assert (tmp_path / "french.txt").read_text() == "[Translation to french: Hello]\n"
+        assert (tmp_path / "japanese.txt").exists()
+
+    def test_main_with_translate_glossary(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that --glossary is passed to the service's configuration."""
+        monkeypatch.setenv("AI_GLOSSARY", "")
+        with patch("zsh_ai_assistant.cli.translate") as mock_translate:
+            mock_translate.return_value = "こんにちは"
+            with patch.object(sys, "argv", ["cli", "translate", "--glossary", "terms.tsv", "japanese", "Hello"]):
+                main()
+
+        mock_translate.assert_called_once_with("Hello", "japanese", False, stream=False)
+        assert os.environ["AI_GLOSSARY"] == "terms.tsv"
+
+    def test_main_with_translate_follow(self, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that --follow translates stdin as it is read, into one language only."""
+        with patch("zsh_ai_assistant.cli.translate_stdin") as translate_stdin:
+            with patch.object(sys, "argv", ["cli", "translate", "japanese", "--follow"]):
+                main()
+
+            translate_stdin.assert_called_once_with("japanese", False)
+
+            with patch.object(sys, "argv", ["cli", "translate", "japanese,french", "--follow"]):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+
+        assert exc_info.value.code == 1
+        assert "--follow" in capsys.readouterr().err
+
+    def test_main_with_translate_file(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, tmp_path, capsys
+    ) -> None:
+        """Test that --input and --output translate a file, and need each other."""
+        monkeypatch.setenv("ZSH_AI_ASSISTANT_TEST_MODE", "1")
+        source, output = tmp_path / "source.txt", tmp_path / "output.txt"
+        source.write_text("Hello\n\nBye\n", encoding="utf-8")
+        argv = ["cli", "translate", "french", "--input", str(source), "--output", str(output)]
+        with patch.object(sys, "argv", argv):
+            main()
+
+        assert output.read_text(encoding="utf-8") == (
+            "[Translation to french: Hello]\n\n[Translation to french: Bye]\n"
+        )
+        assert f"Wrote {output}" in capsys.readouterr().err
+
+        with patch.object(sys, "argv", ["cli", "translate", "french", "--input", str(source)]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+        assert exc_info.value.code == 1
+
+    def test_main_with_batch_invalid_usage(self, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that batch with a missing worker count prints usage."""
+        with patch.object(sys, "argv", ["cli", "batch", "--workers"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        assert exc_info.value.code == 1
+        assert "Usage:" in capsys.readouterr().err
+
+    def test_main_with_interactive_invalid_option(self, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that unknown interactive options print usage."""
+        with patch.object(sys, "argv", ["cli", "interactive", "--bogus"]):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        assert exc_info.value.code == 1
+        assert "Usage:" in capsys.readouterr().err
+
 
 class TestMessageConversion:
     """Test cases for message format conversion."""
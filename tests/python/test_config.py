@@ -231,3 +231,231 @@ class TestSetupLogging:
         assert "%(name)s" in fmt_str
         assert "%(levelname)s" in fmt_str
         assert "%(message)s" in fmt_str
+
+
+class TestBackendProfileConfig:
+    """Test cases for backend profile configuration."""
+
+    def test_backend_profile_defaults_to_openai(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that prompt caching is disabled by default."""
+        config = AIConfig()
+
+        assert config.backend_profile == "openai"
+        assert config.prompt_cache_enabled is False
+        assert config.llamacpp_slots == 0
+        assert config.llamacpp_slot is None
+
+    def test_llamacpp_profile(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test llama.cpp profile settings."""
+        os.environ["AI_BACKEND_PROFILE"] = "LlamaCpp"
+        os.environ["AI_LLAMACPP_SLOTS"] = "4"
+        os.environ["AI_LLAMACPP_SLOT"] = "2"
+
+        config = AIConfig()
+
+        assert config.prompt_cache_enabled is True
+        assert config.llamacpp_slots == 4
+        assert config.llamacpp_slot == 2
+
+
+class TestOutputConfig:
+    """Test cases for client and output configuration."""
+
+    def test_defaults(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that ChatOpenAI and 16 ms output frames are the defaults."""
+        config = AIConfig()
+
+        assert config.client == "langchain"
+        assert config.output_flush_interval == 0.016
+
+    def test_overrides(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test the client and output settings."""
+        monkeypatch.setenv("AI_CLIENT", "HTTP")
+        monkeypatch.setenv("AI_OUTPUT_FLUSH_MS", "0")
+
+        config = AIConfig()
+
+        assert config.client == "http"
+        assert config.output_flush_interval == 0
+
+
+class TestHistoryConfig:
+    """Test cases for chat session configuration."""
+
+    def test_defaults(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that sessions are saved in the plugin's home directory by default."""
+        config = AIConfig()
+
+        assert config.save_history is True
+        assert config.history_dir == os.path.expanduser("~/.zsh/zsh-ai-assistant/sessions")
+        assert config.history_store == "log"
+        assert config.history_context_messages == 40
+
+    def test_overrides(self, reset_env, monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test the chat session settings."""
+        monkeypatch.setenv("AI_SAVE_HISTORY", "false")
+        monkeypatch.setenv("AI_HISTORY_DIR", str(tmp_path))
+        monkeypatch.setenv("AI_HISTORY_STORE", "SQLite")
+        monkeypatch.setenv("AI_HISTORY_CONTEXT_MESSAGES", "10")
+
+        config = AIConfig()
+
+        assert config.save_history is False
+        assert config.history_dir == str(tmp_path)
+        assert config.history_store == "sqlite"
+        assert config.history_context_messages == 10
+
+
+class TestModeProfileConfig:
+    """Test cases for per-mode profiles."""
+
+    def test_profiles_default_to_global_settings(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that profiles inherit the global model, endpoint and parameters."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["AI_MODEL"] = "gpt-4"
+
+        config = AIConfig()
+
+        for mode in ("command", "chat", "translate"):
+            profile = config.profile(mode)
+            assert profile.model == "gpt-4"
+            assert profile.base_url == "http://localhost:8080/v1"
+            assert profile.api_key == "test-api-key"
+            assert profile.temperature == 0.7
+            assert profile.stop == []
+        assert config.profile("command").max_tokens == 256
+        assert config.profile("chat").max_tokens == 1000
+
+    def test_profile_overrides(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test per-mode overrides."""
+        os.environ["AI_COMMAND_MODEL"] = "qwen2.5-coder-1.5b"
+        os.environ["AI_COMMAND_BASE_URL"] = "http://localhost:8081/v1"
+        os.environ["AI_COMMAND_MAX_TOKENS"] = "64"
+        os.environ["AI_CHAT_TEMPERATURE"] = "0.2"
+        os.environ["AI_TRANSLATE_STOP"] = '["</s>", "\\n\\n\\n"]'
+
+        config = AIConfig()
+
+        assert config.profile("command").model == "qwen2.5-coder-1.5b"
+        assert config.profile("command").base_url == "http://localhost:8081/v1"
+        assert config.profile("command").max_tokens == 64
+        assert config.profile("chat").temperature == 0.2
+        assert config.profile("translate").stop == ["</s>", "\n\n\n"]
+
+    def test_command_max_tokens_never_exceeds_global(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that the command budget is capped by AI_MAX_TOKENS."""
+        os.environ["AI_MAX_TOKENS"] = "100"
+
+        config = AIConfig()
+
+        assert config.profile("command").max_tokens == 100
+
+    def test_profile_timeouts(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that per-mode timeouts override the global ones, including an explicit 0."""
+        monkeypatch.setenv("AI_CONNECT_TIMEOUT", "2")
+        monkeypatch.setenv("AI_TIMEOUT", "30")
+        monkeypatch.setenv("AI_COMMAND_CONNECT_TIMEOUT", "0")
+        monkeypatch.setenv("AI_COMMAND_READ_TIMEOUT", "5")
+
+        config = AIConfig()
+
+        assert config.profile("command").timeouts == (0.0, 5.0, 30.0)
+        assert config.profile("chat").timeouts == (2.0, None, 30.0)
+
+
+class TestSingleFlightConfig:
+    """Test cases for single-flight configuration."""
+
+    def test_single_flight_is_opt_in(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that identical requests are only shared when enabled."""
+        assert AIConfig().single_flight is False
+
+        monkeypatch.setenv("AI_SINGLE_FLIGHT", "true")
+
+        assert AIConfig().single_flight is True
+
+
+class TestTranslationMemoryConfig:
+    """Test cases for translation memory configuration."""
+
+    def test_translation_memory(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that the translation memory is opt-in and its settings are read."""
+        config = AIConfig()
+        assert (config.translation_memory, config.translation_memory_fuzzy, config.translation_workers) == (
+            False,
+            0.95,
+            4,
+        )
+
+        monkeypatch.setenv("AI_TRANSLATION_MEMORY", "1")
+        monkeypatch.setenv("AI_TRANSLATION_MEMORY_FUZZY", "0")
+        monkeypatch.setenv("AI_TRANSLATION_WORKERS", "8")
+        monkeypatch.setenv("AI_FOLLOW_IDLE_MS", "250")
+        config = AIConfig()
+        assert config.follow_idle_timeout == 0.25
+
+        assert (config.translation_memory, config.translation_memory_fuzzy, config.translation_workers) == (
+            True,
+            0.0,
+            8,
+        )
+
+
+class TestLanguageDetectionConfig:
+    """Test cases for language detection configuration."""
+
+    def test_language_detection(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that language detection is on unless disabled."""
+        assert AIConfig().language_detection is True
+
+        monkeypatch.setenv("AI_LANGUAGE_DETECTION", "false")
+
+        assert AIConfig().language_detection is False
+
+
+class TestGlossaryConfig:
+    """Test cases for glossary configuration."""
+
+    def test_glossary(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that no glossary is used by default and the path is expanded."""
+        assert AIConfig().glossary is None
+
+        monkeypatch.setenv("AI_GLOSSARY", "~/glossary.tsv")
+
+        assert AIConfig().glossary == os.path.expanduser("~/glossary.tsv")
+
+
+class TestCommandContextConfig:
+    """Test cases for working directory context configuration."""
+
+    def test_command_context(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that the context is off by default and the deadline is read in milliseconds."""
+        config = AIConfig()
+        assert (config.command_context, config.command_context_deadline) == (False, 0.025)
+
+        monkeypatch.setenv("AI_COMMAND_CONTEXT", "true")
+        monkeypatch.setenv("AI_COMMAND_CONTEXT_DEADLINE_MS", "10")
+
+        config = AIConfig()
+        assert (config.command_context, config.command_context_deadline) == (True, 0.01)
+
+
+class TestRateLimitConfig:
+    """Test cases for host-wide rate limit configuration."""
+
+    def test_limits_are_off_by_default(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that no limit is configured by default."""
+        assert AIConfig().rate_limited is False
+
+    def test_limits(self, reset_env, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test the rate limit settings."""
+        monkeypatch.setenv("AI_RATE_LIMIT_RPS", "2.5")
+        monkeypatch.setenv("AI_RATE_LIMIT_TPM", "90000")
+        monkeypatch.setenv("AI_MAX_IN_FLIGHT", "4")
+
+        config = AIConfig()
+
+        assert config.rate_limited is True
+        assert config.rate_limit_rps == 2.5
+        assert config.rate_limit_tpm == 90000
+        assert config.max_in_flight == 4
@@ -0,0 +1,134 @@
+"""Test cases for the working directory context."""
+
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from zsh_ai_assistant.context import (
+    MAX_ENTRIES,
+    DirectoryContext,
+    find_git_dir,
+    list_entries,
+    project_types,
+    read_branch,
+)
+
+
+def _git(directory: str, *args: str) -> None:
+    """Run a git command quietly in a directory."""
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repository(tmp_path):  # type: ignore[no-untyped-def]
+    """Create a git repository with one commit and an untracked file."""
+    project = tmp_path / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "pyproject.toml").write_text("[project]\n")
+    (project / "README.md").write_text("readme\n")
+    _git(str(project), "init", "-q", "-b", "main")
+    _git(str(project), "add", "pyproject.toml")
+    _git(str(project), "commit", "-q", "-m", "init")
+    return project
+
+
+class TestHelpers:
+    """Test cases for the parts of a summary."""
+
+    def test_list_entries(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that directories come first and hidden entries are skipped."""
+        for name in ("b.txt", "a.txt", ".hidden"):
+            (tmp_path / name).write_text("")
+        (tmp_path / "docs").mkdir()
+
+        assert list_entries(str(tmp_path)) == ["docs/", "a.txt", "b.txt"]
+
+    def test_project_types(self) -> None:
+        """Test that marker files give the kinds of project once each."""
+        assert project_types(["src/", "setup.py", "pyproject.toml", "Makefile"]) == ["Python", "Make"]
+        assert project_types(["notes.txt"]) == []
+
+    def test_git_dir_and_branch(self, repository) -> None:  # type: ignore[no-untyped-def]
+        """Test that the repository is found from a subdirectory and its branch is read."""
+        git_dir = find_git_dir(str(repository / "src"))
+
+        assert git_dir == str(repository / ".git")
+        assert read_branch(git_dir) == "main"
+        assert find_git_dir("/") is None
+
+
+class TestDirectoryContext:
+    """Test cases for DirectoryContext class."""
+
+    def test_summary(self, tmp_path, repository) -> None:  # type: ignore[no-untyped-def]
+        """Test that the summary describes the entries, project and git state."""
+        context = DirectoryContext(str(tmp_path / "context.json"), deadline=5)
+
+        summary = context.summary(str(repository))
+
+        assert summary.splitlines() == [
+            f"Current directory: {repository}",
+            "Project: Python",
+            "Entries: src/, README.md, pyproject.toml",
+            "Git: branch main, 0 changed, 1 untracked",
+        ]
+
+    def test_project_is_detected_beyond_the_entries_shown(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a marker file sorted after the cut still gives the kind of project."""
+        for index in range(MAX_ENTRIES + 5):
+            (tmp_path / f"module_{index:02}.py").write_text("")
+        (tmp_path / "pyproject.toml").write_text("")
+        context = DirectoryContext(str(tmp_path / ".context.json"), deadline=5)
+
+        lines = context.summary(str(tmp_path)).splitlines()
+
+        assert lines[1] == "Project: Python"
+        assert lines[2].endswith(", module_29.py (and 6 more)")
+
+    def test_summary_is_cached_until_the_directory_changes(  # type: ignore[no-untyped-def]
+        self, tmp_path, repository
+    ) -> None:
+        """Test that an unchanged directory is not gathered again, and a changed one is."""
+        context = DirectoryContext(str(tmp_path / "context.json"), deadline=5)
+        first = context.summary(str(repository))
+
+        with patch("zsh_ai_assistant.context.list_entries") as listing:
+            assert DirectoryContext(str(tmp_path / "context.json"), deadline=5).summary(str(repository)) == first
+        listing.assert_not_called()
+
+        (repository / "main.py").write_text("")
+        os.utime(repository, ns=(0, os.stat(repository).st_mtime_ns + 1))
+        assert "main.py" in context.summary(str(repository))
+
+    def test_git_status_past_the_deadline_is_left_out(  # type: ignore[no-untyped-def]
+        self, tmp_path, repository
+    ) -> None:
+        """Test that a slow git status is cut off and the incomplete summary is not cached."""
+        slow_git = tmp_path / "bin" / "git"
+        slow_git.parent.mkdir()
+        slow_git.write_text("#!/bin/sh\nsleep 5\n")
+        slow_git.chmod(0o755)
+        context = DirectoryContext(str(tmp_path / "context.json"), deadline=0.05)
+
+        with patch.dict(os.environ, {"PATH": f"{slow_git.parent}:{os.environ['PATH']}"}):
+            summary = context.summary(str(repository))
+
+        assert summary.splitlines()[-1] == "Git: branch main"
+        assert not os.path.exists(tmp_path / "context.json")
+
+    def test_directory_outside_a_repository(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a directory outside any repository has no git line."""
+        (tmp_path / "plain").mkdir()
+        (tmp_path / "plain" / "notes.txt").write_text("")
+        context = DirectoryContext(str(tmp_path / "context.json"), deadline=5)
+
+        assert (
+            context.summary(str(tmp_path / "plain")) == f"Current directory: {tmp_path / 'plain'}\nEntries: notes.txt"
+        )
@@ -0,0 +1,79 @@
+"""Test cases for resumable file translation."""
+
+import os
+from typing import Iterator, List
+
+import pytest
+
+from zsh_ai_assistant.file_translation import journal_path, translate_file
+
+
+def _upper(text: str) -> Iterator[str]:
+    """Translate a paragraph into upper case, in two chunks."""
+    yield text[:2].upper()
+    yield text[2:].upper()
+
+
+class TestTranslateFile:
+    """Test cases for translate_file function."""
+
+    def test_translate_file(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that every paragraph is translated in order and the journal is removed."""
+        source, output = tmp_path / "source.txt", tmp_path / "output.txt"
+        source.write_text("first paragraph\n\n  second\nparagraph\n\n\nthird 日本語\n", encoding="utf-8")
+        done: List[int] = []
+
+        resumed_from = translate_file(
+            str(source), str(output), "upper", _upper, 2, progress=lambda end, size: done.append(end)
+        )
+
+        assert resumed_from == 0
+        assert output.read_text(encoding="utf-8") == "FIRST PARAGRAPH\n\n  SECOND\nPARAGRAPH\n\n\nTHIRD 日本語\n"
+        assert done[-1] == source.stat().st_size
+        assert not os.path.exists(journal_path(str(output)))
+
+    def test_interrupted_run_is_resumed(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a second run only translates the paragraphs the first one did not finish."""
+        source, output = tmp_path / "source.txt", tmp_path / "output.txt"
+        source.write_text("one\n\ntwo\n\nthree\n\nfour\n", encoding="utf-8")
+        requested: List[str] = []
+
+        def failing(text: str) -> Iterator[str]:
+            requested.append(text)
+            if text == "three":
+                raise ConnectionError("server went away")
+            return _upper(text)
+
+        with pytest.raises(ConnectionError):
+            translate_file(str(source), str(output), "upper", failing, 1)
+        assert os.path.exists(journal_path(str(output)))
+
+        requested.clear()
+        resumed_from = translate_file(
+            str(source), str(output), "upper", lambda text: failing(text.replace("e", "E")), 1
+        )
+
+        assert resumed_from == len("one\n\ntwo\n\n")
+        assert requested == ["thrEE", "four"]
+        assert output.read_text(encoding="utf-8") == "ONE\n\nTWO\n\nTHREE\n\nFOUR\n"
+
+    def test_changed_source_starts_over(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a journal of another source or target is not resumed."""
+        source, output = tmp_path / "source.txt", tmp_path / "output.txt"
+        source.write_text("one\n\ntwo\n", encoding="utf-8")
+        output.write_text("stale", encoding="utf-8")
+        journal = journal_path(str(output))
+        with open(journal, "w", encoding="utf-8") as f:
+            f.write('{"source": "elsewhere"}\n5 5\n')
+
+        assert translate_file(str(source), str(output), "upper", _upper, 2) == 0
+        assert output.read_text(encoding="utf-8") == "ONE\n\nTWO\n"
+
+    def test_empty_file(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that an empty file gives an empty translation."""
+        source, output = tmp_path / "source.txt", tmp_path / "output.txt"
+        source.write_bytes(b"")
+
+        translate_file(str(source), str(output), "upper", _upper, 2)
+
+        assert output.read_bytes() == b""
@@ -0,0 +1,67 @@
+"""Test cases for glossary matching."""
+
+import os
+from unittest.mock import patch
+
+from zsh_ai_assistant import glossary
+from zsh_ai_assistant.glossary import Glossary, load_glossary, parse_glossary
+
+
+class TestGlossary:
+    """Test cases for Glossary class."""
+
+    def test_find_overlapping_terms(self) -> None:
+        """Test that every term is found once, including terms inside other terms."""
+        terms = Glossary({"京都": "Kyoto", "東京都": "Tokyo Metropolis", "東京": "Tokyo", "大阪": "Osaka"})
+
+        assert terms.find("東京都庁と東京") == [("東京", "Tokyo"), ("東京都", "Tokyo Metropolis"), ("京都", "Kyoto")]
+
+    def test_whole_words(self) -> None:
+        """Test that terms only match whole words in scripts written with spaces."""
+        terms = Glossary({"pull request": "プルリクエスト", "go": "Go", "設定": "configuration"})
+
+        assert terms.find("A good pull request.") == [("pull request", "プルリクエスト")]
+        assert terms.find("Written in Go, see 設定ファイル") == [("go", "Go"), ("設定", "configuration")]
+
+    def test_instructions(self) -> None:
+        """Test that only terms occurring in the text are added to the prompt."""
+        terms = Glossary({"worktree": "ワークツリー", "rebase": "リベース"})
+
+        assert terms.instructions("Add a worktree") == "Translate these terms as follows:\n- worktree: ワークツリー\n\n"
+        assert terms.instructions("Hello") == ""
+
+    def test_digest(self) -> None:
+        """Test that glossaries share a digest only when their entries are the same."""
+        digest = Glossary({"worktree": "ワークツリー"}).digest()
+
+        assert Glossary({"worktree": "ワークツリー"}).digest() == digest
+        assert Glossary({"worktree": "作業ツリー"}).digest() != digest
+        assert Glossary({"worktree": "ワークツリー", "rebase": "リベース"}).digest() != digest
+
+    def test_parse_glossary(self) -> None:
+        """Test that comments, blank and malformed lines are skipped."""
+        content = "# Product terms\n\nworktree\tワークツリー\nno translation\n rebase \t リベース \n"
+
+        assert parse_glossary(content) == {"worktree": "ワークツリー", "rebase": "リベース"}
+
+
+class TestLoadGlossary:
+    """Test cases for compiled glossaries cached on disk."""
+
+    def test_compiled_glossary_is_cached_until_the_file_changes(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that an unchanged glossary is loaded without compiling it again."""
+        path = tmp_path / "glossary.tsv"
+        path.write_text("worktree\tワークツリー\n", encoding="utf-8")
+        cache_dir = str(tmp_path / "state")
+        load_glossary(str(path), cache_dir)
+
+        with patch.object(glossary.Glossary, "_link") as link:
+            cached = load_glossary(str(path), cache_dir)
+        assert link.call_count == 0
+        assert cached.find("a worktree") == [("worktree", "ワークツリー")]
+        assert cached.digest() == Glossary({"worktree": "ワークツリー"}).digest()
+
+        path.write_text("worktree\tワークツリー\nrebase\tリベース\n", encoding="utf-8")
+        os.utime(path, ns=(0, 10**9))
+
+        assert len(load_glossary(str(path), cache_dir)) == 2
@@ -0,0 +1,236 @@
+"""Test cases for the direct OpenAI-compatible HTTP client."""
+
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Generator, List
+
+import pytest
+
+from zsh_ai_assistant.ai_service import LangChainAIService
+from zsh_ai_assistant.config import AIConfig
+from zsh_ai_assistant.http_client import APIError, OpenAIHTTPClient
+from zsh_ai_assistant.messages import HumanMessage, SystemMessage
+
+
+class _Server:
+    """Local chat completions server recording the requests it receives."""
+
+    def __init__(self) -> None:
+        self.requests: List[Dict[str, Any]] = []
+        self.headers: List[Dict[str, str]] = []
+        self.tokens = ["Hello", " world"]
+        self.statuses: List[int] = []
+        self.connections = 0
+        self.base_url = ""
+
+
+@pytest.fixture
+def server() -> Generator[_Server, None, None]:
+    """Run a local OpenAI-compatible server for the duration of a test."""
+    state = _Server()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            state.connections += 1
+            super().setup()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            state.requests.append(body)
+            state.headers.append(dict(self.headers))
+            if state.statuses:
+                status = state.statuses.pop(0)
+                error = json.dumps({"error": {"message": "busy"}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(error)))
+                self.end_headers()
+                self.wfile.write(error)
+                return
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+                events += [{"choices": [{"delta": {"content": token}}]} for token in state.tokens]
+                for event in events:
+                    self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+                return
+            payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": "".join(state.tokens)}}]})
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload.encode())
+
+        def _chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    state.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/v1"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _client(server: _Server, **kwargs: Any) -> OpenAIHTTPClient:
+    return OpenAIHTTPClient("test-api-key", server.base_url, "gpt-4", **kwargs)
+
+
+class TestOpenAIHTTPClient:
+    """Test cases for OpenAIHTTPClient class."""
+
+    def test_invoke_sends_request_and_returns_message(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test a non-streaming completion."""
+        client = _client(server, temperature=0.2, max_tokens=50)
+
+        response = client.invoke([SystemMessage(content="Be brief"), HumanMessage(content="Hi")])
+
+        assert response.content == "Hello world"
+        assert server.requests == [
+            {
+                "model": "gpt-4",
+                "messages": [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hi"}],
+                "temperature": 0.2,
+                "max_tokens": 50,
+            }
+        ]
+        assert server.headers[0]["Authorization"] == "Bearer test-api-key"
+
+    def test_per_request_options_override_defaults(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test that per-request options and extra_body end up in the request."""
+        client = _client(server)
+
+        client.invoke(
+            [HumanMessage(content="Hi")],
+            max_tokens=10,
+            stop=["\n"],
+            extra_body={"cache_prompt": True, "id_slot": 1},
+        )
+
+        request = server.requests[0]
+        assert request["max_tokens"] == 10
+        assert request["stop"] == ["\n"]
+        assert request["cache_prompt"] is True
+        assert request["id_slot"] == 1
+
+    def test_stream_yields_deltas_and_reuses_connection(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test that streaming yields content deltas over one kept-alive connection."""
+        client = _client(server)
+
+        first = [chunk.content for chunk in client.stream([HumanMessage(content="Hi")])]
+        second = [chunk.content for chunk in client.stream([HumanMessage(content="Again")])]
+
+        assert first == second == ["Hello", " world"]
+        assert server.requests[0]["stream"] is True
+        assert server.connections == 1
+
+    def test_stream_text_yields_strings(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test that stream_text yields the delta text without message objects."""
+        server.tokens = ['Say "hi"', "\n", "こんにちは"]
+        client = _client(server)
+
+        assert list(client.stream_text([HumanMessage(content="Hi")])) == ['Say "hi"', "\n", "こんにちは"]
+
+    def test_closing_stream_early_drops_connection(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test that abandoning a stream closes the connection and the next request reconnects."""
+        client = _client(server)
+
+        stream = client.stream([HumanMessage(content="Hi")])
+        assert next(stream).content == "Hello"
+        stream.close()
+
+        assert client.invoke([HumanMessage(content="Again")]).content == "Hello world"
+        assert server.connections == 2
+
+    def test_transient_status_is_retried(self, server, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that a 503 is retried before giving up."""
+        monkeypatch.setattr("zsh_ai_assistant.http_client.time.sleep", lambda seconds: None)
+        server.statuses = [503]
+        client = _client(server)
+
+        assert client.invoke([HumanMessage(content="Hi")]).content == "Hello world"
+        assert len(server.requests) == 2
+
+    def test_error_status_raises(self, server) -> None:  # type: ignore[no-untyped-def]
+        """Test that a client error is raised without retrying."""
+        server.statuses = [401]
+        client = _client(server)
+
+        with pytest.raises(APIError) as excinfo:
+            client.invoke([HumanMessage(content="Hi")])
+
+        assert excinfo.value.status == 401
+        assert "busy" in str(excinfo.value)
+        assert len(server.requests) == 1
+
+    def test_unreachable_server_raises_connection_error(self) -> None:
+        """Test that a refused connection surfaces as a ConnectionError."""
+        client = OpenAIHTTPClient("key", "http://127.0.0.1:9/v1", "gpt-4", max_retries=0)
+
+        with pytest.raises(ConnectionError):
+            client.invoke([HumanMessage(content="Hi")])
+
+    def test_name_resolution_failure_is_retried(self, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that a DNS failure is retried like other connection failures, then raised."""
+        monkeypatch.setattr("zsh_ai_assistant.http_client.time.sleep", lambda seconds: None)
+        client = OpenAIHTTPClient("key", "http://api.invalid/v1", "gpt-4", max_retries=1)
+        attempts = []
+
+        def fail(*args: object) -> None:
+            attempts.append(args)
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+        monkeypatch.setattr("http.client.socket.create_connection", fail)
+
+        with pytest.raises(socket.gaierror):
+            client.invoke([HumanMessage(content="Hi")])
+        assert len(attempts) == 2
+
+
+class TestServiceWithHTTPClient:
+    """Test cases for the AI service running on the HTTP client."""
+
+    def _service(self, server: _Server, monkeypatch: pytest.MonkeyPatch) -> LangChainAIService:
+        # monkeypatch undoes these, unlike reset_env which only restores
+        monkeypatch.setenv("OPENAI_API_KEY", "test-api-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("AI_CLIENT", "http")
+        monkeypatch.setenv("AI_CIRCUIT_FAILURE_THRESHOLD", "0")
+        return LangChainAIService(AIConfig())
+
+    def test_http_client_is_selected_by_config(  # type: ignore[no-untyped-def]
+        self, reset_env, server, monkeypatch
+    ) -> None:
+        """Test that AI_CLIENT=http replaces ChatOpenAI."""
+        service = self._service(server, monkeypatch)
+
+        assert isinstance(service.client, OpenAIHTTPClient)
+        assert service._supports_streaming("chat")
+
+    def test_chat_stream(self, reset_env, server, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that chat responses stream through the HTTP client."""
+        service = self._service(server, monkeypatch)
+
+        assert list(service.chat_stream([{"role": "user", "content": "Hi"}])) == ["Hello", " world"]
+        assert server.requests[0]["messages"][0]["role"] == "system"
+        assert server.requests[0]["messages"][1] == {"role": "user", "content": "Hi"}
+
+    def test_generate_command(self, reset_env, server, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that command generation stops at the first command line."""
+        server.tokens = ["ls", " -la\n", "This lists files"]
+        service = self._service(server, monkeypatch)
+
+        assert service.generate_command("list files") == "ls -la"
+        assert server.requests[0]["max_tokens"] == 256
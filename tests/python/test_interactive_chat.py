@@ -7,6 +7,7 @@ from io import StringIO
 from unittest.mock import Mock, patch, MagicMock
 import pytest
 from zsh_ai_assistant.interactive_chat import InteractiveChat, main
+from zsh_ai_assistant.session_log import LogChatHistory
 
 
 class TestInteractiveChat:
@@ -92,10 +93,8 @@ class TestInteractiveChat:
                 chat.generate_response("Hello")
 
             assert "Error: Test error" in str(exc_info.value)
-            # Error should be added to chat history
-            assert len(chat.chat_history) == 2
-            assert chat.chat_history[0] == {"role": "user", "content": "Hello"}
-            assert "Error: Test error" in chat.chat_history[1]["content"]
+            # Neither the error nor the unanswered question is kept
+            assert chat.chat_history == []
 
 
 class TestInteractiveChatMain:
@@ -204,3 +203,153 @@ class TestInteractiveChatRun:
 
         captured = capsys.readouterr()
         assert "Goodbye!" in captured.out
+
+
+class TestInteractiveChatPromptCache:
+    """Test cases for prompt cache friendly history handling."""
+
+    def test_raw_response_kept_with_prompt_cache(self, reset_env, capsys) -> None:  # type: ignore[no-untyped-def]
+        """Test that the unstripped response is stored when prompt caching is enabled."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+        os.environ["AI_BACKEND_PROFILE"] = "llamacpp"
+
+        chat = InteractiveChat(test_mode=True)
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Hi", " there\n"])):
+            result = chat.generate_response("Hello")
+
+        assert result == "Hi there"
+        assert chat.chat_history[1] == {"role": "assistant", "content": "Hi there\n"}
+        assert chat.service.session_id == chat.session_id
+
+
+class TestInteractiveChatMarkdown:
+    """Test cases for markdown rendering of streamed answers."""
+
+    def test_markdown_is_rendered_but_history_stays_raw(  # type: ignore[no-untyped-def]
+        self, reset_env, capsys
+    ) -> None:
+        """Test that styled output does not leak into the chat history."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+
+        chat = InteractiveChat(test_mode=True)
+        chat.render_markdown = True
+        with patch.object(chat.service, "chat_stream", return_value=iter(["# Ti", "tle\nUse `ls`"])):
+            result = chat.generate_response("Hello")
+
+        assert result == "# Title\nUse `ls`"
+        assert "\x1b[1mTitle\x1b[22m\nUse \x1b[36mls\x1b[39m" in capsys.readouterr().out
+
+    def test_markdown_is_not_rendered_when_piped(self, reset_env) -> None:  # type: ignore[no-untyped-def]
+        """Test that rendering is off when stdout is not a terminal."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        os.environ["OPENAI_BASE_URL"] = "https://api.example.com"
+
+        assert InteractiveChat(test_mode=True).render_markdown is False
+
+
+class TestInteractiveChatSessions:
+    """Test cases for saved and resumed chat sessions."""
+
+    def test_messages_are_saved(self, reset_env, capsys, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the conversation is appended to a session log."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        chat = InteractiveChat(test_mode=True, history_dir=str(tmp_path))
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Hi"])):
+            chat.generate_response("Hello")
+        with patch("sys.stdin", StringIO("quit\n")):
+            chat.run_interactive_chat()
+
+        assert f"aiask --resume {chat.session_id}" in capsys.readouterr().out
+        with LogChatHistory(str(tmp_path), chat.session_id) as history:
+            assert history.get_messages() == chat.chat_history
+
+    def test_failed_turn_is_not_saved(self, reset_env, capsys, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that an error is shown but neither it nor its question is saved for --resume."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        chat = InteractiveChat(test_mode=True, history_dir=str(tmp_path))
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Hi"])):
+            chat.generate_response("Hello")
+        with patch.object(chat.service, "chat_stream", side_effect=ConnectionError("server went away")):
+            with pytest.raises(Exception, match="Error: server went away"):
+                chat.generate_response("Are you there?")
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Yes"])):
+            chat.generate_response("Are you there?")
+        chat.history.close()  # type: ignore[union-attr]
+
+        resumed = InteractiveChat(test_mode=True, resume="", history_dir=str(tmp_path))
+        assert resumed.chat_history == [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi"},
+            {"role": "user", "content": "Are you there?"},
+            {"role": "assistant", "content": "Yes"},
+        ]
+
+    def test_nothing_is_saved_without_messages(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a session quit right away leaves no files behind."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        chat = InteractiveChat(test_mode=True, history_dir=str(tmp_path))
+        with patch("sys.stdin", StringIO("quit\n")):
+            chat.run_interactive_chat()
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_resume_loads_the_context_window(  # type: ignore[no-untyped-def]
+        self, reset_env, monkeypatch, capsys, tmp_path
+    ) -> None:
+        """Test that resuming the latest session loads only its last messages."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        monkeypatch.setenv("AI_HISTORY_CONTEXT_MESSAGES", "2")
+        with LogChatHistory(str(tmp_path), "old") as history:
+            for i in range(3):
+                history.add_user_message(f"question {i}")
+                history.add_ai_message(f"answer {i}")
+
+        chat = InteractiveChat(test_mode=True, resume="", history_dir=str(tmp_path))
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Hi"])):
+            chat.generate_response("question 3")
+        with patch("sys.stdin", StringIO("quit\n")):
+            chat.run_interactive_chat()
+
+        assert chat.session_id == chat.service.session_id == "old"
+        assert chat.chat_history == [
+            {"role": "user", "content": "question 2"},
+            {"role": "assistant", "content": "answer 2"},
+            {"role": "user", "content": "question 3"},
+            {"role": "assistant", "content": "Hi"},
+        ]
+        assert "Resuming session old (8 messages)" in capsys.readouterr().out
+        with LogChatHistory(str(tmp_path), "old") as history:
+            assert len(history) == 8
+
+    def test_sqlite_store(self, reset_env, monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that sessions can be saved to and resumed from the SQLite store."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+        monkeypatch.setenv("AI_HISTORY_STORE", "sqlite")
+
+        chat = InteractiveChat(test_mode=True, history_dir=str(tmp_path))
+        with patch.object(chat.service, "chat_stream", return_value=iter(["Hi"])):
+            chat.generate_response("Hello")
+        with patch("sys.stdin", StringIO("quit\n")):
+            chat.run_interactive_chat()
+
+        resumed = InteractiveChat(test_mode=True, resume="", history_dir=str(tmp_path))
+        assert resumed.session_id == chat.session_id
+        assert resumed.chat_history == [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi"},
+        ]
+        assert [p.name for p in tmp_path.iterdir() if p.suffix == ".log"] == []
+
+    def test_resume_unknown_session_fails(self, reset_env, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that resuming a missing session raises a clear error."""
+        os.environ["OPENAI_API_KEY"] = "test-api-key"
+
+        with pytest.raises(ValueError, match="No saved chat session"):
+            InteractiveChat(test_mode=True, resume="", history_dir=str(tmp_path))
+        with pytest.raises(ValueError, match="'missing'"):
+            InteractiveChat(test_mode=True, resume="missing", history_dir=str(tmp_path))
@@ -1,6 +1,7 @@
 """Test cases for interfaces."""
 
 from abc import ABC
+from collections.abc import Sequence
 from zsh_ai_assistant.interfaces import AIServiceInterface, ChatHistoryInterface
 from zsh_ai_assistant.chat_history import InMemoryChatHistory
 from zsh_ai_assistant.ai_service import LangChainAIService
@@ -58,7 +59,7 @@ class TestInterfaces:
 
         # Test get_messages
         messages = chat_history.get_messages()
-        assert isinstance(messages, list)
+        assert isinstance(messages, Sequence)
         assert len(messages) == 2
 
         # Test clear
@@ -108,14 +109,13 @@ class TestInterfaces:
         assert params[1].annotation == str  # prompt parameter
         assert sig.return_annotation == str
 
-        # chat should take self and a list of dicts, return a string
+        # chat should take self and a sequence of messages, return a string
         sig = inspect.signature(AIServiceInterface.chat)
         params = list(sig.parameters.values())
         assert len(params) == 2  # self + messages
-        # The annotation should be List[dict] (or List[Dict[str, Any]])
-        # Check that it's a List type with dict as generic parameter
+        # The annotation should be Sequence[MessageLike]: messages or dicts
         assert hasattr(params[1].annotation, "__origin__")
-        assert params[1].annotation.__origin__ == list
+        assert params[1].annotation.__origin__ is Sequence
         assert sig.return_annotation == str
 
         # Check ChatHistoryInterface method signatures
@@ -133,14 +133,13 @@ class TestInterfaces:
         assert params[1].annotation == str  # message parameter
         assert sig.return_annotation is None
 
-        # get_messages should take self and return a list
+        # get_messages should take self and return a read-only sequence
         sig = inspect.signature(ChatHistoryInterface.get_messages)
         params = list(sig.parameters.values())
         assert len(params) == 1  # only self
-        # The annotation should be List[dict] (or List[Dict[str, Any]])
-        # Check that it's a List type with dict as generic parameter
+        # The annotation should be Sequence[BaseMessage]
         assert hasattr(sig.return_annotation, "__origin__")
-        assert sig.return_annotation.__origin__ == list
+        assert sig.return_annotation.__origin__ is Sequence
 
         # clear should take self and return None
         sig = inspect.signature(ChatHistoryInterface.clear)
@@ -287,9 +286,13 @@ class TestInterfaces:
         sig = inspect.signature(AIServiceInterface.chat)
         assert sig.return_annotation == str
         params = list(sig.parameters.values())
-        # messages parameter should be annotated with List[dict]
+        # messages parameter should be annotated with Sequence[MessageLike]
         assert hasattr(params[1].annotation, "__origin__")
-        assert params[1].annotation.__origin__ == list
+        assert params[1].annotation.__origin__ is Sequence
+
+        # AIServiceInterface.chat_stream takes the same messages
+        stream_sig = inspect.signature(AIServiceInterface.chat_stream)
+        assert list(stream_sig.parameters.values())[1].annotation == params[1].annotation
 
         # ChatHistoryInterface.add_user_message
         sig = inspect.signature(ChatHistoryInterface.add_user_message)
@@ -307,7 +310,7 @@ class TestInterfaces:
         sig = inspect.signature(ChatHistoryInterface.get_messages)
         assert sig.return_annotation is not None
         assert hasattr(sig.return_annotation, "__origin__")
-        assert sig.return_annotation.__origin__ == list
+        assert sig.return_annotation.__origin__ is Sequence
 
         # ChatHistoryInterface.clear
         sig = inspect.signature(ChatHistoryInterface.clear)
@@ -352,6 +355,12 @@ class TestInterfaces:
         interface_params = list(interface_sig.parameters.keys())
         assert concrete_params == interface_params
 
+        # Compare LangChainAIService.chat_stream with AIServiceInterface.chat_stream
+        concrete_sig = inspect.signature(LangChainAIService.chat_stream)
+        interface_sig = inspect.signature(AIServiceInterface.chat_stream)
+
+        assert concrete_sig == interface_sig
+
         # Compare InMemoryChatHistory methods with ChatHistoryInterface
         concrete_sig = inspect.signature(InMemoryChatHistory.add_user_message)
         interface_sig = inspect.signature(ChatHistoryInterface.add_user_message)
@@ -0,0 +1,49 @@
+"""Test cases for local language detection."""
+
+import pytest
+
+from zsh_ai_assistant.langdetect import detect, language_code, needs_no_translation
+
+
+class TestDetect:
+    """Test cases for detect function."""
+
+    @pytest.mark.parametrize(
+        "text,language",
+        [
+            ("これは日本語の文章です。", "ja"),
+            ("Git のブランチを切り替える", "ja"),
+            ("这是一个中文句子。", "zh"),
+            ("안녕하세요, 반갑습니다", "ko"),
+            ("Привет, как дела?", "ru"),
+            ("Привіт, як справи? Їжак", "uk"),
+            ("The file is in the directory and it was not changed", "en"),
+            ("El archivo está en el directorio y no es para los usuarios", "es"),
+            ("Die Datei ist in dem Verzeichnis und nicht auf der Platte", "de"),
+        ],
+    )
+    def test_languages(self, text: str, language: str) -> None:
+        """Test that scripts and function words identify the language."""
+        assert detect(text) == language
+
+    def test_unclear_text(self) -> None:
+        """Test that text without a clear signal has no language."""
+        assert detect("Hello world") is None
+        assert detect("2024-01-01 12:00:00") is None
+        assert detect("設定 settings options") is None
+
+
+class TestNeedsNoTranslation:
+    """Test cases for the passthrough check."""
+
+    def test_needs_no_translation(self) -> None:
+        """Test that text in the target language or without words is passed through."""
+        assert needs_no_translation("これは日本語です", "ja")
+        assert needs_no_translation("--- 42 ---", "ja")
+        assert not needs_no_translation("This is not Japanese", "ja")
+        assert not needs_no_translation("Hello", "en")
+
+    def test_language_code(self) -> None:
+        """Test that target language names map to codes."""
+        assert language_code("Japanese") == language_code("ja") == language_code("日本語") == "ja"
+        assert language_code("klingon") is None
@@ -0,0 +1,48 @@
+"""Test cases for latency tracking."""
+
+import time
+from unittest.mock import patch
+
+from zsh_ai_assistant.latency import LatencyTracker
+from zsh_ai_assistant.state import SharedStateFile
+
+
+class TestLatencyTracker:
+    """Test cases for LatencyTracker class."""
+
+    def test_record_computes_ewma(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that samples are folded into an exponentially weighted average."""
+        tracker = LatencyTracker(SharedStateFile(str(tmp_path / "latency.json")), alpha=0.5)
+
+        tracker.record("model@url", 100.0)
+        tracker.record("model@url", 300.0)
+
+        assert tracker.ewma("model@url") == 200.0
+        assert tracker.ewma("other@url") is None
+
+    def test_statistics_are_shared_between_trackers(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a new process sees samples recorded by an earlier one."""
+        path = str(tmp_path / "latency.json")
+        LatencyTracker(SharedStateFile(path)).record("model@url", 1500.0)
+
+        tracker = LatencyTracker(SharedStateFile(path))
+
+        assert tracker.ewma("model@url") == 1500.0
+        assert tracker.should_fall_back("model@url", 800.0) is True
+
+    def test_fast_target_is_kept(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a target within its SLO is not avoided."""
+        tracker = LatencyTracker(SharedStateFile(str(tmp_path / "latency.json")))
+        tracker.record("model@url", 200.0)
+
+        assert tracker.should_fall_back("model@url", 800.0) is False
+        assert tracker.should_fall_back("unknown@url", 800.0) is False
+
+    def test_slow_target_is_probed_after_interval(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a slow target is retried once the probe interval has passed."""
+        tracker = LatencyTracker(SharedStateFile(str(tmp_path / "latency.json")), probe_interval=60.0)
+        tracker.record("model@url", 5000.0)
+
+        assert tracker.should_fall_back("model@url", 800.0) is True
+        with patch("zsh_ai_assistant.latency.time.time", return_value=time.time() + 61):
+            assert tracker.should_fall_back("model@url", 800.0) is False
@@ -0,0 +1,79 @@
+"""Test cases for incremental markdown rendering."""
+
+from zsh_ai_assistant.markdown import (
+    BOLD,
+    BULLET,
+    CODE_BLOCK,
+    CODE_SPAN,
+    DEFAULT_COLOR,
+    DIM,
+    NORMAL_INTENSITY,
+    MarkdownRenderer,
+)
+
+SAMPLE = (
+    "# Title\n"
+    "Use `ls -la` to list.\n"
+    "\n"
+    "- first\n"
+    "  * nested `item`\n"
+    "2. second\n"
+    "```bash\n"
+    "echo `date`\n"
+    "# not a heading\n"
+    "```\n"
+    "#hashtag and **text**"
+)
+
+
+def _render(text: str, size: int) -> str:
+    renderer = MarkdownRenderer()
+    out = "".join(renderer.feed(text[i : i + size]) for i in range(0, len(text), size))
+    return out + renderer.finish()
+
+
+class TestMarkdownRenderer:
+    """Test cases for MarkdownRenderer class."""
+
+    def test_renders_blocks_and_inline_code(self) -> None:
+        """Test the styling of each supported element."""
+        assert _render(SAMPLE, len(SAMPLE)) == (
+            f"{BOLD}Title{NORMAL_INTENSITY}\n"
+            f"Use {CODE_SPAN}ls -la{DEFAULT_COLOR} to list.\n"
+            "\n"
+            f"{BULLET} first\n"
+            f"  {BULLET} nested {CODE_SPAN}item{DEFAULT_COLOR}\n"
+            f"{BOLD}2. {NORMAL_INTENSITY}second\n"
+            f"{DIM}```bash{NORMAL_INTENSITY}\n"
+            f"{CODE_BLOCK}echo `date`{DEFAULT_COLOR}\n"
+            f"{CODE_BLOCK}# not a heading{DEFAULT_COLOR}\n"
+            f"{DIM}```{NORMAL_INTENSITY}\n"
+            "#hashtag and **text**"
+        )
+
+    def test_output_does_not_depend_on_chunking(self) -> None:
+        """Test that any split of the stream renders the same text."""
+        expected = _render(SAMPLE, len(SAMPLE))
+
+        for size in range(1, 12):
+            assert _render(SAMPLE, size) == expected, size
+
+    def test_plain_text_is_not_held_back(self) -> None:
+        """Test that text is emitted as soon as the line kind is known."""
+        renderer = MarkdownRenderer()
+
+        assert renderer.feed("Hel") == "Hel"
+        assert renderer.feed("lo") == "lo"
+        assert renderer.feed("\n#") == "\n"
+        assert renderer.feed("# Sub") == f"{BOLD}Sub"
+        assert renderer.finish() == NORMAL_INTENSITY
+
+    def test_unterminated_styles_are_closed(self) -> None:
+        """Test that finish resets an open code span and code block."""
+        renderer = MarkdownRenderer()
+        renderer.feed("```\ncode")
+
+        assert renderer.finish() == DEFAULT_COLOR
+        renderer = MarkdownRenderer()
+        renderer.feed("a `span")
+        assert renderer.finish() == DEFAULT_COLOR
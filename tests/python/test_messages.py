@@ -0,0 +1,154 @@
+"""Test cases for lightweight chat messages."""
+
+import json
+import sys
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+
+from zsh_ai_assistant.messages import (
+    AIMessage,
+    ConversionCache,
+    HumanMessage,
+    MessageView,
+    Role,
+    SystemMessage,
+    to_langchain_messages,
+    to_message,
+    to_openai_messages,
+)
+
+
+class TestMessages:
+    """Test cases for message classes and conversions."""
+
+    def test_messages_compare_by_type_and_content(self) -> None:
+        """Test message equality."""
+        assert HumanMessage(content="Hi") == HumanMessage("Hi")
+        assert HumanMessage(content="Hi") != AIMessage(content="Hi")
+        assert repr(SystemMessage(content="Be brief")) == "SystemMessage(content='Be brief')"
+
+    def test_multi_part_messages_are_hashable(self) -> None:
+        """Test that messages with content parts hash like equal messages."""
+        parts: List[Dict[str, Any]] = [
+            {"type": "text", "text": "What is this?"},
+            {"type": "image_url", "image_url": {"url": "a.png"}},
+        ]
+        first, second = HumanMessage(parts), HumanMessage([dict(part) for part in parts])
+
+        assert first == second
+        assert hash(first) == hash(second)
+        assert len({first, second, HumanMessage("What is this?")}) == 2
+
+    def test_to_openai_messages(self) -> None:
+        """Test conversion to OpenAI API dictionaries."""
+        messages = [SystemMessage(content="s"), HumanMessage(content="h"), AIMessage(content="a")]
+
+        assert to_openai_messages(messages) == [
+            {"role": "system", "content": "s"},
+            {"role": "user", "content": "h"},
+            {"role": "assistant", "content": "a"},
+        ]
+
+    def test_to_langchain_messages(self) -> None:
+        """Test conversion to LangChain messages."""
+        from langchain_core.messages import AIMessage as LCAIMessage, HumanMessage as LCHumanMessage
+
+        converted = to_langchain_messages([HumanMessage(content="h"), AIMessage(content="a")])
+
+        assert converted == [LCHumanMessage(content="h"), LCAIMessage(content="a")]
+
+
+class TestMessagesAsDictionaries:
+    """Test cases for reading messages like OpenAI message dictionaries."""
+
+    def test_messages_read_and_compare_like_dictionaries(self) -> None:
+        """Test item access, get and equality with dictionaries."""
+        message = HumanMessage("Hello")
+
+        assert message["role"] == "user"
+        assert message["role"] is Role.USER
+        assert message.get("content") == "Hello"
+        assert message.get("name", "none") == "none"
+        assert message == {"role": "user", "content": "Hello"}
+        assert message != {"role": "assistant", "content": "Hello"}
+        assert json.dumps(message.to_dict()) == '{"role": "user", "content": "Hello"}'
+        with pytest.raises(KeyError):
+            message["name"]
+
+    def test_messages_are_compact(self) -> None:
+        """Test that a message takes less than half the memory of a dictionary."""
+        message = AIMessage("Hi")
+
+        assert not hasattr(message, "__dict__")
+        assert sys.getsizeof(message) * 2 < sys.getsizeof({"role": "assistant", "content": "Hi"})
+
+    def test_to_message(self) -> None:
+        """Test conversion from dictionaries using OpenAI roles or LangChain types."""
+        message = AIMessage("a")
+
+        assert to_message(message) is message
+        assert to_message({"role": "assistant", "content": "a"}) == message
+        assert to_message({"role": "human", "content": "h"}) == HumanMessage("h")
+        with pytest.raises(ValueError, match="Unknown message role"):
+            to_message({"role": "tool", "content": "t"})
+
+
+class TestMessageView:
+    """Test cases for read-only message snapshots."""
+
+    def test_view_is_a_fixed_snapshot(self) -> None:
+        """Test that messages appended after the snapshot are not visible."""
+        messages = [HumanMessage("q"), AIMessage("a")]
+        view = MessageView(messages, 2)
+        messages.append(HumanMessage("later"))
+
+        assert len(view) == 2
+        assert list(view) == [HumanMessage("q"), AIMessage("a")]
+        assert view[-1] == AIMessage("a")
+        assert view[1:] == [AIMessage("a")]
+        assert view == [{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}]
+        with pytest.raises(IndexError):
+            view[2]
+
+
+class TestConversionCache:
+    """Test cases for incremental conversion of message lists."""
+
+    def test_only_new_messages_are_converted(self) -> None:
+        """Test that a list extending the previous one converts only its new messages."""
+        convert = Mock(side_effect=lambda message: message.content.upper())
+        cache = ConversionCache(convert)
+        history = [HumanMessage("q"), AIMessage("a")]
+
+        assert cache(history) == ["Q", "A"]
+        history.append(HumanMessage("next"))
+        assert cache(history) == ["Q", "A", "NEXT"]
+        assert convert.call_count == 3
+
+    def test_diverging_list_is_converted_from_where_it_diverges(self) -> None:
+        """Test that messages after the shared prefix are converted again."""
+        convert = Mock(side_effect=lambda message: message.content)
+        cache = ConversionCache(convert)
+        question = HumanMessage("q")
+        cache([question, AIMessage("a"), HumanMessage("b")])
+
+        assert cache([question, AIMessage("c")]) == ["q", "c"]
+        assert cache([HumanMessage("other")]) == ["other"]
+        assert convert.call_count == 5
+
+    def test_dropped_and_counted_messages(self) -> None:
+        """Test that messages converted to None are dropped and matches are counted."""
+        cache = ConversionCache(
+            lambda message: None if message["role"] == "tool" else message["content"],
+            counted=lambda converted: converted.startswith("!"),
+        )
+        messages = [
+            {"role": "system", "content": "!s"},
+            {"role": "tool", "content": "t"},
+            {"role": "user", "content": "u"},
+        ]
+
+        assert cache.convert(messages) == (["!s", "u"], 1)
+        assert cache.convert(messages[1:]) == (["u"], 0)
@@ -0,0 +1,143 @@
+"""Test cases for streamed terminal output."""
+
+import io
+import threading
+import time
+from typing import Iterator, List
+
+from zsh_ai_assistant.output import CoalescingWriter
+
+
+class _Clock:
+    """Manually advanced clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Stream(io.StringIO):
+    """String stream recording each write."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: List[str] = []
+
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        return super().write(text)
+
+
+class TestCoalescingWriter:
+    """Test cases for CoalescingWriter class."""
+
+    def test_fast_chunks_are_coalesced_into_frames(self) -> None:
+        """Test that chunks arriving within the interval are written together."""
+        clock, stream = _Clock(), _Stream()
+        writer = CoalescingWriter(stream, interval=0.016, clock=clock)
+
+        for i in range(10):
+            clock.now += 0.002
+            writer.write(f"t{i} ")
+        writer.flush()
+
+        assert stream.getvalue() == "".join(f"t{i} " for i in range(10))
+        assert stream.chunks == ["t0 t1 t2 t3 t4 t5 t6 t7 ", "t8 t9 "]
+
+    def test_slow_chunks_are_written_immediately(self) -> None:
+        """Test that a slow stream is not delayed."""
+        clock, stream = _Clock(), _Stream()
+        writer = CoalescingWriter(stream, interval=0.016, clock=clock)
+
+        for token in ["a", "b", "c"]:
+            clock.now += 0.05
+            writer.write(token)
+
+        assert stream.chunks == ["a", "b", "c"]
+
+    def test_size_threshold(self) -> None:
+        """Test that a large amount of pending text is written without waiting."""
+        stream = _Stream()
+        writer = CoalescingWriter(stream, max_buffered=8, clock=_Clock())
+
+        writer.write("1234")
+        writer.write("5678")
+        writer.write("9")
+
+        assert stream.chunks == ["12345678"]
+
+    def test_adaptive_mode_writes_complete_lines(self) -> None:
+        """Test that a newline triggers a write in adaptive mode."""
+        stream = _Stream()
+        writer = CoalescingWriter(stream, flush_on_newline=True, clock=_Clock())
+
+        writer.write("Hello")
+        writer.write(" world\n")
+        writer.write("Next")
+
+        assert stream.chunks == ["Hello world\n"]
+        assert writer.writes == 1
+
+    def test_context_manager_flushes_on_exit(self) -> None:
+        """Test that pending text is written when the block ends, even on error."""
+        stream = _Stream()
+        try:
+            with CoalescingWriter(stream, clock=_Clock()) as writer:
+                writer.write("partial")
+                raise RuntimeError("stream broke")
+        except RuntimeError:
+            pass
+
+        assert stream.getvalue() == "partial"
+
+    def test_zero_interval_writes_every_chunk(self) -> None:
+        """Test that coalescing can be disabled."""
+        stream = _Stream()
+        writer = CoalescingWriter(stream, interval=0, clock=_Clock())
+
+        writer.write("a")
+        writer.write("b")
+
+        assert stream.chunks == ["a", "b"]
+
+    def test_pending_text_is_written_when_the_stream_stalls(self) -> None:
+        """Test that text already received is written after max_latency while no chunk arrives."""
+        stream = _Stream()
+        resume = threading.Event()
+
+        def stalled() -> Iterator[str]:
+            yield "Hello"
+            yield " wor"
+            resume.wait(5)
+            yield "ld"
+
+        with CoalescingWriter(stream, interval=10, max_latency=0.02) as writer:
+            chunks = stalled()
+            for chunk in chunks:
+                writer.write(chunk)
+                if chunk == " wor":
+                    break
+            deadline = time.monotonic() + 2
+            while not stream.chunks and time.monotonic() < deadline:
+                time.sleep(0.005)
+            assert stream.chunks == ["Hello wor"]
+
+            resume.set()
+            for chunk in chunks:
+                writer.write(chunk)
+
+        assert stream.getvalue() == "Hello world"
+
+    def test_no_background_writes_without_max_latency(self) -> None:
+        """Test that pending text waits for the next chunk when max_latency is not set."""
+        stream = _Stream()
+        writer = CoalescingWriter(stream, interval=10)
+
+        writer.write("pending")
+        time.sleep(0.05)
+
+        assert stream.chunks == []
+        writer.close()
+        assert stream.chunks == ["pending"]
@@ -0,0 +1,129 @@
+"""Test cases for the host-wide rate limiter."""
+
+import subprocess
+import sys
+from typing import Callable, List, Optional
+
+import pytest
+
+from zsh_ai_assistant import ratelimit
+from zsh_ai_assistant.ratelimit import HEADER, SLOT, RateLimiter, estimate_tokens
+
+
+class FakeClock:
+    """Clock advanced only by sleeping."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+        self.on_sleep: Optional[Callable[[], None]] = None
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+        if self.on_sleep is not None:
+            self.on_sleep()
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:  # type: ignore[no-untyped-def]
+    """Replace the limiter's clock with a fake one."""
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "time", fake.time)
+    monkeypatch.setattr(ratelimit.time, "sleep", fake.sleep)
+    return fake
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter class."""
+
+    def test_requests_per_second(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that a burst of one second's worth passes and further requests wait."""
+        limiter = RateLimiter(str(tmp_path / "limits"), requests_per_second=2)
+
+        limiter.acquire("command", 10)
+        limiter.acquire("command", 10)
+        assert clock.sleeps == []
+
+        limiter.acquire("command", 10)
+        assert sum(clock.sleeps) == pytest.approx(0.5)
+
+    def test_limits_are_shared_between_processes(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that limiters using the same file draw from the same buckets."""
+        path = str(tmp_path / "limits")
+        RateLimiter(path, requests_per_second=1).acquire("chat", 10)
+
+        RateLimiter(path, requests_per_second=1).acquire("chat", 10)
+
+        assert sum(clock.sleeps) == pytest.approx(1.0)
+
+    def test_tokens_per_minute_and_refund(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that requests wait for tokens and unused tokens are refunded."""
+        limiter = RateLimiter(str(tmp_path / "limits"), tokens_per_minute=600)
+        lease = limiter.acquire("translate", 500)
+        limiter.release(lease, used_tokens=100)
+
+        # Without the refund only 100 tokens would be left
+        limiter.acquire("translate", 500)
+        assert clock.sleeps == []
+        limiter.acquire("translate", 300)
+        assert sum(clock.sleeps) == pytest.approx(30.0)
+
+    def test_max_in_flight(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that a request waits for a free slot."""
+        limiter = RateLimiter(str(tmp_path / "limits"), max_in_flight=1)
+        first = limiter.acquire("chat", 10)
+        clock.on_sleep = lambda: limiter.release(first)
+
+        second = limiter.acquire("chat", 10)
+
+        assert len(clock.sleeps) == 1
+        assert second.slot == first.slot == 0
+
+    def test_slots_of_exited_processes_are_reclaimed(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that a crashed process does not hold its slot forever."""
+        path = tmp_path / "limits"
+        limiter = RateLimiter(str(path), max_in_flight=1)
+        limiter.release(limiter.acquire("chat", 10))
+        exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+        data = bytearray(path.read_bytes())
+        SLOT.pack_into(data, HEADER.size, int(exited.stdout))
+        path.write_bytes(bytes(data))
+
+        limiter.acquire("chat", 10)
+
+        assert clock.sleeps == []
+
+    def test_bulk_requests_leave_the_last_slot(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that translations cannot take the last slot but commands can."""
+        limiter = RateLimiter(str(tmp_path / "limits"), max_in_flight=2)
+        bulk = limiter.acquire("translate", 10)
+
+        command = limiter.acquire("command", 10)
+        assert clock.sleeps == []
+
+        limiter.release(command)
+        clock.on_sleep = lambda: limiter.release(bulk)
+        limiter.acquire("translate", 10)
+        assert len(clock.sleeps) == 1
+
+    def test_waiting_interactive_requests_hold_bulk_back(self, tmp_path, clock) -> None:  # type: ignore[no-untyped-def]
+        """Test that bulk requests wait while an interactive request is waiting."""
+        path = str(tmp_path / "limits")
+        interactive = RateLimiter(path, requests_per_second=1)
+        interactive.acquire("chat", 10)
+        # The second chat request waits a second for the bucket to refill
+        interactive.acquire("chat", 10)
+        clock.sleeps.clear()
+
+        RateLimiter(path).acquire("translate", 10)
+
+        assert clock.sleeps == [ratelimit.POLL_INTERVAL]
+
+    def test_estimate_tokens(self) -> None:
+        """Test the rough token estimate."""
+        assert estimate_tokens(0) == 1
+        assert estimate_tokens(400) == 101
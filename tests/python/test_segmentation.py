@@ -0,0 +1,126 @@
+"""Test cases for splitting text into segments."""
+
+import os
+import threading
+import time
+from typing import Iterator
+
+from zsh_ai_assistant.segmentation import byte_segments, read_segments, split_runs, split_segments
+
+
+class TestSplitSegments:
+    """Test cases for split_segments function."""
+
+    def test_paragraphs_and_whitespace(self) -> None:
+        """Test that paragraphs are split on blank lines and whitespace is kept apart."""
+        text = "\n  First line\nsecond line\n\n \n\tSecond paragraph.  \n"
+
+        segments = split_segments(text)
+
+        assert [segment.text for segment in segments] == ["First line\nsecond line", "Second paragraph."]
+        assert "".join(segment.render(segment.text) for segment in segments) == text
+        assert segments[0].before == "\n  "
+        assert segments[1].render("Zweiter Absatz.") == "Zweiter Absatz.  \n"
+
+    def test_whitespace_only(self) -> None:
+        """Test that empty and blank texts give one empty segment."""
+        assert [segment.text for segment in split_segments("")] == [""]
+        assert [(segment.text, segment.after) for segment in split_segments(" \n")] == [("", " \n")]
+
+
+class TestSplitRuns:
+    """Test cases for split_runs function."""
+
+    def test_runs_of_lines(self) -> None:
+        """Test that consecutive lines with the same result form one run."""
+        (paragraph,) = split_segments("  keep 1\nkeep 2\n  send 3\nkeep 4\n\n")
+
+        runs = split_runs(paragraph, lambda line: "send" not in line)
+
+        assert [(run.text, kept) for run, kept in runs] == [
+            ("keep 1\nkeep 2", True),
+            ("send 3", False),
+            ("keep 4", True),
+        ]
+        assert "".join(run.render(run.text) for run, _ in runs) == "  keep 1\nkeep 2\n  send 3\nkeep 4\n\n"
+
+    def test_lines_without_letters_stay_with_their_run(self) -> None:
+        """Test that fences, rules and numbers do not split the lines around them into runs."""
+        text = "```\nsend 1\n---\nsend 2\n```\n42\nkeep 3\n```\nsend 4\n```"
+        (paragraph,) = split_segments(text)
+
+        runs = split_runs(paragraph, lambda line: "send" not in line)
+
+        assert [(run.text, kept) for run, kept in runs] == [
+            ("```\nsend 1\n---\nsend 2\n```\n42", False),
+            ("keep 3", True),
+            ("```\nsend 4\n```", False),
+        ]
+        assert "".join(run.render(run.text) for run, _ in runs) == text
+
+    def test_paragraph_kept_as_a_whole(self) -> None:
+        """Test that a paragraph kept as a whole is not split by its lines."""
+        (paragraph,) = split_segments("first\nsecond")
+
+        assert split_runs(paragraph, lambda text: "\n" in text) == [(paragraph, True)]
+
+
+class TestReadSegments:
+    """Test cases for read_segments function."""
+
+    def _read(self, *writes: bytes, pause: float = 0.0, **limits: int) -> Iterator[str]:
+        """Yield the segments of input written to a pipe in several writes."""
+        read_fd, write_fd = os.pipe()
+
+        def write() -> None:
+            for data in writes:
+                os.write(write_fd, data)
+                time.sleep(pause)
+            os.close(write_fd)
+
+        threading.Thread(target=write, daemon=True).start()
+        try:
+            yield from read_segments(read_fd, idle_timeout=0.05, **limits)
+        finally:
+            os.close(read_fd)
+
+    def test_cut_at_paragraphs_and_end_of_input(self) -> None:
+        """Test that paragraphs are cut as soon as they are complete."""
+        text = "First paragraph.\n\nSecond ".encode() + "paragraph, 日本語".encode()[:-1]
+
+        segments = list(self._read(text, "語".encode()[-1:] + b"\n"))
+
+        assert segments == ["First paragraph.\n\n", "Second paragraph, 日本語\n"]
+
+    def test_cut_when_input_pauses(self) -> None:
+        """Test that buffered lines are yielded when no more input arrives for a while."""
+        segments = list(self._read(b"log line 1\nlog line 2\n", b"log line 3\n", pause=0.2))
+
+        assert segments == ["log line 1\nlog line 2\n", "log line 3\n"]
+
+    def test_cut_at_sentences_and_size(self) -> None:
+        """Test that long input is cut at sentence ends, or line breaks once too long."""
+        text = b"One. Two.\nThree\nfour\nfive six seven"
+
+        segments = list(self._read(text, min_chars=5, max_chars=16))
+
+        assert segments == ["One. Two.\n", "Three\nfour\n", "five six seven"]
+
+
+class TestByteSegments:
+    """Test cases for byte_segments function."""
+
+    def test_paragraphs_and_long_lines(self) -> None:
+        """Test that ranges cover the data and long paragraphs are cut at lines, then characters."""
+        data = "one\n\n\ntwo two\nthree\n".encode() + "日本語です".encode()
+
+        ranges = list(byte_segments(data, max_bytes=10))
+
+        assert [data[start:end].decode() for start, end in ranges] == [
+            "one\n\n\n",
+            "two two\n",
+            "three\n",
+            "日本語",
+            "です",
+        ]
+        assert list(byte_segments(data, start=ranges[2][0], max_bytes=10)) == ranges[2:]
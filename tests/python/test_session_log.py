@@ -0,0 +1,178 @@
+"""Test cases for append-only chat session logs."""
+
+import os
+
+import pytest
+
+from zsh_ai_assistant.session_log import (
+    HEADER,
+    OFFSET,
+    LogChatHistory,
+    latest_session,
+    list_sessions,
+    new_session_id,
+    session_exists,
+)
+
+
+def _write_session(directory: str, session_id: str, turns: int) -> None:
+    """Store ``turns`` question and answer pairs in a session."""
+    with LogChatHistory(directory, session_id) as history:
+        for i in range(turns):
+            history.add_user_message(f"question {i}")
+            history.add_ai_message(f"answer {i}")
+
+
+class TestLogChatHistory:
+    """Test cases for LogChatHistory class."""
+
+    def test_messages_survive_reopening(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that messages are read back in order after the session is closed."""
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("Hello")
+            history.add_ai_message("Hi there! 日本語")
+            assert history.get_messages() == [
+                {"role": "user", "content": "Hello"},
+                {"role": "assistant", "content": "Hi there! 日本語"},
+            ]
+
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            assert len(history) == 2
+            assert history.get_messages()[1] == {"role": "assistant", "content": "Hi there! 日本語"}
+
+    def test_append_writes_one_record_and_index_entry(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test the on-disk layout: length-prefixed records and fixed-size offsets."""
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("a")
+            log_size = os.path.getsize(history.log_path)
+            history.add_ai_message("b")
+
+            assert os.path.getsize(history.index_path) == 2 * OFFSET.size
+            with open(history.index_path, "rb") as f:
+                assert [offset for (offset,) in OFFSET.iter_unpack(f.read())] == [0, log_size]
+            with open(history.log_path, "rb") as f:
+                length, _ = HEADER.unpack(f.read(HEADER.size))
+                assert length == log_size - HEADER.size
+
+    def test_window_loads_only_the_tail(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the context window holds the last messages plus new ones."""
+        _write_session(str(tmp_path), "s1", 5)
+
+        with LogChatHistory(str(tmp_path), "s1", window=4) as history:
+            history.add_user_message("question 5")
+            messages = history.get_messages()
+            assert [m["content"] for m in messages] == [
+                "question 3",
+                "answer 3",
+                "question 4",
+                "answer 4",
+                "question 5",
+            ]
+            assert history.read(0, 2) == [
+                {"role": "user", "content": "question 0"},
+                {"role": "assistant", "content": "answer 0"},
+            ]
+            assert len(history) == 11
+
+    def test_window_does_not_start_with_an_answer(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that an answer cut off from its question is left out of the window."""
+        _write_session(str(tmp_path), "s1", 3)
+
+        with LogChatHistory(str(tmp_path), "s1", window=3) as history:
+            assert [m["content"] for m in history.get_messages()] == ["question 2", "answer 2"]
+
+    def test_get_messages_returns_a_snapshot(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the returned window is read-only and does not grow later."""
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("Hello")
+            messages = history.get_messages()
+            history.add_ai_message("Hi")
+
+            assert not hasattr(messages, "append")
+            assert len(messages) == 1
+            assert len(history.get_messages()) == 2
+
+    def test_clear_deletes_stored_messages(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that clear empties the session on disk."""
+        _write_session(str(tmp_path), "s1", 2)
+
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            history.clear()
+            assert not history
+            assert history.get_messages() == []
+
+        assert not session_exists(str(tmp_path), "s1")
+
+    def test_invalid_session_id_is_rejected(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that session ids cannot point outside the sessions directory."""
+        with pytest.raises(ValueError):
+            LogChatHistory(str(tmp_path), "../escape")
+
+
+class TestLogChatHistoryRecovery:
+    """Test cases for repairing sessions after an interrupted append."""
+
+    def test_torn_record_is_truncated(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a half-written record at the end of the log is dropped."""
+        _write_session(str(tmp_path), "s1", 1)
+        log_path = tmp_path / "s1.log"
+        size = os.path.getsize(log_path)
+        with open(log_path, "ab") as f:
+            f.write(HEADER.pack(100, 0) + b'{"role"')
+
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            assert len(history) == 2
+            assert os.path.getsize(log_path) == size
+            history.add_user_message("after")
+            assert history.get_messages()[-1] == {"role": "user", "content": "after"}
+
+    def test_unindexed_record_is_indexed(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a record written without its index entry is recovered."""
+        _write_session(str(tmp_path), "s1", 1)
+        index_path = tmp_path / "s1.idx"
+        with open(index_path, "r+b") as f:
+            f.truncate(OFFSET.size + 3)
+
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            assert [m["content"] for m in history.get_messages()] == ["question 0", "answer 0"]
+        assert os.path.getsize(index_path) == 2 * OFFSET.size
+
+    def test_index_past_the_log_is_dropped(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that index entries whose records were lost are removed."""
+        _write_session(str(tmp_path), "s1", 1)
+        with open(tmp_path / "s1.idx", "ab") as f:
+            f.write(OFFSET.pack(10_000))
+
+        with LogChatHistory(str(tmp_path), "s1") as history:
+            assert len(history) == 2
+
+
+class TestSessionListing:
+    """Test cases for finding stored sessions."""
+
+    def test_list_sessions_most_recent_first(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that sessions are listed newest first with their first question as title."""
+        _write_session(str(tmp_path), "old", 1)
+        _write_session(str(tmp_path), "new", 2)
+        os.utime(tmp_path / "old.log", (1, 1))
+        LogChatHistory(str(tmp_path), "empty").close()
+
+        sessions = list_sessions(str(tmp_path))
+
+        assert [(s.session_id, s.messages, s.title) for s in sessions] == [
+            ("new", 4, "question 0"),
+            ("old", 2, "question 0"),
+        ]
+        assert latest_session(str(tmp_path)) == "new"
+
+    def test_missing_directory_has_no_sessions(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that listing a directory that does not exist yet is empty."""
+        assert list_sessions(str(tmp_path / "missing")) == []
+        assert latest_session(str(tmp_path / "missing")) is None
+
+    def test_new_session_ids_are_unique_and_valid(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that generated ids can be used as session file names."""
+        first, second = new_session_id(), new_session_id()
+
+        assert first != second
+        LogChatHistory(str(tmp_path), first).close()
@@ -0,0 +1,159 @@
+"""Test cases for single-flight request coalescing."""
+
+import os
+import subprocess
+import sys
+import threading
+from typing import Iterator, List
+
+import pytest
+
+from zsh_ai_assistant.singleflight import SingleFlight, SingleFlightError, normalize_prompt, request_key
+
+FOLLOWER = """
+import sys
+from zsh_ai_assistant.singleflight import SingleFlight
+for chunk in SingleFlight(sys.argv[1]).stream("key", lambda: iter(["own request"])):
+    print(chunk, flush=True)
+"""
+
+
+class TestRequestKey:
+    """Test cases for request keys."""
+
+    def test_prompts_differing_in_spacing_share_a_key(self) -> None:
+        """Test that normalized prompts give the same key and other parameters do not."""
+        key = request_key("command", "gpt-4", normalize_prompt("list  files\n"))
+
+        assert key == request_key("command", "gpt-4", normalize_prompt(" list files"))
+        assert key != request_key("command", "gpt-4o", normalize_prompt("list files"))
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight class."""
+
+    def _leader(self, release: threading.Event, chunks: List[str]) -> Iterator[str]:
+        yield chunks[0]
+        release.wait(5)
+        yield from chunks[1:]
+
+    def _follow(self, flight: SingleFlight, attached: threading.Event, results: List[str]) -> None:
+        for chunk in flight.stream("key", lambda: iter(["own request"])):
+            results.append(chunk)
+            attached.set()
+
+    def test_single_caller_makes_the_request(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a lone caller gets its own response and leaves no files behind."""
+        flight = SingleFlight(str(tmp_path))
+
+        assert flight.call("key", lambda: "ls -la") == "ls -la"
+        assert os.listdir(tmp_path) == []
+
+    def test_followers_share_the_leaders_stream(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that concurrent identical callers receive every chunk of one request."""
+        flight = SingleFlight(str(tmp_path))
+        attached, release = threading.Event(), threading.Event()
+        leader = flight.stream("key", lambda: self._leader(release, ["Hello", ", ", "world"]))
+        assert next(leader) == "Hello"
+        results: List[str] = []
+        follower = threading.Thread(target=self._follow, args=(flight, attached, results))
+        follower.start()
+        assert attached.wait(5)
+        release.set()
+        assert list(leader) == [", ", "world"]
+        follower.join(5)
+
+        assert results == ["Hello", ", ", "world"]
+
+    def test_followers_in_other_processes(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a caller in another process follows the in-flight request."""
+        flight = SingleFlight(str(tmp_path))
+        release = threading.Event()
+        leader = flight.stream("key", lambda: self._leader(release, ["shared", "request"]))
+        next(leader)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        follower = subprocess.Popen(
+            [sys.executable, "-c", FOLLOWER, str(tmp_path)], stdout=subprocess.PIPE, text=True, env=env
+        )
+        assert follower.stdout is not None
+        first = follower.stdout.readline()
+        release.set()
+        list(leader)
+        rest, _ = follower.communicate(timeout=10)
+
+        assert (first + rest).split() == ["shared", "request"]
+
+    def test_leader_errors_reach_followers(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that followers fail with the leader's error message."""
+        flight = SingleFlight(str(tmp_path))
+        attached, release = threading.Event(), threading.Event()
+
+        def produce() -> Iterator[str]:
+            yield "partial"
+            release.wait(5)
+            raise ConnectionError("backend unreachable")
+
+        leader = flight.stream("key", produce)
+        next(leader)
+        errors: List[Exception] = []
+
+        def follow() -> None:
+            try:
+                self._follow(flight, attached, [])
+            except SingleFlightError as e:
+                errors.append(e)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        assert attached.wait(5)
+        release.set()
+        with pytest.raises(ConnectionError):
+            list(leader)
+        follower.join(5)
+
+        assert [str(e) for e in errors] == ["backend unreachable"]
+
+    def test_abandoned_request_is_retried(self, tmp_path, monkeypatch) -> None:  # type: ignore[no-untyped-def]
+        """Test that a follower that received nothing makes the request itself."""
+        flight = SingleFlight(str(tmp_path))
+        started, release, waiting = threading.Event(), threading.Event(), threading.Event()
+        leader_gone = flight._leader_gone
+
+        def check_leader(lock_path: str, stream_path: str, stream_fd: int) -> bool:
+            waiting.set()
+            return leader_gone(lock_path, stream_path, stream_fd)
+
+        monkeypatch.setattr(flight, "_leader_gone", check_leader)
+
+        def crash() -> Iterator[str]:
+            started.set()
+            release.wait(5)
+            # Not an Exception, so no error record is written, as if the process died
+            raise KeyboardInterrupt
+            yield ""
+
+        def lead() -> None:
+            with pytest.raises(KeyboardInterrupt):
+                flight.call("key", lambda: "".join(crash()))
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait(5)
+        results: List[str] = []
+        follower = threading.Thread(target=lambda: results.append(flight.call("key", lambda: "own request")))
+        follower.start()
+        assert waiting.wait(5)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        assert results == ["own request"]
+
+    def test_stale_files_are_replaced(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that files left behind by a crashed leader do not block new requests."""
+        flight = SingleFlight(str(tmp_path))
+        open(os.path.join(str(tmp_path), "key.stream"), "wb").close()
+        open(os.path.join(str(tmp_path), "key.lock"), "wb").close()
+
+        assert flight.call("key", lambda: "own request") == "own request"
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,161 @@
+"""Test cases for the SQLite chat history and its full-text search."""
+
+import time
+
+from zsh_ai_assistant.session_log import LogChatHistory
+from zsh_ai_assistant.sqlite_history import (
+    SQLiteChatHistory,
+    connect,
+    import_logs,
+    latest_session,
+    list_sessions,
+    search,
+    session_exists,
+)
+
+
+class TestSQLiteChatHistory:
+    """Test cases for SQLiteChatHistory class."""
+
+    def test_messages_survive_reopening(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that messages are read back in order after the session is closed."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("Hello")
+            history.add_ai_message("Hi there! 日本語")
+            assert len(history) == 2
+
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            assert len(history) == 2
+            assert history.get_messages() == [
+                {"role": "user", "content": "Hello"},
+                {"role": "assistant", "content": "Hi there! 日本語"},
+            ]
+
+    def test_messages_are_written_in_batches(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that buffered messages reach the database once the batch is full."""
+        with SQLiteChatHistory(str(tmp_path), "s1", batch_size=3) as history:
+            history.add_user_message("one")
+            history.add_ai_message("two")
+            assert not session_exists(str(tmp_path), "s1")
+            history.add_user_message("three")
+            assert session_exists(str(tmp_path), "s1")
+            history.add_ai_message("four")
+
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            assert len(history) == 4
+
+    def test_window_loads_only_the_tail(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that the context window holds the last messages plus new ones."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            for i in range(3):
+                history.add_user_message(f"question {i}")
+                history.add_ai_message(f"answer {i}")
+
+        with SQLiteChatHistory(str(tmp_path), "s1", window=3) as history:
+            history.add_user_message("question 3")
+            assert [m["content"] for m in history.get_messages()] == ["question 2", "answer 2", "question 3"]
+            assert len(history) == 7
+
+    def test_clear_deletes_the_session(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that clear removes the messages and their search entries."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("awk one-liner")
+            history.flush()
+            history.clear()
+            assert history.get_messages() == []
+
+        assert not session_exists(str(tmp_path), "s1")
+        assert search(str(tmp_path), "awk") == []
+
+
+class TestSessionListing:
+    """Test cases for finding sessions in the database."""
+
+    def test_list_sessions_most_recent_first(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that sessions are listed newest first with their first question as title."""
+        for session_id in ("old", "new"):
+            with SQLiteChatHistory(str(tmp_path), session_id) as history:
+                history.add_user_message(f"{session_id} question\nmore")
+                history.add_ai_message("answer")
+            time.sleep(0.01)
+
+        sessions = list_sessions(str(tmp_path))
+
+        assert [(s.session_id, s.messages, s.title) for s in sessions] == [
+            ("new", 2, "new question"),
+            ("old", 2, "old question"),
+        ]
+        assert latest_session(str(tmp_path)) == "new"
+
+    def test_missing_database_has_no_sessions(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that nothing is created when there is no database yet."""
+        assert list_sessions(str(tmp_path)) == []
+        assert search(str(tmp_path), "anything") == []
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestSearch:
+    """Test cases for full-text search."""
+
+    def test_results_are_ranked(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that messages mentioning the words more often rank first."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            history.add_user_message("How do I print the second column?")
+            history.add_ai_message("Use awk: awk '{print $2}' file. awk splits on whitespace.")
+            history.add_user_message("And with cut?")
+            history.add_ai_message("cut -d' ' -f2 file, or awk again")
+
+        results = search(str(tmp_path), "awk")
+
+        assert [r.snippet.count("[awk]") for r in results] == [3, 1]
+        assert results[0].session_id == "s1"
+        assert results[0].role == "assistant"
+
+    def test_all_words_must_match_and_syntax_is_literal(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that every word is required and FTS operators are not interpreted."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            history.add_ai_message("find . -name '*.py' -delete")
+            history.add_ai_message("find . -type f")
+
+        assert len(search(str(tmp_path), "find delete")) == 1
+        assert len(search(str(tmp_path), 'find AND "name')) == 0
+        assert len(search(str(tmp_path), "-name")) == 1
+
+    def test_readers_are_not_blocked_by_a_writer(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a search sees committed messages while another shell is writing."""
+        with SQLiteChatHistory(str(tmp_path), "s1") as history:
+            history.add_ai_message("committed awk answer")
+        writer = connect(str(tmp_path))
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO sessions (id, created, updated) VALUES ('s2', 0, 0)")
+        writer.execute("INSERT INTO messages (session_id, role, content, created) VALUES ('s2', 'user', 'awk', 0)")
+        try:
+            started = time.monotonic()
+            results = search(str(tmp_path), "awk")
+            assert time.monotonic() - started < 1
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+        assert [r.session_id for r in results] == ["s1"]
+
+
+class TestImportLogs:
+    """Test cases for importing append-only session logs."""
+
+    def test_only_new_messages_are_imported(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that repeated imports copy each log message once."""
+        with LogChatHistory(str(tmp_path), "log1") as log:
+            log.add_user_message("awk question")
+            log.add_ai_message("awk answer")
+
+        assert import_logs(str(tmp_path)) == 2
+        assert import_logs(str(tmp_path)) == 0
+
+        with LogChatHistory(str(tmp_path), "log1") as log:
+            log.add_user_message("sed question")
+        assert import_logs(str(tmp_path)) == 1
+
+        assert len(search(str(tmp_path), "question")) == 2
+        with SQLiteChatHistory(str(tmp_path), "log1") as history:
+            assert [m["content"] for m in history.get_messages()] == ["awk question", "awk answer", "sed question"]
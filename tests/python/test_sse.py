@@ -0,0 +1,108 @@
+"""Test cases for the incremental server-sent events parser."""
+
+import io
+import json
+from typing import List
+
+from zsh_ai_assistant.sse import SSEParser, delta_content, iter_data, iter_delta_content
+
+
+def _event(content: object, **extra: object) -> bytes:
+    delta = {"content": content}
+    return f"data: {json.dumps({'choices': [{'index': 0, 'delta': delta, **extra}]})}\n\n".encode()
+
+
+def _parse(*reads: bytes) -> List[bytes]:
+    parser = SSEParser()
+    spans = [span for data in reads for span in parser.feed(data)]
+    spans += list(parser.flush())
+    return [buffer[start:end] for buffer, start, end in spans]
+
+
+class TestSSEParser:
+    """Test cases for SSEParser class."""
+
+    def test_parses_events_until_done(self) -> None:
+        """Test that data fields are yielded per event and [DONE] ends the stream."""
+        stream = b": comment\n\ndata: one\n\nevent: x\ndata: a\ndata:b\n\ndata: [DONE]\n\ndata: late\n\n"
+
+        assert _parse(stream) == [b"one", b"a\nb"]
+
+    def test_events_split_across_reads(self) -> None:
+        """Test that events are reassembled whatever the read boundaries."""
+        stream = b"data: one\n\ndata: two\n\ndata: three\n\n"
+
+        for size in range(1, len(stream)):
+            reads = [stream[i : i + size] for i in range(0, len(stream), size)]
+            assert _parse(*reads) == [b"one", b"two", b"three"], size
+
+    def test_whole_events_are_not_copied(self) -> None:
+        """Test that events received in one read point into the read buffer."""
+        data = b"data: one\n\ndata: two\n\n"
+
+        spans = list(SSEParser().feed(data))
+
+        assert [buffer is data for buffer, _, _ in spans] == [True, True]
+
+    def test_crlf_line_endings(self) -> None:
+        """Test that CRLF line endings are accepted, even split across reads."""
+        assert _parse(b"data: one\r", b"\n\r\ndata: two\r\n", b"\r\n") == [b"one", b"two"]
+
+    def test_unterminated_last_event_is_flushed(self) -> None:
+        """Test that an event cut off by the end of the stream is still delivered."""
+        assert _parse(b"data: last") == [b"last"]
+
+
+class TestDeltaContent:
+    """Test cases for delta content extraction."""
+
+    def _content(self, event: bytes) -> object:
+        return delta_content(event, 6, len(event) - 2)
+
+    def test_plain_and_escaped_content(self) -> None:
+        """Test content with and without JSON escapes."""
+        assert self._content(_event("Hello")) == "Hello"
+        assert self._content(_event('Say "hi"\n\t\\')) == 'Say "hi"\n\t\\'
+        assert self._content(_event("こんにちは")) == "こんにちは"
+        assert self._content(_event("\U0001f600")) == "\U0001f600"
+
+    def test_compact_separators(self) -> None:
+        """Test events serialized without spaces."""
+        event = b'data: {"choices":[{"delta":{"role":"assistant","content":"x"}}]}\n\n'
+
+        assert self._content(event) == "x"
+
+    def test_events_without_content(self) -> None:
+        """Test role-only, null-content and usage events."""
+        assert self._content(_event(None)) is None
+        assert self._content(b'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n') is None
+        assert self._content(b'data: {"choices":[],"usage":{"total_tokens":3}}\n\n') is None
+
+    def test_content_of_nested_objects_is_ignored(self) -> None:
+        """Test that content outside the delta is not mistaken for it."""
+        event = b'data: {"choices":[{"delta":{},"logprobs":{"content":[{"token":"x"}]}}]}\n\n'
+
+        assert self._content(event) is None
+
+    def test_reasoning_content_is_not_content(self) -> None:
+        """Test that reasoning_content is not returned as the answer."""
+        assert self._content(b'data: {"choices":[{"delta":{"reasoning_content":"hmm"}}]}\n\n') is None
+
+
+class TestIterDeltaContent:
+    """Test cases for reading delta contents from a stream."""
+
+    def test_reads_until_done(self) -> None:
+        """Test a complete stream read from a file object."""
+        stream = io.BytesIO(_event("Hello") + _event(None) + _event(" world") + b"data: [DONE]\n\n" + _event("x"))
+
+        assert list(iter_delta_content(stream)) == ["Hello", " world"]
+
+    def test_small_reads(self) -> None:
+        """Test that tiny reads yield the same spans."""
+        stream = _event("a") + _event("b")
+
+        assert [bytes(b[s:e]) for b, s, e in iter_data(io.BytesIO(stream), chunk_size=3)] == [
+            stream[6 : len(stream) // 2 - 2],
+            stream[len(stream) // 2 + 6 : -2],
+        ]
@@ -0,0 +1,55 @@
+"""Test cases for shared state files."""
+
+import os
+
+from zsh_ai_assistant.state import SharedStateFile
+
+
+class TestSharedStateFile:
+    """Test cases for SharedStateFile class."""
+
+    def test_read_missing_file_returns_empty_document(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a missing state file reads as empty."""
+        state = SharedStateFile(str(tmp_path / "state.json"))
+
+        assert state.read() == {}
+
+    def test_update_persists_changes(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that changes made in update are written back."""
+        path = str(tmp_path / "nested" / "state.json")
+        state = SharedStateFile(path)
+
+        with state.update() as data:
+            data["count"] = 1
+        with state.update() as data:
+            data["count"] += 1
+
+        assert SharedStateFile(path).read() == {"count": 2}
+        assert os.path.exists(path + ".lock")
+
+    def test_corrupt_file_is_treated_as_empty(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a corrupt state file does not break readers or writers."""
+        path = tmp_path / "state.json"
+        path.write_text("{not json")
+        state = SharedStateFile(str(path))
+
+        assert state.read() == {}
+        with state.update() as data:
+            data["ok"] = True
+        assert state.read() == {"ok": True}
+
+    def test_failed_update_leaves_file_untouched(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that an exception inside update does not write partial changes."""
+        state = SharedStateFile(str(tmp_path / "state.json"))
+        with state.update() as data:
+            data["value"] = "old"
+
+        try:
+            with state.update() as data:
+                data["value"] = "new"
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+
+        assert state.read() == {"value": "old"}
+        assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".state-")] == []
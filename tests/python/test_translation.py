@@ -0,0 +1,206 @@
+"""Test cases for concurrent translation into several languages."""
+
+import threading
+import time
+from typing import Iterator, List
+from unittest.mock import Mock
+
+import pytest
+
+from zsh_ai_assistant.langdetect import needs_no_translation
+from zsh_ai_assistant.translation import (
+    ChunkStream,
+    TranslationStats,
+    parse_targets,
+    translate_concurrently,
+    translate_incrementally,
+    translate_segments,
+)
+from zsh_ai_assistant.translation_memory import TranslationMemory
+
+
+class TestParseTargets:
+    """Test cases for target lists."""
+
+    def test_parse_targets(self) -> None:
+        """Test that targets are split on commas, trimmed and deduplicated."""
+        assert parse_targets("ja, es,,fr,ja") == ["ja", "es", "fr"]
+        assert parse_targets("japanese") == ["japanese"]
+
+
+class TestChunkStream:
+    """Test cases for ChunkStream class."""
+
+    def test_chunks_then_error(self) -> None:
+        """Test that chunks arrive in order and the producer's error is raised after them."""
+
+        def produce() -> Iterator[str]:
+            yield "Hel"
+            yield "lo"
+            raise RuntimeError("connection lost")
+
+        stream = ChunkStream()
+        stream.feed(produce)
+        chunks = []
+
+        with pytest.raises(RuntimeError, match="connection lost"):
+            for chunk in stream:
+                chunks.append(chunk)
+
+        assert chunks == ["Hel", "lo"]
+
+
+class TestTranslateConcurrently:
+    """Test cases for translate_concurrently function."""
+
+    def test_targets_are_translated_at_the_same_time(self) -> None:
+        """Test that every target is translated concurrently and results keep the given order."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def translate_stream(text: str, target: str) -> Iterator[str]:
+            # Fails unless all three translations are running at once
+            barrier.wait()
+            yield f"{target}:"
+            yield text
+
+        service = Mock()
+        service.translate_stream.side_effect = translate_stream
+
+        streams = translate_concurrently(service, "Hi", ["ja", "es", "fr"])
+
+        assert [(target, "".join(stream)) for target, stream in streams] == [
+            ("ja", "ja:Hi"),
+            ("es", "es:Hi"),
+            ("fr", "fr:Hi"),
+        ]
+
+
+class TestTranslateSegments:
+    """Test cases for translation through the translation memory."""
+
+    def test_only_new_segments_are_translated(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that remembered paragraphs are reused and new ones are translated and stored."""
+        memory = TranslationMemory(str(tmp_path), fuzzy_threshold=0)
+        memory.store("One.", "Eins.", "german", "model")
+        requested: List[str] = []
+
+        def translate_segment(segment: str) -> Iterator[str]:
+            requested.append(segment)
+            yield "\n Zwei"
+            yield ".\n"
+
+        text = "One.\n\nTwo.\n"
+
+        result = "".join(translate_segments(text, "german", translate_segment, memory, "model", workers=2))
+
+        assert result == "Eins.\n\nZwei.\n"
+        assert requested == ["Two."]
+        assert memory.lookup("Two.", "german", "model") == "Zwei."
+
+    def test_segments_are_emitted_in_order(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that segments translated concurrently are emitted in input order."""
+        memory = TranslationMemory(str(tmp_path))
+        barrier = threading.Barrier(3, timeout=5)
+
+        def translate_segment(segment: str) -> Iterator[str]:
+            barrier.wait()
+            yield segment.lower()
+
+        result = "".join(translate_segments("A\n\nB\n\nC", "lower", translate_segment, memory, "model", workers=3))
+
+        assert result == "a\n\nb\n\nc"
+
+    def test_text_in_the_target_language_is_passed_through(self) -> None:
+        """Test that only lines needing translation are sent, consecutive ones together."""
+        requested: List[str] = []
+
+        def translate_segment(segment: str) -> Iterator[str]:
+            requested.append(segment)
+            yield "翻訳"
+
+        stats = TranslationStats()
+        text = "ログ 1\nconnection was refused\nretry is in the queue\nログ 2\n\n完了しました。\n"
+
+        result = "".join(
+            translate_segments(
+                text,
+                "japanese",
+                translate_segment,
+                None,
+                "model",
+                workers=1,
+                passthrough=lambda segment: needs_no_translation(segment, "ja"),
+                stats=stats,
+            )
+        )
+
+        assert result == "ログ 1\n翻訳\nログ 2\n\n完了しました。\n"
+        assert requested == ["connection was refused\nretry is in the queue"]
+        assert (stats.segments, stats.passed_through, stats.translated, stats.requests_saved) == (4, 3, 1, 0)
+        assert stats.tokens_saved > 0
+
+    def test_code_block_is_sent_with_its_paragraph(self) -> None:
+        """Test that a fenced block inside a paragraph goes in the same request as the text around it."""
+        requested: List[str] = []
+
+        def translate_segment(segment: str) -> Iterator[str]:
+            requested.append(segment)
+            yield "翻訳"
+
+        text = "手順は次の通りです。\nRun the installer:\n```\n$ 1 + 2\n```\nThen restart the shell."
+
+        result = "".join(
+            translate_segments(
+                text,
+                "japanese",
+                translate_segment,
+                None,
+                "model",
+                workers=1,
+                passthrough=lambda segment: needs_no_translation(segment, "ja"),
+            )
+        )
+
+        assert requested == ["Run the installer:\n```\n$ 1 + 2\n```\nThen restart the shell."]
+        assert result == "手順は次の通りです。\n翻訳"
+
+
+class TestTranslateIncrementally:
+    """Test cases for translating input as it arrives."""
+
+    def test_translations_are_yielded_before_the_input_ends(self) -> None:
+        """Test that a piece is translated while the next one is still being read."""
+        first_translated = threading.Event()
+
+        def pieces() -> Iterator[str]:
+            yield "one\n"
+            # The input only continues once the first translation was read
+            assert first_translated.wait(timeout=5)
+            yield "two\n"
+
+        output = []
+        for chunk in translate_incrementally(pieces(), lambda text: iter([text.upper()]), 2, Mock()):
+            output.append(chunk)
+            if chunk == "ONE":
+                first_translated.set()
+
+        assert "".join(output) == "ONE\nTWO\n"
+
+    def test_order_and_failures(self) -> None:
+        """Test that translations keep input order and failed pieces are passed through."""
+        on_error = Mock()
+
+        def translate(text: str) -> Iterator[str]:
+            if text == "bad":
+                raise ValueError("refused")
+            # Earlier pieces finish last
+            time.sleep(0.01 * (4 - int(text)))
+            yield f"<{text}>"
+
+        pieces = ["1\n", "bad\n", "2\n", "3"]
+
+        result = "".join(translate_incrementally(pieces, translate, 4, on_error))
+
+        assert result == "<1>\nbad\n<2>\n<3>"
+        on_error.assert_called_once()
+        assert on_error.call_args.args[0] == "bad\n"
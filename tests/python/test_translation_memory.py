@@ -0,0 +1,118 @@
+"""Test cases for the translation memory."""
+
+import sqlite3
+import threading
+
+from zsh_ai_assistant.translation_memory import (
+    TranslationMemory,
+    band_buckets,
+    database_path,
+    jaccard,
+    shingles,
+    source_hash,
+)
+
+
+class TestTranslationMemory:
+    """Test cases for TranslationMemory class."""
+
+    def test_exact_lookup(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that translations are keyed by segment, target language and model."""
+        memory = TranslationMemory(str(tmp_path))
+        memory.store("Hello", "こんにちは", "japanese", "model-a")
+
+        assert memory.lookup("Hello", "japanese", "model-a") == "こんにちは"
+        assert memory.lookup("Hello", "french", "model-a") is None
+        assert memory.lookup("Hello", "japanese", "model-b") is None
+
+        memory.store("Hello", "やあ", "japanese", "model-a")
+        memory.close()
+        # Stored translations persist and are replaced by newer ones
+        assert TranslationMemory(str(tmp_path)).lookup("Hello", "japanese", "model-a") == "やあ"
+
+    def test_fuzzy_lookup(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that a slightly changed segment reuses the translation above the threshold."""
+        memory = TranslationMemory(str(tmp_path), fuzzy_threshold=0.8)
+        source = "The configuration file is read once at startup, and changes need a restart of the service."
+        memory.store(source, "translated", "japanese", "model")
+
+        assert memory.lookup(source.replace("restart", "Restart").rstrip("."), "japanese", "model") == "translated"
+        assert memory.lookup("Logs are rotated every night and kept for a week.", "japanese", "model") is None
+        # Numbers must match exactly
+        memory.store("Version 2 of the configuration file format is read at startup.", "v2", "japanese", "model")
+        assert (
+            memory.lookup("Version 3 of the configuration file format is read at startup.", "japanese", "model") is None
+        )
+
+        memory.fuzzy_threshold = 0
+        assert memory.lookup(source.rstrip("."), "japanese", "model") is None
+
+    def test_translations_are_kept_apart_by_glossary(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that neither exact nor fuzzy lookups reuse a translation made with another glossary."""
+        memory = TranslationMemory(str(tmp_path), fuzzy_threshold=0.8)
+        source = "Remove the worktree once the branch has been merged into the main line."
+        memory.store(source, "ワークツリー", "japanese", "model", glossary="a")
+
+        assert memory.lookup(source, "japanese", "model", glossary="a") == "ワークツリー"
+        assert memory.lookup(source.rstrip("."), "japanese", "model", glossary="a") == "ワークツリー"
+        for glossary in ("b", ""):
+            assert memory.lookup(source, "japanese", "model", glossary=glossary) is None
+            assert memory.lookup(source.rstrip("."), "japanese", "model", glossary=glossary) is None
+
+        memory.store(source, "作業ツリー", "japanese", "model", glossary="b")
+        assert memory.lookup(source, "japanese", "model", glossary="a") == "ワークツリー"
+        assert memory.lookup(source, "japanese", "model", glossary="b") == "作業ツリー"
+
+    def test_memory_of_the_first_layout_is_kept(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that translations stored before glossaries were keyed are kept as made without one."""
+        connection = sqlite3.connect(database_path(str(tmp_path)))
+        connection.execute("""CREATE TABLE segments (
+                id INTEGER PRIMARY KEY, source_hash TEXT NOT NULL, target TEXT NOT NULL, model TEXT NOT NULL,
+                source TEXT NOT NULL, translation TEXT NOT NULL, updated REAL NOT NULL,
+                UNIQUE (source_hash, target, model)
+            )""")
+        connection.execute("""CREATE TABLE bands (
+                band INTEGER NOT NULL, bucket INTEGER NOT NULL,
+                segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+                PRIMARY KEY (band, bucket, segment_id)
+            ) WITHOUT ROWID""")
+        source = "The configuration file is read once at startup, and changes need a restart of the service."
+        connection.execute(
+            "INSERT INTO segments VALUES (1, ?, 'japanese', 'model', ?, 'translated', 0)", (source_hash(source), source)
+        )
+        connection.executemany("INSERT INTO bands VALUES (?, ?, 1)", list(enumerate(band_buckets(shingles(source)))))
+        connection.execute("PRAGMA user_version = 1")
+        connection.commit()
+        connection.close()
+
+        memory = TranslationMemory(str(tmp_path), fuzzy_threshold=0.8)
+
+        assert memory.lookup(source, "japanese", "model") == "translated"
+        assert memory.lookup(source.rstrip("."), "japanese", "model") == "translated"
+        assert memory.lookup(source, "japanese", "model", glossary="a") is None
+        memory.store(source, "updated", "japanese", "model")
+        assert memory.connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0] == 1
+        memory.connection.execute("DELETE FROM segments")
+        # Foreign keys hold again after the migration
+        assert memory.connection.execute("SELECT COUNT(*) FROM bands").fetchone()[0] == 0
+
+    def test_concurrent_stores(self, tmp_path) -> None:  # type: ignore[no-untyped-def]
+        """Test that threads can share one memory."""
+        memory = TranslationMemory(str(tmp_path))
+
+        def store(target: str) -> None:
+            for i in range(20):
+                memory.store(f"Segment {i}", f"{target} {i}", target, "model")
+
+        threads = [threading.Thread(target=store, args=(target,)) for target in ("ja", "es", "fr")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert memory.lookup("Segment 19", "es", "model") == "es 19"
+
+    def test_jaccard(self) -> None:
+        """Test the similarity of character trigrams."""
+        assert jaccard(shingles("Hello  World"), shingles("hello world")) == 1.0
+        assert jaccard(shingles("abcd"), shingles("abce")) == 1 / 3
@@ -44,6 +44,16 @@ Describe 'aitrans()'
       The output should include "こんにちは"
     End
 
+    It "should translate piped input into several languages"
+      Data
+        #|Hello world
+      End
+      When run aitrans -t japanese,spanish
+      The status should be success
+      The output should include "=== japanese ==="
+      The output should include "=== spanish ==="
+    End
+
     It "should handle directory change error"
       # Save original ZSH_AI_ASSISTANT_DIR
       original_dir="$ZSH_AI_ASSISTANT_DIR"
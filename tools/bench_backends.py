@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Compare the ChatOpenAI client with the built-in HTTP client.
+
+Measures, for each client:
+
+* startup: wall time of a fresh interpreter importing the service and creating
+  a client, which is what every ``cli.py`` invocation pays;
+* per-token overhead: time spent per streamed token against a local server
+  that sends a canned response as fast as it can.
+
+Usage:
+    python tools/bench_backends.py [--runs 5] [--tokens 2000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+CLIENTS = ("langchain", "http")
+
+STARTUP_CODE = """
+from zsh_ai_assistant.config import AIConfig
+from zsh_ai_assistant.ai_service import LangChainAIService
+LangChainAIService(AIConfig())
+"""
+
+
+def _serve(tokens: int) -> ThreadingHTTPServer:
+    """Start a local server streaming ``tokens`` one-word deltas per request."""
+    events = b"".join(
+        b"data: " + json.dumps({"choices": [{"delta": {"content": f"tok{i} "}}]}).encode() + b"\n\n"
+        for i in range(tokens)
+    )
+    body = events + b"data: [DONE]\n\n"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _environment(client: str, base_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": base_url,
+            "AI_CLIENT": client,
+            "AI_CIRCUIT_FAILURE_THRESHOLD": "0",
+            "PYTHONPATH": SRC_DIR,
+        }
+    )
+    return env
+
+
+def bench_startup(client: str, base_url: str, runs: int) -> float:
+    """Return the median seconds for a new process to create the service."""
+    env = _environment(client, base_url)
+    samples: List[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_CODE], env=env, check=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def bench_tokens(client: str, base_url: str, runs: int, tokens: int) -> float:
+    """Return the median microseconds spent per streamed token."""
+    from zsh_ai_assistant.ai_service import LangChainAIService
+    from zsh_ai_assistant.config import AIConfig
+
+    os.environ.update(_environment(client, base_url))
+    service = LangChainAIService(AIConfig())
+    messages = [{"role": "user", "content": "Hi"}]
+    # Warm up the connection and lazy imports
+    for _ in service.chat_stream(messages):
+        pass
+    samples: List[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        count = sum(1 for _ in service.chat_stream(messages))
+        samples.append((time.perf_counter() - started) / count * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement (default: 5)")
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens per streamed response (default: 2000)")
+    args = parser.parse_args()
+
+    server = _serve(args.tokens)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"{'client':<10} {'startup (ms)':>14} {'per token (us)':>16}")
+    try:
+        for client in CLIENTS:
+            startup = bench_startup(client, base_url, args.runs)
+            per_token = bench_tokens(client, base_url, args.runs, args.tokens)
+            print(f"{client:<10} {startup * 1000:>14.1f} {per_token:>16.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Measure the memory and snapshot cost of chat history messages.
+
+Compares messages stored as ``{"role": ..., "content": ...}`` dictionaries
+with the ``__slots__`` message classes, using ``tracemalloc``. The content
+strings are created up front and shared, so only the per-message overhead
+is measured. Also times ``get_messages()`` on a long history: copying the
+list, as histories used to, against taking a read-only view.
+
+Usage:
+    python tools/bench_history_memory.py [--messages 100000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from zsh_ai_assistant.chat_history import InMemoryChatHistory  # noqa: E402
+from zsh_ai_assistant.messages import AIMessage, HumanMessage  # noqa: E402
+
+
+def as_dicts(contents: List[str]) -> List[Any]:
+    """Build the history as message dictionaries."""
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": c} for i, c in enumerate(contents)]
+
+
+def as_messages(contents: List[str]) -> List[Any]:
+    """Build the history as slotted messages."""
+    return [HumanMessage(c) if i % 2 == 0 else AIMessage(c) for i, c in enumerate(contents)]
+
+
+def measure(build: Callable[[List[str]], List[Any]], contents: List[str]) -> int:
+    """Return the bytes allocated by ``build`` and still held by its result."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = build(contents)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del history
+    return allocated
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000, help="Messages in the history (default: 100000)")
+    args = parser.parse_args()
+
+    contents = [f"message {i}" for i in range(args.messages)]
+    dict_bytes = measure(as_dicts, contents)
+    message_bytes = measure(as_messages, contents)
+    print(f"{'representation':<16} {'bytes/message':>14}")
+    print(f"{'dict':<16} {dict_bytes / args.messages:>14.1f}")
+    print(f"{'slots':<16} {message_bytes / args.messages:>14.1f}")
+    print(f"saving: {1 - message_bytes / dict_bytes:.0%}")
+
+    history = InMemoryChatHistory()
+    for i in range(0, len(contents), 2):
+        history.add_user_message(contents[i])
+        history.add_ai_message(contents[i + 1] if i + 1 < len(contents) else "")
+    number = 200
+    copy = timeit.timeit(lambda: history.messages.copy(), number=number) / number
+    view = timeit.timeit(history.get_messages, number=number) / number
+    print(f"get_messages() on {len(history)} messages: copy {copy * 1e6:.1f} us, view {view * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
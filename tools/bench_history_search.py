@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark full-text search over the SQLite chat history.
+
+Fills a temporary history database with ``--messages`` synthetic messages,
+written in batches across many sessions, then times searches for common
+and rare words. Each search opens its own connection, as ``cli.py history
+search`` does.
+
+Usage:
+    python tools/bench_history_search.py [--messages 200000] [--session-size 40]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from zsh_ai_assistant.sqlite_history import SQLiteChatHistory, search  # noqa: E402
+
+# Shell vocabulary at the head of a Zipf-like distribution, followed by
+# filler words, so that common words match many messages and rare ones few
+WORDS = (
+    "list files directory grep find sed sort uniq count lines column print process kill port network "
+    "archive extract compress permissions owner symlink disk usage memory environment variable path "
+    "loop array string replace regex match json yaml csv header date time cron schedule log tail"
+).split()
+
+VOCABULARY = WORDS + [f"w{i}" for i in range(20_000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+QUERIES = ("list files", "awk column", "cron schedule", "tar extract", "rsync", "zzzunmatched")
+
+
+def _message(rng: random.Random, i: int) -> str:
+    words = rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=rng.randint(8, 60))
+    if i % 50 == 0:
+        words.append("awk '{print $2}'")
+    if i % 500 == 0:
+        words.append("rsync -av --delete src/ dst/")
+    if i % 7 == 0:
+        words.append("tar xzf archive.tar.gz")
+    return " ".join(words)
+
+
+def fill(directory: str, messages: int, session_size: int) -> float:
+    """Return the seconds taken to store the messages."""
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for first in range(0, messages, session_size):
+        with SQLiteChatHistory(directory, f"session-{first}") as history:
+            history.add_messages(
+                {"role": "user" if i % 2 == 0 else "assistant", "content": _message(rng, i)}
+                for i in range(first, min(first + session_size, messages))
+            )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000, help="Messages stored (default: 200000)")
+    parser.add_argument("--session-size", type=int, default=40, help="Messages per session (default: 40)")
+    parser.add_argument("--runs", type=int, default=9, help="Repetitions per query (default: 9)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seconds = fill(directory, args.messages, args.session_size)
+        size = os.path.getsize(os.path.join(directory, "history.db"))
+        print(f"stored {args.messages} messages in {seconds:.1f} s ({args.messages / seconds:.0f}/s, {size >> 20} MiB)")
+        print(f"{'query':<16} {'results':>8} {'median (ms)':>12} {'max (ms)':>9}")
+        for query in QUERIES:
+            samples = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                results = search(directory, query)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f"{query:<16} {len(results):>8} {statistics.median(samples):>12.2f} {max(samples):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
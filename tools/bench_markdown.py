@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark incremental markdown rendering against re-rendering per chunk.
+
+A synthetic answer mixing paragraphs, lists, headings and fenced code is
+streamed in small chunks. The incremental renderer handles each chunk once;
+the naive approach renders the whole answer so far after every chunk, which
+is quadratic and is only run up to ``--naive-limit`` bytes.
+
+Usage:
+    python tools/bench_markdown.py [--size 100000] [--chunk 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from zsh_ai_assistant.markdown import MarkdownRenderer  # noqa: E402
+
+BLOCK = (
+    "## Listing files\n"
+    "Use `ls -la` to list every file, including hidden ones.\n"
+    "\n"
+    "- `-l` uses the long format\n"
+    "- `-a` shows entries starting with a dot\n"
+    "1. Open a terminal\n"
+    "2. Run the command\n"
+    "```bash\n"
+    "ls -la ~/projects | grep '\\.py$'\n"
+    "find . -name '*.md' -exec wc -l {} +\n"
+    "```\n"
+    "\n"
+)
+
+
+def _answer(size: int) -> str:
+    return (BLOCK * (size // len(BLOCK) + 1))[:size]
+
+
+def _chunks(text: str, size: int) -> List[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def incremental(chunks: List[str]) -> float:
+    """Return the seconds taken to render the chunks incrementally."""
+    started = time.perf_counter()
+    renderer = MarkdownRenderer()
+    for chunk in chunks:
+        renderer.feed(chunk)
+    renderer.finish()
+    return time.perf_counter() - started
+
+
+def naive(chunks: List[str]) -> float:
+    """Return the seconds taken to re-render the whole answer after every chunk."""
+    started = time.perf_counter()
+    received = ""
+    for chunk in chunks:
+        received += chunk
+        renderer = MarkdownRenderer()
+        renderer.feed(received)
+        renderer.finish()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="Largest answer in bytes (default: 100000)")
+    parser.add_argument("--chunk", type=int, default=4, help="Characters per streamed chunk (default: 4)")
+    parser.add_argument("--naive-limit", type=int, default=10_000, help="Largest answer re-rendered naively")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'chunks':>8} {'incremental (ms)':>17} {'us/chunk':>9} {'naive (ms)':>11}")
+    for size in sorted({args.size // 10, args.size // 4, args.size // 2, args.size}):
+        chunks = _chunks(_answer(size), args.chunk)
+        seconds = incremental(chunks)
+        naive_ms = f"{naive(chunks) * 1000:.1f}" if size <= args.naive_limit else "-"
+        print(f"{size:>8} {len(chunks):>8} {seconds * 1000:>17.1f} {seconds / len(chunks) * 1e6:>9.2f} {naive_ms:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Microbenchmark of server-sent event parsing for streamed completions.
+
+Compares the incremental parser in ``zsh_ai_assistant.sse`` with the usual
+approach of reading lines and ``json.loads``-ing every event. The stream is
+replayed as network reads of one event each, which is what a local model at
+a few hundred tokens per second produces, and the CPU time per token is
+reported together with the CPU share it would take at ``--rate`` tokens/s.
+
+Usage:
+    python tools/bench_sse.py [--tokens 20000] [--rate 500] [--runs 5]
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Iterator, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from zsh_ai_assistant.sse import iter_delta_content  # noqa: E402
+
+
+def _make_reads(tokens: int) -> List[bytes]:
+    """Return one llama.cpp-style event per read."""
+    reads = []
+    for i in range(tokens):
+        event = {
+            "choices": [{"finish_reason": None, "index": 0, "delta": {"content": f" word{i % 97}"}}],
+            "created": 1700000000,
+            "id": "chatcmpl-bench",
+            "model": "bench",
+            "object": "chat.completion.chunk",
+        }
+        reads.append(b"data: " + json.dumps(event, separators=(",", ":")).encode() + b"\n\n")
+    reads.append(b"data: [DONE]\n\n")
+    return reads
+
+
+class _Stream(io.RawIOBase):
+    """Binary stream returning one prepared read per call, like a socket."""
+
+    def __init__(self, reads: List[bytes]) -> None:
+        self._reads = iter(reads)
+        self._rest = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read1(self, size: int = -1) -> bytes:
+        return next(self._reads, b"")
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._rest or next(self._reads, b"")
+        n = min(len(buffer), len(data))
+        buffer[:n] = data[:n]
+        self._rest = data[n:]
+        return n
+
+
+def baseline(stream: io.RawIOBase) -> Iterator[str]:
+    """Read lines and decode every event in full."""
+    for line in io.BufferedReader(stream):
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return
+        event = json.loads(data)
+        content = event["choices"][0]["delta"].get("content")
+        if content:
+            yield content
+
+
+def incremental(stream: io.RawIOBase) -> Iterator[str]:
+    """Parse with the incremental parser."""
+    return iter_delta_content(stream)
+
+
+def bench(parse: Callable[[io.RawIOBase], Iterator[str]], reads: List[bytes], runs: int) -> float:
+    """Return the median CPU microseconds per token."""
+    samples = []
+    for _ in range(runs):
+        stream = _Stream(reads)
+        started = time.process_time()
+        count = sum(1 for _ in parse(stream))
+        samples.append((time.process_time() - started) / count * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=20000, help="Tokens per run (default: 20000)")
+    parser.add_argument("--rate", type=int, default=500, help="Token rate for the CPU share column (default: 500)")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions (default: 5)")
+    args = parser.parse_args()
+
+    reads = _make_reads(args.tokens)
+    assert list(baseline(_Stream(reads))) == list(incremental(_Stream(reads)))
+    print(f"{'parser':<12} {'us/token':>10} {'max tokens/s':>14} {f'CPU @ {args.rate}/s':>14}")
+    for name, parse in (("baseline", baseline), ("incremental", incremental)):
+        per_token = bench(parse, reads, args.runs)
+        print(f"{name:<12} {per_token:>10.2f} {1e6 / per_token:>14.0f} {per_token * args.rate / 1e4:>13.2f}%")
+
+
+if __name__ == "__main__":
+    main()